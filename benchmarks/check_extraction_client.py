@@ -0,0 +1,148 @@
+"""
+Runnable check of AspectExtractor's HTTP client against a local stub `/api/generate` server.
+Covers the concurrency limit, per-request timeouts and retry with exponential backoff
+(e.g. a 503 followed by a 200), without Ollama or a model download.
+
+Exits with status 1 if any check fails.
+
+Usage: python -m benchmarks.check_extraction_client --latency 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from typing import Callable, List, Tuple
+from benchmarks.stub_ollama import StubOllamaServer
+from src.aspect_extraction import AspectExtractor
+
+
+REVIEW = "The driver was rude and the food arrived cold"
+
+
+def _extract(stub: StubOllamaServer, review_texts: List[str], **kwargs) -> Tuple[List[List[str]], List[str], float]:
+    """Extract through a fresh client, returning (aspects, sources, seconds) with client output silenced."""
+    extractor = AspectExtractor(ollama_url=stub.url, **kwargs)
+    start_time = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            aspects, sources = extractor.extract_with_sources(review_texts)
+    finally:
+        extractor.close()
+    return aspects, sources, time.monotonic() - start_time
+
+
+def check_concurrency_limit(stub: StubOllamaServer, latency: float) -> List[str]:
+    """At most max_concurrency requests are in flight, and the limit is reached."""
+    _, sources, seconds = _extract(stub, [f"{REVIEW} #{i}" for i in range(12)], max_concurrency=3)
+    problems = []
+    if stub.max_in_flight != 3:
+        problems.append(f"expected 3 requests in flight at most, saw {stub.max_in_flight}")
+    if stub.requests != 12:
+        problems.append(f"expected 12 requests, saw {stub.requests}")
+    if set(sources) != {"llm"}:
+        problems.append(f"expected only LLM answers, got {sorted(set(sources))}")
+    if seconds < 4 * latency:
+        problems.append(f"12 requests at 3 in flight finished in {seconds:.2f}s, under 4 rounds of {latency}s")
+    return problems
+
+
+def check_retry_after_503(stub: StubOllamaServer, latency: float) -> List[str]:
+    """A 503 is retried after one backoff step and the 200 that follows is used."""
+    stub.inject(503)
+    aspects, sources, seconds = _extract(stub, [REVIEW], backoff_factor=0.2)
+    problems = []
+    if stub.requests != 2:
+        problems.append(f"expected 2 requests (503 then 200), saw {stub.requests}")
+    if sources != ["llm"] or aspects[0] != stub.extract(REVIEW):
+        problems.append(f"expected the stub's answer after the retry, got {aspects[0]} ({sources[0]})")
+    if seconds < 0.2:
+        problems.append(f"retried after {seconds:.2f}s, before the 0.2s backoff")
+    return problems
+
+
+def check_exponential_backoff(stub: StubOllamaServer, latency: float) -> List[str]:
+    """Consecutive failures wait backoff_factor * 1, 2, 4... between attempts."""
+    stub.inject(503, 502, 429)
+    _, sources, seconds = _extract(stub, [REVIEW], max_retries=3, backoff_factor=0.1)
+    problems = []
+    if stub.requests != 4 or sources != ["llm"]:
+        problems.append(f"expected success on the 4th request, saw {stub.requests} requests ({sources[0]})")
+    if seconds < 0.1 + 0.2 + 0.4:
+        problems.append(f"three retries took {seconds:.2f}s, under the 0.7s of backoff")
+    return problems
+
+
+def check_retries_exhausted(stub: StubOllamaServer, latency: float) -> List[str]:
+    """Once retries run out the review falls back to overall_satisfaction."""
+    stub.inject(503, 503, 503)
+    aspects, sources, _ = _extract(stub, [REVIEW], max_retries=2, backoff_factor=0.05)
+    problems = []
+    if stub.requests != 3:
+        problems.append(f"expected 3 requests (1 + 2 retries), saw {stub.requests}")
+    if sources != ["fallback"] or aspects[0] != ["overall_satisfaction"]:
+        problems.append(f"expected the overall_satisfaction fallback, got {aspects[0]} ({sources[0]})")
+    return problems
+
+
+def check_timeout_retried(stub: StubOllamaServer, latency: float) -> List[str]:
+    """A stalled request times out and the retry's answer is used."""
+    stall = latency + 2.0
+    stub.inject(stall)
+    _, sources, seconds = _extract(stub, [REVIEW], timeout=latency + 0.5, backoff_factor=0.05)
+    problems = []
+    if stub.requests != 2 or sources != ["llm"]:
+        problems.append(f"expected a timeout then an answer, saw {stub.requests} requests ({sources[0]})")
+    if seconds >= stall:
+        problems.append(f"took {seconds:.2f}s, so the client waited out the {stall:.1f}s stall")
+    return problems
+
+
+def check_timeouts_exhausted(stub: StubOllamaServer, latency: float) -> List[str]:
+    """Requests that keep timing out end in the fallback within the timeout budget."""
+    stall = latency + 2.0
+    stub.inject(stall, stall)
+    _, sources, seconds = _extract(stub, [REVIEW], timeout=latency + 0.3, max_retries=1, backoff_factor=0.05)
+    problems = []
+    if sources != ["fallback"]:
+        problems.append(f"expected the fallback after two timeouts, got {sources[0]}")
+    if seconds >= 2 * (latency + 0.3) + 1.0:
+        problems.append(f"gave up after {seconds:.2f}s, well past two {latency + 0.3:.1f}s timeouts")
+    return problems
+
+
+CHECKS: List[Callable[[StubOllamaServer, float], List[str]]] = [
+    check_concurrency_limit,
+    check_retry_after_503,
+    check_exponential_backoff,
+    check_retries_exhausted,
+    check_timeout_retried,
+    check_timeouts_exhausted,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the Ollama client's concurrency, timeouts and retries")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the stub takes per request")
+    args = parser.parse_args()
+
+    failed = 0
+    with StubOllamaServer(latency=args.latency) as stub:
+        for check in CHECKS:
+            stub.reset_counters()
+            problems = check(stub, args.latency)
+            failed += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {check.__name__}: {check.__doc__}")
+            for problem in problems:
+                print(f"     {problem}")
+            # Let stalled handler threads from timed-out requests finish before the next check
+            while stub.in_flight:
+                time.sleep(0.05)
+
+    print(f"\n{len(CHECKS) - failed}/{len(CHECKS)} checks passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
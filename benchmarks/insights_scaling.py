@@ -0,0 +1,55 @@
+"""
+Benchmark how insight generation scales with the number of result rows.
+Synthesizes aspect-sentiment rows and times the single-pass crosstab engine.
+
+Usage: python -m benchmarks.insights_scaling --rows 10000 100000 1000000
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.aspect_extraction import AspectExtractor
+from src.generate_insights import CUBE_DIMENSIONS, PLATFORMS, SENTIMENTS, compute_insights
+
+
+def synthesize_results(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random analysis results with realistic columns and categorical dtypes."""
+    rng = np.random.default_rng(seed)
+    subcategories = np.array(list(AspectExtractor.SUBCATEGORIES))
+    subcategory = rng.choice(subcategories, n_rows)
+
+    df = pd.DataFrame({
+        'review_id': rng.integers(0, max(1, n_rows // 2), n_rows),
+        'platform': rng.choice(PLATFORMS, n_rows),
+        'subcategory': subcategory,
+        'parent_aspect': pd.Series(subcategory).map(AspectExtractor.SUBCATEGORIES).to_numpy(),
+        'sentiment': rng.choice(SENTIMENTS, n_rows, p=[0.6, 0.05, 0.35]),
+    })
+    for column in CUBE_DIMENSIONS + ['sentiment']:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time compute_insights across result sizes")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print("| Rows | Best time (s) | Rows/sec |")
+    print("|------|---------------|----------|")
+    for n_rows in args.rows:
+        df = synthesize_results(n_rows)
+        timings = []
+        for _ in range(args.repeats):
+            start_time = time.perf_counter()
+            compute_insights(df)
+            timings.append(time.perf_counter() - start_time)
+
+        best = min(timings)
+        print(f"| {n_rows:,} | {best:.4f} | {n_rows / best:,.0f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark end-to-end pipeline throughput offline.
+Runs ABSAPipeline against a stub Ollama server and a tiny random RoBERTa, sweeping
+batch size, extraction concurrency, sentiment backend and input size.
+
+Each configuration runs in a fresh process so peak RSS is measured per configuration.
+
+Usage: python -m benchmarks.pipeline_throughput --sizes 100 500 --batch-sizes 8 32 --concurrency 1 4 --latency 0.2
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import itertools
+import json
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.tiny_model import build_tiny_model
+
+
+def sample_reviews(data_glob: str, n_reviews: int, seed: int = 0) -> pd.DataFrame:
+    """Draw reviews from the bundled CSVs (with replacement when asking for more than exist)."""
+    frames = [pd.read_csv(path) for path in sorted(glob.glob(data_glob))]
+    reviews = pd.concat(frames, ignore_index=True).dropna(subset=["review"])
+    sample = reviews.sample(n=n_reviews, replace=n_reviews > len(reviews), random_state=seed)
+    return sample.reset_index(drop=True)
+
+
+def _percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50_ms": 0.0, "p99_ms": 0.0}
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"p50_ms": round(p50 * 1000, 2), "p99_ms": round(p99 * 1000, 2)}
+
+
+def run_config(config: Dict) -> Dict:
+    """
+    Time one configuration; meant to run in its own process.
+
+    `process_review` latency is per review. `process_dataframe` analyzes
+    reviews in groups of `batch_size`, so its latency is per group (every
+    review in a group finishes when the group does).
+    """
+    from src.aspect_extraction import AspectExtractor
+    from src.metrics import REGISTRY
+    from src.pipeline import ABSAPipeline
+    from src.sentiment_analyzer import SentimentAnalyzer
+
+    df = sample_reviews(config["data_glob"], config["reviews"], config["seed"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        pipeline = ABSAPipeline(
+            aspect_extractor=AspectExtractor(
+                ollama_url=config["ollama_url"],
+                max_concurrency=config["concurrency"],
+                structured_output=config["structured_output"]
+            ),
+            sentiment_analyzer=SentimentAnalyzer(model_path=config["model_path"], backend=config["backend"]),
+            sentiment_batch_size=config["sentiment_batch_size"]
+        )
+        # Warm up the model and the HTTP connection pool outside the timed region
+        pipeline.process_review(df["review"].iloc[0])
+        REGISTRY.reset()
+
+        start_time = time.perf_counter()
+        if config["mode"] == "review":
+            latencies = []
+            for review_text in df["review"]:
+                review_start = time.perf_counter()
+                pipeline.process_review(review_text)
+                latencies.append(time.perf_counter() - review_start)
+        else:
+            pipeline.process_dataframe(df, save_checkpoints=False, reviews_per_batch=config["batch_size"])
+            group = REGISTRY.snapshot()["histograms"].get("review_batch_seconds", [{}])[0]
+            latencies = None
+        elapsed = time.perf_counter() - start_time
+        pipeline.aspect_extractor.close()
+
+    result = dict(config)
+    result["seconds"] = round(elapsed, 3)
+    result["reviews_per_sec"] = round(config["reviews"] / elapsed, 2)
+    if latencies is not None:
+        result.update(_percentiles_ms(latencies))
+    else:
+        result.update({"p50_ms": round(group.get("p50", 0) * 1000, 2), "p99_ms": round(group.get("p99", 0) * 1000, 2)})
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def build_configs(args, ollama_url: str, model_path: str) -> List[Dict]:
+    """Cross product of the sweep axes; batch size and concurrency only apply to process_dataframe."""
+    configs = []
+    base = {
+        "ollama_url": ollama_url,
+        "model_path": model_path,
+        "data_glob": args.data,
+        "sentiment_batch_size": args.sentiment_batch_size,
+        "structured_output": args.structured_output,
+        "seed": args.seed
+    }
+    for mode, backend, n_reviews in itertools.product(args.modes, args.backends, args.sizes):
+        if mode == "review":
+            configs.append({**base, "mode": mode, "backend": backend, "reviews": n_reviews,
+                            "batch_size": 1, "concurrency": 1})
+            continue
+        for batch_size, concurrency in itertools.product(args.batch_sizes, args.concurrency):
+            configs.append({**base, "mode": mode, "backend": backend, "reviews": n_reviews,
+                            "batch_size": batch_size, "concurrency": concurrency})
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep ABSAPipeline throughput against a stub LLM and a tiny model")
+    parser.add_argument("--modes", nargs="+", choices=["review", "dataframe"], default=["review", "dataframe"],
+                        help="review = ABSAPipeline.process_review per review, dataframe = process_dataframe")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500], help="Reviews per run")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 16, 64], help="reviews_per_batch values")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Concurrent Ollama requests")
+    parser.add_argument("--backends", nargs="+", default=["torch"], help="Sentiment backends (torch, torch-int8, onnx)")
+    parser.add_argument("--sentiment-batch-size", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative spread of the stub latency")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Stub LLM seconds per generated token")
+    parser.add_argument("--trailing-tokens", type=int, default=0, help="Stub LLM filler tokens after the JSON reply")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0,
+                        help="Stub LLM seconds per prompt token not covered by a cached prefix")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Schema-constrained, streamed extraction with early close (see AspectExtractor)")
+    parser.add_argument("--model-path", help="Sentiment model to use (default: a tiny random RoBERTa built on the fly)")
+    parser.add_argument("--data", default="data/*_customer_reviews.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    model_dir = None
+    model_path = args.model_path
+    if model_path is None:
+        model_dir = tempfile.mkdtemp(prefix="tiny-roberta-")
+        model_path = build_tiny_model(model_dir, args.data)
+
+    results = []
+    try:
+        with StubOllamaServer(
+            args.latency, args.jitter, seed=args.seed,
+            token_latency=args.token_latency, trailing_tokens=args.trailing_tokens,
+            prompt_token_latency=args.prompt_token_latency
+        ) as stub:
+            print(f"Stub LLM at {stub.url} ({args.latency}s +/-{args.jitter:.0%} per request), model {model_path}\n")
+            print("| Mode | Reviews | Batch | Concurrency | Backend | Reviews/sec | p50 (ms) | p99 (ms) | Peak RSS (MB) |")
+            print("|------|---------|-------|-------------|---------|-------------|----------|----------|---------------|")
+            for config in build_configs(args, stub.url, model_path):
+                # A fresh interpreter per configuration keeps peak RSS independent of earlier runs
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    result = executor.submit(run_config, config).result()
+                results.append(result)
+                batch = "-" if result["mode"] == "review" else result["batch_size"]
+                concurrency = "-" if result["mode"] == "review" else result["concurrency"]
+                print(
+                    f"| {result['mode']} | {result['reviews']:,} | {batch} | {concurrency} | {result['backend']} "
+                    f"| {result['reviews_per_sec']:,.1f} | {result['p50_ms']:,.1f} | {result['p99_ms']:,.1f} "
+                    f"| {result['peak_rss_mb']:,.0f} |",
+                    flush=True
+                )
+    finally:
+        if model_dir is not None:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {len(results)} results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
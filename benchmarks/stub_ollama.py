@@ -0,0 +1,268 @@
+"""
+Local stand-in for the Ollama `/api/generate` endpoint with configurable latency.
+Answers extraction prompts by keyword matching, so benchmarks run without a GPU or a live LLM.
+Supports streamed replies, a per-token generation delay and prompt-prefix reuse like Ollama's,
+plus injected faults (error statuses and stalls) for exercising client retries and timeouts.
+
+Usage: python -m benchmarks.stub_ollama --port 11434 --latency 0.5 --token-latency 0.02 --trailing-tokens 40
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+from typing import Deque, Dict, List, Optional, Union
+from src.aspect_extraction import AspectExtractor
+
+
+SINGLE_REVIEW = re.compile(r'Review to analyze: "(.*)"\n\nReturn ONLY', re.DOTALL)
+PACKED_SLOT = re.compile(r'^(\d+)\. "(.*)"$', re.MULTILINE)
+
+
+def _keyword_table() -> Dict[str, List[str]]:
+    """Subcategory -> lowercase keywords, taken from the extractor's own definitions."""
+    return {
+        subcategory: [keyword.strip().lower() for keyword in info["keywords"].split(",") if keyword.strip()]
+        for subcategory, info in AspectExtractor.SUBCATEGORY_DEFINITIONS.items()
+        if subcategory != "overall_satisfaction"
+    }
+
+
+class StubOllamaServer:
+    """Threaded HTTP server answering `/api/generate` like Ollama, after a simulated delay."""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.0,
+        port: int = 0,
+        host: str = "127.0.0.1",
+        seed: int = 0,
+        token_latency: float = 0.0,
+        trailing_tokens: int = 0,
+        prompt_token_latency: float = 0.0,
+        parallel_slots: int = 4
+    ):
+        """
+        Configure the stub.
+
+        Args:
+            latency: Seconds each request takes before the first token (prompt processing)
+            jitter: Relative random spread of the latency (0.2 = +/-20%)
+            port: Port to listen on (0 picks a free one)
+            host: Interface to bind
+            seed: Seed for the latency jitter
+            token_latency: Seconds per generated token (about 4 characters of output)
+            trailing_tokens: Filler tokens generated after the JSON, like a model that
+                keeps talking; a streaming client can close before they are produced
+            prompt_token_latency: Seconds per prompt token that has to be evaluated; the longest
+                prefix shared with a recent request (one per parallel slot) is free
+            parallel_slots: Recent prompts kept for prefix reuse, like Ollama's OLLAMA_NUM_PARALLEL
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.trailing_tokens = trailing_tokens
+        self.prompt_token_latency = prompt_token_latency
+        self.parallel_slots = parallel_slots
+        self._recent_contexts: List[str] = []
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.disconnects = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._faults: Deque[Union[int, float]] = deque()
+        self.keywords = _keyword_table()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as `AspectExtractor(ollama_url=...)`."""
+        return f"http://{self.host}:{self.port}"
+
+    def extract(self, review_text: str) -> List[str]:
+        """Subcategories whose keywords occur in the review, or overall_satisfaction."""
+        text = review_text.lower()
+        found = [subcategory for subcategory, keywords in self.keywords.items() if any(k in text for k in keywords)]
+        return found or ["overall_satisfaction"]
+
+    def respond(self, prompt: str) -> str:
+        """Model output for a single-review or packed extraction prompt."""
+        single = SINGLE_REVIEW.search(prompt)
+        if single is not None:
+            return json.dumps(self.extract(single.group(1)))
+        return json.dumps({slot: self.extract(text) for slot, text in PACKED_SLOT.findall(prompt)})
+
+    def evaluate_prompt(self, system: str, prompt: str) -> int:
+        """Prompt tokens (about 4 characters each) not covered by a prefix of a recent request."""
+        context = f"{system}\n{prompt}"
+        with self._lock:
+            reused = max((len(os.path.commonprefix([context, recent])) for recent in self._recent_contexts), default=0)
+            self._recent_contexts = (self._recent_contexts + [context])[-self.parallel_slots:]
+        return max(1, (len(context) - reused) // 4)
+
+    def inject(self, *faults: Union[int, float]):
+        """
+        Queue faults for the next requests, one per request in arrival order.
+
+        Args:
+            *faults: An int is an HTTP status replied immediately (e.g. 503);
+                a float is a stall in seconds before the normal reply
+        """
+        with self._lock:
+            self._faults.extend(faults)
+
+    def reset_counters(self):
+        """Zero the request, disconnect and concurrency counters and drop pending faults."""
+        with self._lock:
+            self.requests = self.disconnects = self.max_in_flight = 0
+            self._faults.clear()
+
+    def _next_fault(self) -> Optional[Union[int, float]]:
+        with self._lock:
+            return self._faults.popleft() if self._faults else None
+
+    def _delay(self) -> float:
+        with self._lock:
+            spread = self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency * (1 + spread))
+
+    def start(self) -> "StubOllamaServer":
+        """Start serving from a background thread."""
+        stub = self
+
+        class GenerateHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    self._generate()
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _generate(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fault = stub._next_fault()
+                if isinstance(fault, int):
+                    self.send_error(fault)
+                    return
+                if fault is not None:
+                    time.sleep(fault)
+                prompt_tokens = stub.evaluate_prompt(body.get("system", ""), body.get("prompt", ""))
+                prompt_seconds = stub._delay() + prompt_tokens * stub.prompt_token_latency
+                time.sleep(prompt_seconds)
+                output = stub.respond(body.get("prompt", ""))
+                tokens = [output[i:i + 4] for i in range(0, len(output), 4)] + ["\n"] * stub.trailing_tokens
+                tokens = tokens[:body.get("options", {}).get("num_predict", len(tokens))]
+                final = {
+                    "model": body.get("model"),
+                    "done": True,
+                    "load_duration": 0,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_seconds * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(stub.token_latency * len(tokens) * 1e9)
+                }
+                if body.get("stream", True):
+                    self._stream(tokens, final)
+                    return
+
+                time.sleep(stub.token_latency * len(tokens))
+                payload = json.dumps({**final, "response": "".join(tokens)}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, tokens: List[str], final: Dict):
+                """Send one NDJSON chunk per token, stopping if the client disconnects."""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunks = [{"model": final["model"], "response": token, "done": False} for token in tokens] + [final]
+                try:
+                    for chunk in chunks:
+                        time.sleep(stub.token_latency if not chunk["done"] else 0)
+                        data = (json.dumps(chunk) + "\n").encode("utf-8")
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    with stub._lock:
+                        stub.disconnects += 1
+                    self.close_connection = True
+
+            def handle(self):
+                # Streaming clients close the connection as soon as they have what they need
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Also a client that timed out during an injected stall
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), GenerateHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub Ollama /api/generate endpoint")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative latency spread")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--trailing-tokens", type=int, default=0, help="Filler tokens generated after the JSON")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0, help="Seconds per uncached prompt token")
+    args = parser.parse_args()
+
+    stub = StubOllamaServer(
+        args.latency, args.jitter, args.port,
+        token_latency=args.token_latency, trailing_tokens=args.trailing_tokens,
+        prompt_token_latency=args.prompt_token_latency
+    ).start()
+    print(f"Stub Ollama listening on {stub.url} ({args.latency}s per request); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
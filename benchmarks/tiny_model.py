@@ -0,0 +1,106 @@
+"""
+Small randomly initialized RoBERTa sentiment classifier for offline benchmarks.
+Same architecture family, tokenizer type and label count as the FABSA model, at a fraction of the size.
+
+Usage: python -m benchmarks.tiny_model /tmp/tiny-roberta
+"""
+
+import argparse
+import glob
+import os
+import pandas as pd
+from typing import List
+
+
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+
+
+def _training_texts(data_glob: str) -> List[str]:
+    texts = []
+    for path in sorted(glob.glob(data_glob)):
+        texts.extend(pd.read_csv(path, usecols=["review"])["review"].dropna().astype(str))
+    return texts
+
+
+def build_tiny_model(
+    output_dir: str,
+    data_glob: str = "data/*_customer_reviews.csv",
+    vocab_size: int = 2000,
+    hidden_size: int = 64,
+    num_layers: int = 2,
+    seed: int = 0
+) -> str:
+    """
+    Save a byte-level BPE tokenizer and an untrained RoBERTa classifier.
+
+    The tokenizer is trained on the bundled reviews so token counts are in the
+    same range as the real model's. Weights are random, so predictions are
+    meaningless; only the cost of running the model matters.
+
+    Args:
+        output_dir: Directory to write; loadable as `SentimentAnalyzer(model_path=output_dir)`
+        data_glob: Review CSVs the tokenizer vocabulary is trained on
+        vocab_size: Tokenizer vocabulary size
+        hidden_size: Transformer width
+        num_layers: Transformer depth
+        seed: Seed for weight initialization
+
+    Returns:
+        output_dir
+    """
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from tokenizers.processors import RobertaProcessing
+    from transformers import PreTrainedTokenizerFast, RobertaConfig, RobertaForSequenceClassification
+
+    if os.path.exists(os.path.join(output_dir, "config.json")):
+        return output_dir
+
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(_training_texts(data_glob), vocab_size=vocab_size, special_tokens=SPECIAL_TOKENS)
+    bpe.post_processor = RobertaProcessing(("</s>", bpe.token_to_id("</s>")), ("<s>", bpe.token_to_id("<s>")))
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe,
+        bos_token="<s>",
+        eos_token="</s>",
+        unk_token="<unk>",
+        pad_token="<pad>",
+        mask_token="<mask>",
+        cls_token="<s>",
+        sep_token="</s>",
+        model_max_length=512
+    )
+    tokenizer.save_pretrained(output_dir)
+
+    torch.manual_seed(seed)
+    config = RobertaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=2,
+        intermediate_size=hidden_size * 2,
+        max_position_embeddings=514,
+        num_labels=3,
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id
+    )
+    RobertaForSequenceClassification(config).save_pretrained(output_dir)
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a tiny random RoBERTa classifier for offline benchmarks")
+    parser.add_argument("output_dir")
+    parser.add_argument("--data", default="data/*_customer_reviews.csv")
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    args = parser.parse_args()
+
+    build_tiny_model(args.output_dir, args.data, hidden_size=args.hidden_size, num_layers=args.layers)
+    print(f"Saved tiny model to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
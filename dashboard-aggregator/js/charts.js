@@ -346,11 +346,11 @@ function renderPlatformComparison(data) {
     const rightCounts = {};
 
     leftData.forEach(d => {
-        leftCounts[d.subcategory] = (leftCounts[d.subcategory] || 0) + 1;
+        leftCounts[d.subcategory] = (leftCounts[d.subcategory] || 0) + d.count;
     });
 
     rightData.forEach(d => {
-        rightCounts[d.subcategory] = (rightCounts[d.subcategory] || 0) + 1;
+        rightCounts[d.subcategory] = (rightCounts[d.subcategory] || 0) + d.count;
     });
 
     // Get all subcategories and sort by combined total
@@ -1,6 +1,16 @@
 // Global data storage
+// Aspect cells: one per day x platform x subcategory x sentiment, weighted by `count`
 let rawData = [];
 let filteredData = [];
+// Unique-review cells: day x platform x bitmask over `parentAspects`
+let reviewCells = [];
+let filteredReviews = [];
+// Subcategory co-occurrence cells (s1 === s2 counts reviews mentioning s1)
+let pairCells = [];
+let filteredPairs = [];
+let parentAspects = [];
+let subcategoryParent = {};
+let exampleReviews = {};
 let dateRange = { start: null, end: null };
 
 // Initialize dashboard
@@ -15,8 +25,67 @@ async function initializeDashboard() {
     }
 }
 
-// Load CSV data
-function loadData() {
+// Load the pre-aggregated rollup (python -m src.rollups), falling back to the full CSV
+async function loadData() {
+    try {
+        const response = await fetch('data/rollup.json');
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        loadRollup(await response.json());
+        console.log(`Loaded rollup with ${rawData.length} aspect cells`);
+    } catch (error) {
+        console.warn('Rollup not available, loading CSV instead:', error);
+        await loadCsv();
+    }
+    filteredData = [...rawData];
+}
+
+// Expand the index-encoded rollup cells
+function loadRollup(rollup) {
+    const day = i => (i >= 0 ? new Date(rollup.days[i]) : new Date(NaN));
+
+    parentAspects = rollup.parent_aspects;
+    rawData = rollup.aspects.map(([d, p, s, a, sentiment, count, ratingSum, ratedCount]) => ({
+        date: day(d),
+        platform: rollup.platforms[p],
+        subcategory: rollup.subcategories[s],
+        parent_aspect: rollup.parent_aspects[a],
+        sentiment: rollup.sentiments[sentiment],
+        count,
+        ratingSum,
+        ratedCount
+    }));
+    reviewCells = rollup.reviews.map(([d, p, mask, count, ratingSum, ratedCount]) => ({
+        date: day(d),
+        platform: rollup.platforms[p],
+        mask,
+        count,
+        ratingSum,
+        ratedCount
+    }));
+    pairCells = rollup.pairs.map(([d, p, s1, s2, count]) => ({
+        date: day(d),
+        platform: rollup.platforms[p],
+        s1: rollup.subcategories[s1],
+        s2: rollup.subcategories[s2],
+        count
+    }));
+
+    // Keep GrubHub cells only
+    rawData = rawData.filter(cell => cell.platform === 'grubhub');
+    reviewCells = reviewCells.filter(cell => cell.platform === 'grubhub');
+    pairCells = pairCells.filter(cell => cell.platform === 'grubhub');
+
+    exampleReviews = {};
+    rollup.examples.forEach(([p, s, sentiment, items]) => {
+        exampleReviews[`${rollup.platforms[p]}|${rollup.subcategories[s]}|${rollup.sentiments[sentiment]}`] = items;
+    });
+    indexSubcategoryParents();
+}
+
+// Load CSV data and turn each row into a cell of weight 1
+function loadCsv() {
     return new Promise((resolve, reject) => {
         Papa.parse('data/complete_analysis_20251003_234035.csv', {
             download: true,
@@ -24,7 +93,7 @@ function loadData() {
             skipEmptyLines: true,
             complete: (results) => {
                 // Filter for GrubHub platform only
-                rawData = results.data
+                buildCellsFromRows(results.data
                     .filter(row => row.platform === 'grubhub')
                     .map(row => ({
                         review_id: row.review_id,
@@ -36,8 +105,7 @@ function loadData() {
                         rating: parseInt(row.rating),
                         date: new Date(row.date),
                         platform: row.platform
-                    }));
-                filteredData = [...rawData];
+                    })));
                 console.log(`Loaded ${rawData.length} GrubHub records`);
                 resolve();
             },
@@ -46,6 +114,73 @@ function loadData() {
     });
 }
 
+// Build rollup-shaped cells from per-aspect rows
+function buildCellsFromRows(rows) {
+    const rated = row => !isNaN(row.rating);
+    rawData = rows.map(row => ({
+        ...row,
+        count: 1,
+        ratingSum: rated(row) ? row.rating : 0,
+        ratedCount: rated(row) ? 1 : 0
+    }));
+
+    const reviews = {};
+    rows.forEach(row => {
+        if (!reviews[row.review_id]) {
+            reviews[row.review_id] = { first: row, parents: new Set(), subcategories: new Set() };
+        }
+        reviews[row.review_id].parents.add(row.parent_aspect);
+        reviews[row.review_id].subcategories.add(row.subcategory);
+    });
+
+    parentAspects = [...new Set(rows.map(row => row.parent_aspect))];
+    reviewCells = [];
+    pairCells = [];
+    Object.values(reviews).forEach(({ first, parents, subcategories }) => {
+        reviewCells.push({
+            date: first.date,
+            platform: first.platform,
+            mask: parentMask([...parents]),
+            count: 1,
+            ratingSum: rated(first) ? first.rating : 0,
+            ratedCount: rated(first) ? 1 : 0
+        });
+        const sorted = [...subcategories].sort();
+        sorted.forEach((s1, i) => {
+            sorted.slice(i).forEach(s2 => {
+                pairCells.push({ date: first.date, platform: first.platform, s1, s2, count: 1 });
+            });
+        });
+    });
+    indexSubcategoryParents();
+}
+
+// Map each subcategory to its parent aspect
+function indexSubcategoryParents() {
+    subcategoryParent = {};
+    rawData.forEach(cell => {
+        subcategoryParent[cell.subcategory] = cell.parent_aspect;
+    });
+}
+
+// Bitmask of parent aspects, matching the review cell masks
+function parentMask(aspects) {
+    return aspects.reduce((mask, aspect) => {
+        const bit = parentAspects.indexOf(aspect);
+        return bit >= 0 ? mask | (1 << bit) : mask;
+    }, 0);
+}
+
+// Sum cell weights
+function sumCounts(cells) {
+    return cells.reduce((total, cell) => total + cell.count, 0);
+}
+
+// Sampled example reviews for one platform, subcategory and sentiment (rollup only)
+function getExampleReviews(platform, subcategory, sentiment) {
+    return exampleReviews[`${platform}|${subcategory}|${sentiment}`] || [];
+}
+
 // Set default date range from data
 function setDefaultDateRange() {
     const dates = rawData.map(d => d.date).filter(d => !isNaN(d));
@@ -70,27 +205,27 @@ function applyFilters() {
         ? Array.from(checkedBoxes).map(cb => cb.value)
         : ['all'];
 
-    filteredData = rawData.filter(row => {
-        const dateMatch = row.date >= startDate && row.date <= endDate;
-        const aspectMatch = selectedAspects.includes('all') || selectedAspects.includes(row.parent_aspect);
-        return dateMatch && aspectMatch;
-    });
+    const allAspects = selectedAspects.includes('all');
+    const dateMatch = cell => cell.date >= startDate && cell.date <= endDate;
+    const aspectMatch = aspect => allAspects || selectedAspects.includes(aspect);
+    const selectedMask = parentMask(selectedAspects);
+
+    filteredData = rawData.filter(cell => dateMatch(cell) && aspectMatch(cell.parent_aspect));
+    // A review counts if any of its aspects is selected
+    filteredReviews = reviewCells.filter(cell => dateMatch(cell) && (allAspects || (cell.mask & selectedMask) !== 0));
+    filteredPairs = pairCells.filter(cell =>
+        dateMatch(cell) && aspectMatch(subcategoryParent[cell.s1]) && aspectMatch(subcategoryParent[cell.s2])
+    );
 
     return filteredData;
 }
 
-// Calculate average rating (per unique review, not per row)
+// Calculate average rating (per unique review, not per row; uses the filtered review cells)
 function calculateAvgRating(data) {
-    // Group by review_id and take first rating (all rows with same review_id have same rating)
-    const ratingsByReview = {};
-    data.forEach(d => {
-        if (!ratingsByReview[d.review_id] && !isNaN(d.rating)) {
-            ratingsByReview[d.review_id] = d.rating;
-        }
-    });
-    const ratings = Object.values(ratingsByReview);
-    if (ratings.length === 0) return 0;
-    return (ratings.reduce((a, b) => a + b, 0) / ratings.length).toFixed(2);
+    const ratingSum = filteredReviews.reduce((total, cell) => total + cell.ratingSum, 0);
+    const rated = filteredReviews.reduce((total, cell) => total + cell.ratedCount, 0);
+    if (rated === 0) return 0;
+    return (ratingSum / rated).toFixed(2);
 }
 
 // Calculate intensity (6 - rating) for negative reviews
@@ -98,13 +233,13 @@ function calculateIntensity(data) {
     const negativeReviews = data.filter(d => d.sentiment === 'negative');
     const intensityBySubcat = {};
 
-    negativeReviews.forEach(row => {
-        const intensity = 6 - row.rating;
-        if (!intensityBySubcat[row.subcategory]) {
-            intensityBySubcat[row.subcategory] = { total: 0, count: 0 };
+    negativeReviews.forEach(cell => {
+        const intensity = 6 * cell.ratedCount - cell.ratingSum;
+        if (!intensityBySubcat[cell.subcategory]) {
+            intensityBySubcat[cell.subcategory] = { total: 0, count: 0 };
         }
-        intensityBySubcat[row.subcategory].total += intensity;
-        intensityBySubcat[row.subcategory].count += 1;
+        intensityBySubcat[cell.subcategory].total += intensity;
+        intensityBySubcat[cell.subcategory].count += cell.count;
     });
 
     return Object.entries(intensityBySubcat)
@@ -122,18 +257,25 @@ function getTopNegativeSubcategory(data) {
     return intensityData.length > 0 ? intensityData[0].subcategory : 'N/A';
 }
 
+// Count reviews mentioning both subcategories (or one, when s1 === s2) in the filtered pair cells
+function countReviewsWith(s1, s2 = s1) {
+    const [first, second] = s1 < s2 ? [s1, s2] : [s2, s1];
+    return filteredPairs
+        .filter(cell => cell.s1 === first && cell.s2 === second)
+        .reduce((total, cell) => total + cell.count, 0);
+}
+
 // Calculate co-occurrence correlation matrix for SUBCATEGORIES
 function calculateCorrelationMatrix(data) {
     const subcategories = [...new Set(data.map(d => d.subcategory))].sort();
-    const reviewGroups = {};
 
-    // Group by review_id
-    data.forEach(row => {
-        if (!reviewGroups[row.review_id]) {
-            reviewGroups[row.review_id] = new Set();
-        }
-        reviewGroups[row.review_id].add(row.subcategory);
+    // Reviews per subcategory pair, summed once over the filtered cells
+    const together = {};
+    filteredPairs.forEach(cell => {
+        const key = `${cell.s1}|${cell.s2}`;
+        together[key] = (together[key] || 0) + cell.count;
     });
+    const both = (s1, s2) => together[s1 < s2 ? `${s1}|${s2}` : `${s2}|${s1}`] || 0;
 
     // Calculate Jaccard Similarity (co-occurrence rate)
     const matrix = {};
@@ -143,22 +285,9 @@ function calculateCorrelationMatrix(data) {
             if (s1 === s2) {
                 matrix[s1][s2] = 1.0; // Diagonal is always 1
             } else {
-                // Count intersection (both appear together)
-                let intersection = 0;
-                // Count union (either appears)
-                let union = 0;
-
-                Object.values(reviewGroups).forEach(subcatSet => {
-                    const hasS1 = subcatSet.has(s1);
-                    const hasS2 = subcatSet.has(s2);
-
-                    if (hasS1 && hasS2) {
-                        intersection++;
-                    }
-                    if (hasS1 || hasS2) {
-                        union++;
-                    }
-                });
+                // Intersection (both appear together) and union (either appears)
+                const intersection = both(s1, s2);
+                const union = both(s1, s1) + both(s2, s2) - intersection;
 
                 // Jaccard Similarity = intersection / union
                 matrix[s1][s2] = union > 0 ? intersection / union : 0;
@@ -190,12 +319,10 @@ function getTopCorrelation(data) {
 // Calculate percentage of reviews mentioning top aspect
 function calculateTopAspectPercentage(data) {
     const topNegative = getTopNegativeSubcategory(data);
-    const uniqueReviewIds = new Set(data.map(d => d.review_id));
-    const reviewsWithTopAspect = new Set(
-        data.filter(d => d.subcategory === topNegative).map(d => d.review_id)
-    );
+    const uniqueReviews = sumCounts(filteredReviews);
+    const reviewsWithTopAspect = countReviewsWith(topNegative);
 
-    const percentage = (reviewsWithTopAspect.size / uniqueReviewIds.size) * 100;
+    const percentage = (reviewsWithTopAspect / uniqueReviews) * 100;
     return { percentage: percentage.toFixed(1), subcategory: topNegative };
 }
 
@@ -204,8 +331,8 @@ function getNegativeByParentAspect(data) {
     const negative = data.filter(d => d.sentiment === 'negative');
     const counts = {};
 
-    negative.forEach(row => {
-        counts[row.parent_aspect] = (counts[row.parent_aspect] || 0) + 1;
+    negative.forEach(cell => {
+        counts[cell.parent_aspect] = (counts[cell.parent_aspect] || 0) + cell.count;
     });
 
     return counts;
@@ -226,22 +353,24 @@ function getSubcategoryTreemapData(data, parentFilter = 'all') {
 
     const subcatData = {};
 
-    filtered.forEach(row => {
-        if (!subcatData[row.subcategory]) {
-            subcatData[row.subcategory] = {
+    filtered.forEach(cell => {
+        if (!subcatData[cell.subcategory]) {
+            subcatData[cell.subcategory] = {
                 count: 0,
                 totalRating: 0,
-                parent: row.parent_aspect
+                rated: 0,
+                parent: cell.parent_aspect
             };
         }
-        subcatData[row.subcategory].count += 1;
-        subcatData[row.subcategory].totalRating += row.rating;
+        subcatData[cell.subcategory].count += cell.count;
+        subcatData[cell.subcategory].totalRating += cell.ratingSum;
+        subcatData[cell.subcategory].rated += cell.ratedCount;
     });
 
     return Object.entries(subcatData).map(([subcat, data]) => ({
         subcategory: subcat,
         count: data.count,
-        avgRating: (data.totalRating / data.count).toFixed(2),
+        avgRating: (data.rated > 0 ? data.totalRating / data.rated : 0).toFixed(2),
         parent: data.parent
     }));
 }
@@ -250,9 +379,9 @@ function getSubcategoryTreemapData(data, parentFilter = 'all') {
 function getSentimentDistribution(data) {
     const counts = { positive: 0, negative: 0, neutral: 0 };
 
-    data.forEach(row => {
-        if (counts.hasOwnProperty(row.sentiment)) {
-            counts[row.sentiment] += 1;
+    data.forEach(cell => {
+        if (counts.hasOwnProperty(cell.sentiment)) {
+            counts[cell.sentiment] += cell.count;
         }
     });
 
@@ -264,7 +393,7 @@ function updateKPIs(data) {
     const avgRating = calculateAvgRating(data);
     const topNegative = getTopNegativeSubcategory(data);
     const topCorr = getTopCorrelation(data);
-    const uniqueReviews = new Set(data.map(d => d.review_id)).size;
+    const uniqueReviews = sumCounts(filteredReviews);
 
     document.getElementById('avgRating').textContent = avgRating;
     document.getElementById('topNegative').textContent = topNegative.replace(/_/g, ' ');
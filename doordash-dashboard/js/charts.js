@@ -348,11 +348,11 @@ function renderComparisonPyramid(data, leftPlatform, rightPlatform) {
     const rightCounts = {};
 
     leftNegative.forEach(row => {
-        leftCounts[row.subcategory] = (leftCounts[row.subcategory] || 0) + 1;
+        leftCounts[row.subcategory] = (leftCounts[row.subcategory] || 0) + row.count;
     });
 
     rightNegative.forEach(row => {
-        rightCounts[row.subcategory] = (rightCounts[row.subcategory] || 0) + 1;
+        rightCounts[row.subcategory] = (rightCounts[row.subcategory] || 0) + row.count;
     });
 
     // Get all unique subcategories and sort by total mentions
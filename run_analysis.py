@@ -2,87 +2,360 @@
 Main script to run aspect-based sentiment analysis on all review datasets.
 """
 
-import pandas as pd
 import os
+import requests
+from src.aspect_extraction import AspectExtractor
+from src.columnar_output import PartitionedResultStore, export_dashboard_csv, load_aspects, load_reviews, write_normalized
+from src.dedup import ReviewDeduplicator
+from src.distilled_extractor import DistilledAspectExtractor, DistilledAspectModel
+from src.extraction_cache import ExtractionCache
+from src.ingest import iter_reviews
+from src.manifest import ReviewManifest
+from src.metrics import REGISTRY
+from src.model_server import RemoteSentimentAnalyzer
+from src.parallel_sentiment import ShardedSentimentAnalyzer
 from src.pipeline import ABSAPipeline
+from src.prefilter import LexicalPrefilter
+from src.result_store import JsonlResultStore
+from src.rollups import rebuild_rollup, update_rollup
+from src.scheduler import PlatformJob, StagedScheduler
+from src.sentiment_analyzer import SentimentAnalyzer
+from src.sentiment_cache import SentimentCache
 from datetime import datetime
+from typing import Optional
 
 
-def main():
+def main(
+    incremental: bool = False,
+    extract_concurrency: int = 2,
+    sentiment_concurrency: int = 1,
+    metrics_port: Optional[int] = None,
+    sentiment_server: Optional[str] = None,
+    structured_output: bool = False,
+    warm_llm: bool = False,
+    distilled_model: Optional[str] = None,
+    distilled_threshold: float = 0.9,
+    sentiment_workers: int = 0,
+    reviews_per_prompt: int = 1,
+    prefilter: bool = False,
+    prefilter_max_words: int = 6,
+    dedup: bool = False,
+    near_duplicate_threshold: Optional[float] = None
+):
+    """
+    Analyze all platform review files.
+
+    Args:
+        incremental: Only analyze reviews that are new or edited since the last
+            incremental run (tracked in output/manifest.sqlite) and merge them into
+            the platform/day partitions under output/results/
+        extract_concurrency: Review groups in LLM extraction at once
+        sentiment_concurrency: Review groups in sentiment inference at once
+        metrics_port: Serve live metrics on http://127.0.0.1:<port>/metrics while running
+        sentiment_server: URL of a warm model server (`python -m src.model_server`) to use
+            instead of loading the sentiment model in this process
+        structured_output: Constrain LLM replies to the subcategory JSON schema and stop
+            reading (and generating) as soon as the JSON is complete
+        warm_llm: Load the Ollama model and evaluate the static instructions before the run,
+            keep the model loaded between requests and send the instructions as a
+            shared system-prompt prefix
+        distilled_model: Model saved by `python -m src.distilled_extractor train`; it answers
+            confident reviews locally and only sends the rest to the LLM
+        distilled_threshold: Minimum confidence for a local answer (higher = more LLM requests)
+        sentiment_workers: If > 1, shard sentiment inference across this many worker
+            processes, each holding a model copy (for CPU-only machines); the sentiment
+            memo cache and token store are not used then
+        reviews_per_prompt: Reviews packed into one LLM request; slots without a usable
+            answer are retried one review at a time
+        prefilter: Assign overall_satisfaction to short reviews without any subcategory
+            keyword instead of asking the LLM
+        prefilter_max_words: Longest review (in words) the prefilter may answer
+        dedup: Analyze exact duplicate reviews (after normalizing case, punctuation and
+            whitespace) once and reuse the result for every copy
+        near_duplicate_threshold: If set, also merge reviews whose estimated MinHash
+            Jaccard similarity is at least this value (implies dedup)
+    """
     # Initialize pipeline
     print("=" * 80)
     print("ASPECT-BASED SENTIMENT ANALYSIS PIPELINE")
     print("=" * 80)
     print()
 
-    pipeline = ABSAPipeline()
-
     # Input files
     data_dir = "/workspace/data"
     output_dir = "/workspace/output"
     os.makedirs(output_dir, exist_ok=True)
 
+    if metrics_port is not None:
+        REGISTRY.serve(metrics_port)
+
+    # Reuse LLM extractions from previous runs with the same model and prompt
+    extraction_cache = ExtractionCache(os.path.join(output_dir, "extraction_cache.sqlite"))
+    if sentiment_server:
+        sentiment_analyzer = RemoteSentimentAnalyzer(sentiment_server)
+    elif sentiment_workers > 1:
+        sentiment_analyzer = ShardedSentimentAnalyzer(num_workers=sentiment_workers)
+    else:
+        # Loaded on first use; review token IDs are kept between runs, so reruns skip most tokenization
+        # Results of earlier runs are reused while the model and its weights are unchanged
+        sentiment_cache = SentimentCache(os.path.join(output_dir, "sentiment_cache.sqlite"))
+        sentiment_analyzer = SentimentAnalyzer(
+            token_store_dir=os.path.join(output_dir, "token_store"),
+            memo_cache=sentiment_cache
+        )
+    lexical_prefilter = (
+        LexicalPrefilter(AspectExtractor.SUBCATEGORY_DEFINITIONS, max_words=prefilter_max_words)
+        if prefilter else None
+    )
+    aspect_extractor = AspectExtractor(
+        cache=extraction_cache,
+        prefilter=lexical_prefilter,
+        structured_output=structured_output,
+        keep_alive="30m" if warm_llm else None,
+        static_prefix=warm_llm,
+        reviews_per_prompt=reviews_per_prompt
+    )
+    if warm_llm:
+        try:
+            print(f"Warmed up {aspect_extractor.model}: {aspect_extractor.warm_up()}")
+        except requests.RequestException as e:
+            print(f"LLM warm-up failed ({e}); continuing without it")
+    if distilled_model:
+        aspect_extractor = DistilledAspectExtractor(
+            DistilledAspectModel.load(distilled_model), aspect_extractor, threshold=distilled_threshold
+        )
+    deduplicator = None
+    if dedup or near_duplicate_threshold is not None:
+        deduplicator = ReviewDeduplicator(
+            near_duplicates=near_duplicate_threshold is not None,
+            threshold=near_duplicate_threshold if near_duplicate_threshold is not None else 0.9
+        )
+    pipeline = ABSAPipeline(
+        aspect_extractor=aspect_extractor,
+        sentiment_analyzer=sentiment_analyzer,
+        deduplicator=deduplicator
+    )
+
+    if incremental:
+        manifest = ReviewManifest(os.path.join(output_dir, "manifest.sqlite"))
+        results_root = os.path.join(output_dir, "results")
+
     datasets = [
         "doordash_customer_reviews.csv",
         "ubereats_customer_reviews.csv",
         "grubhub_customer_reviews.csv"
     ]
 
-    all_results = []
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    final_output = os.path.join(output_dir, f"complete_analysis_{timestamp}.csv")
+    jobs = []
 
     for dataset_file in datasets:
         dataset_path = os.path.join(data_dir, dataset_file)
         platform = dataset_file.replace("_customer_reviews.csv", "")
 
-        print(f"\nProcessing {platform.upper()} reviews...")
-        print("-" * 80)
+        # Stream reviews in bounded chunks, tagging each with its platform
+        reviews = iter_reviews(dataset_path, chunk_size=1000, platform=platform)
+        print(f"Streaming {platform.upper()} reviews from {dataset_file}")
 
-        # Load data
-        df = pd.read_csv(dataset_path)
-        print(f"Loaded {len(df)} reviews from {dataset_file}")
+        if incremental:
+            # Skip reviews whose id, text and date match the manifest; flushes stage
+            # rows per platform/day partition, and each touched partition is rewritten once
+            reviews = manifest.select_changed(reviews, platform, review_column="review")
+            store = PartitionedResultStore(results_root, platform, manifest)
+        else:
+            # Append to a resumable per-platform results file
+            store = JsonlResultStore(os.path.join(output_dir, f"{platform}_results.jsonl"))
 
-        # Add platform column
-        df['platform'] = platform
+        jobs.append(PlatformJob(platform, reviews, store))
 
-        # Process reviews
-        results_df = pipeline.process_dataframe(
-            df,
-            review_column="review",
-            batch_size=500,
-            save_checkpoints=True,
-            checkpoint_path=os.path.join(output_dir, f"{platform}_checkpoint.csv")
-        )
+    # All platforms share one extractor and one sentiment model; LLM extraction
+    # and sentiment classification run as overlapping stages
+    print("\nProcessing all platforms...")
+    print("-" * 80)
+    scheduler = StagedScheduler(
+        pipeline,
+        extract_concurrency=extract_concurrency,
+        sentiment_concurrency=sentiment_concurrency
+    )
+    scheduler.run(jobs, review_column="review", batch_size=500)
+    print()
+    scheduler.print_report()
 
-        all_results.append(results_df)
+    stores = [job.store for job in jobs]
+    for platform, _, store in jobs:
+        if incremental:
+            store.compact()
+            print(f"\nMerged {len(store.processed_ids)} new or edited {platform} reviews "
+                  f"into {len(store.partitions_written)} partitions")
+            continue
 
         # Save individual platform results
         output_path = os.path.join(output_dir, f"{platform}_analysis.csv")
-        results_df.to_csv(output_path, index=False)
+        store.export_csv(output_path)
         print(f"\nSaved {platform} results to {output_path}")
 
-    # Combine all results
+    # Combine all results into normalized Parquet, chunk by chunk
     print("\n" + "=" * 80)
     print("COMBINING ALL RESULTS")
     print("=" * 80)
 
-    combined_df = pd.concat(all_results, ignore_index=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    final_output = os.path.join(output_dir, f"complete_analysis_{timestamp}.csv")
-    combined_df.to_csv(final_output, index=False)
+    if incremental:
+        # The partitions already are the combined output
+        final_output_dir = results_root
+        total_reviews = len(load_reviews(final_output_dir, columns=['review_id']))
+        total_pairs = len(load_aspects(final_output_dir, columns=['review_id']))
+        print(f"Manifest: {manifest.stats()}")
+    else:
+        final_output_dir = os.path.join(output_dir, f"complete_analysis_{timestamp}")
+        total_reviews, total_pairs = write_normalized(
+            (chunk for store in stores for chunk in store.iter_chunks()),
+            final_output_dir
+        )
 
-    print(f"\nFinal results saved to: {final_output}")
-    print(f"Total reviews analyzed: {len(combined_df['review_id'].unique())}")
-    print(f"Total aspect-sentiment pairs: {len(combined_df)}")
+    # Wide CSV export for the HTML dashboards
+    export_dashboard_csv(final_output_dir, final_output)
+
+    print(f"\nFinal results saved to: {final_output_dir} (Parquet) and {final_output} (CSV)")
+    print(f"Total reviews analyzed: {total_reviews}")
+    print(f"Total aspect-sentiment pairs: {total_pairs}")
+
+    # Fold new results into the pre-aggregated dashboard rollup (copy it to <dashboard>/data/rollup.json)
+    rollup_path = os.path.join(output_dir, "rollup.json")
+    if incremental:
+        # Edited reviews replace earlier rows, so the rollup is recounted from the partitions
+        added, rollup_size = rebuild_rollup(final_output_dir, rollup_path)
+    else:
+        added, rollup_size = update_rollup(
+            [store.path for store in stores],
+            os.path.join(output_dir, "rollup_state.json"),
+            rollup_path
+        )
+    print(f"Dashboard rollup: {rollup_path} ({rollup_size / 1024:.1f} KB, {added} new reviews)")
 
     # Summary statistics
+    combined_df = load_aspects(final_output_dir, columns=['platform', 'subcategory', 'sentiment'])
     print("\n" + "=" * 80)
     print("SUMMARY STATISTICS")
     print("=" * 80)
-    print(combined_df.groupby(['platform', 'sentiment']).size().unstack(fill_value=0))
+    print(combined_df.groupby(['platform', 'sentiment'], observed=True).size().unstack(fill_value=0))
     print()
     print("Top subcategories:")
     print(combined_df['subcategory'].value_counts().head(10))
+    print()
+    print(f"Extraction cache: {extraction_cache.stats()}")
+    print(f"LLM extraction: {aspect_extractor.throughput_report()}")
+    if lexical_prefilter is not None:
+        print(f"Prefilter: {lexical_prefilter.stats()}")
+    if deduplicator is not None:
+        print(f"Dedup: {deduplicator.stats()}")
+    if isinstance(sentiment_analyzer, ShardedSentimentAnalyzer):
+        print("Sentiment workers:")
+        sentiment_analyzer.print_throughput()
+        sentiment_analyzer.close()
+    elif not sentiment_server:
+        print(f"Sentiment cache: {sentiment_cache.stats()}")
+    # Writes the access times of cache hits still buffered
+    extraction_cache.close()
+
+    # Where the time went, per stage
+    print("\n" + "=" * 80)
+    print("STAGE TIMINGS")
+    print("=" * 80)
+    REGISTRY.print_summary()
+    REGISTRY.write(os.path.join(output_dir, "metrics.json"))
+    REGISTRY.write(os.path.join(output_dir, "metrics.prom"))
+    REGISTRY.stop_serving()
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run aspect-based sentiment analysis on all review datasets")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only analyze new or edited reviews and merge them into output/results/ partitions"
+    )
+    parser.add_argument("--extract-concurrency", type=int, default=2, help="Review groups in LLM extraction at once")
+    parser.add_argument("--sentiment-concurrency", type=int, default=1, help="Review groups in sentiment inference at once")
+    parser.add_argument("--metrics-port", type=int, help="Serve live metrics over HTTP on this port")
+    parser.add_argument(
+        "--sentiment-server",
+        help="Use the already loaded model of a running `python -m src.model_server` (e.g. http://127.0.0.1:8765)"
+    )
+    parser.add_argument(
+        "--structured-output",
+        action="store_true",
+        help="Schema-constrained, streamed LLM extraction that stops as soon as the JSON array is complete"
+    )
+    parser.add_argument(
+        "--warm-llm",
+        action="store_true",
+        help="Warm the Ollama model up front, pin it with keep_alive and send the instructions as a cached system prompt"
+    )
+    parser.add_argument(
+        "--distilled-model",
+        help="Answer confident reviews with a distilled extractor (python -m src.distilled_extractor train)"
+    )
+    parser.add_argument(
+        "--distilled-threshold",
+        type=float,
+        default=0.9,
+        help="Minimum distilled-model confidence to skip the LLM"
+    )
+    parser.add_argument(
+        "--sentiment-workers",
+        type=int,
+        default=0,
+        help="Shard sentiment inference across this many worker processes (CPU-only machines)"
+    )
+    parser.add_argument(
+        "--reviews-per-prompt",
+        type=int,
+        default=1,
+        help="Pack this many reviews into each LLM request (1 = one request per review)"
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="Assign overall_satisfaction to short reviews without subcategory keywords instead of asking the LLM"
+    )
+    parser.add_argument(
+        "--prefilter-max-words",
+        type=int,
+        default=6,
+        help="Longest review (in words) the prefilter may answer"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Analyze duplicate reviews once (exact match after normalizing case, punctuation and whitespace)"
+    )
+    parser.add_argument(
+        "--near-duplicates",
+        type=float,
+        metavar="THRESHOLD",
+        help="Also merge near-duplicate reviews whose MinHash similarity is at least THRESHOLD (e.g. 0.9)"
+    )
+    args = parser.parse_args()
+    if args.sentiment_workers > 1 and args.sentiment_server:
+        parser.error("--sentiment-workers and --sentiment-server are mutually exclusive")
+
+    main(
+        incremental=args.incremental,
+        extract_concurrency=args.extract_concurrency,
+        sentiment_concurrency=args.sentiment_concurrency,
+        metrics_port=args.metrics_port,
+        sentiment_server=args.sentiment_server,
+        structured_output=args.structured_output,
+        warm_llm=args.warm_llm,
+        distilled_model=args.distilled_model,
+        distilled_threshold=args.distilled_threshold,
+        sentiment_workers=args.sentiment_workers,
+        reviews_per_prompt=args.reviews_per_prompt,
+        prefilter=args.prefilter,
+        prefilter_max_words=args.prefilter_max_words,
+        dedup=args.dedup,
+        near_duplicate_threshold=args.near_duplicates
+    )
@@ -0,0 +1,326 @@
+"""
+Local HTTP inference server for ABSAPipeline with dynamic micro-batching.
+Concurrent requests are queued and coalesced into micro-batches, so each batch costs one
+round of concurrent LLM extraction and a few batched sentiment forward passes.
+
+Usage: python -m src.absa_server --port 8766 --max-batch-size 32 --max-wait-ms 25
+Then:  curl -s localhost:8766/analyze -d '{"review": "Pizza was cold and the driver was rude"}'
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, NamedTuple, Optional
+from src.metrics import REGISTRY
+from src.pipeline import ABSAPipeline
+
+
+class _QueuedReview(NamedTuple):
+    review_text: str
+    future: Future
+    enqueued_at: float
+
+
+class _ABSAHTTPServer(ThreadingHTTPServer):
+    # Many clients connect at once; the default listen backlog of 5 resets the overflow
+    request_queue_size = 256
+    # Handler threads are joined on shutdown, so every accepted request gets its reply
+    daemon_threads = False
+
+
+class ABSAServer:
+    """HTTP front end that micro-batches reviews through one ABSAPipeline."""
+
+    def __init__(
+        self,
+        pipeline: ABSAPipeline,
+        port: int = 8766,
+        host: str = "127.0.0.1",
+        max_batch_size: int = 32,
+        max_wait_ms: float = 25,
+        max_queue: int = 1000,
+        request_timeout: float = 300
+    ):
+        """
+        Args:
+            pipeline: Pipeline whose `process_reviews` analyzes each micro-batch
+            port: Port to listen on (0 picks a free one)
+            host: Interface to bind; localhost by default
+            max_batch_size: Most reviews analyzed in one micro-batch
+            max_wait_ms: How long the first review of a batch waits for others to join it
+            max_queue: Reviews allowed to wait for a batch; requests beyond it get 429,
+                and a single request with more reviews than this gets 413
+            request_timeout: Seconds a request waits for its results before a 504
+        """
+        self.pipeline = pipeline
+        self.host = host
+        self.port = port
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+
+        self.ready = False
+        self.draining = False
+        self.started_at = None
+        self.batches = 0
+        self.reviews_served = 0
+        self.in_flight = 0
+        self._queue: Deque[_QueuedReview] = deque()
+        self._condition = threading.Condition()
+        self._batcher: Optional[threading.Thread] = None
+        self._server: Optional[_ABSAHTTPServer] = None
+
+    def submit(self, review_texts: List[str]) -> Optional[List[Future]]:
+        """
+        Queue reviews for the next micro-batches.
+
+        Returns:
+            One future per review (resolving to its analysis), or None if the
+            queue has no room for all of them or the server is draining
+        """
+        with self._condition:
+            if self.draining or len(self._queue) + len(review_texts) > self.max_queue:
+                return None
+            now = time.monotonic()
+            futures = [Future() for _ in review_texts]
+            self._queue.extend(_QueuedReview(text, future, now) for text, future in zip(review_texts, futures))
+            self._condition.notify_all()
+        return futures
+
+    def _next_batch(self) -> List[_QueuedReview]:
+        """Block until a batch is full or its oldest review has waited max_wait; empty once drained."""
+        with self._condition:
+            while not self._queue:
+                if self.draining:
+                    return []
+                self._condition.wait()
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            # While draining, flush what is queued without waiting for more
+            while len(self._queue) < self.max_batch_size and not self.draining:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+            self.in_flight += len(batch)
+        return batch
+
+    def _run_batches(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            start_time = time.monotonic()
+            for item in batch:
+                REGISTRY.observe("absa_server_queue_wait_seconds", start_time - item.enqueued_at)
+            try:
+                analyses = self.pipeline.process_reviews([item.review_text for item in batch])
+            except Exception as e:
+                print(f"Error analyzing a batch of {len(batch)} reviews: {e}")
+                REGISTRY.inc("absa_server_batch_errors_total")
+                for item in batch:
+                    item.future.set_exception(e)
+            else:
+                for item, analysis in zip(batch, analyses):
+                    item.future.set_result(analysis)
+            REGISTRY.observe("absa_server_batch_seconds", time.monotonic() - start_time)
+            REGISTRY.inc("absa_server_batches_total")
+            REGISTRY.inc("absa_server_reviews_total", len(batch))
+            with self._condition:
+                self.in_flight -= len(batch)
+                self.batches += 1
+                self.reviews_served += len(batch)
+                self._condition.notify_all()
+
+    def health(self) -> Dict[str, object]:
+        with self._condition:
+            queued, in_flight = len(self._queue), self.in_flight
+        return {
+            "status": "draining" if self.draining else ("ready" if self.ready else "starting"),
+            "queued": queued,
+            "in_flight": in_flight,
+            "batches": self.batches,
+            "reviews_served": self.reviews_served,
+            "mean_batch_size": round(self.reviews_served / self.batches, 2) if self.batches else 0.0,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0.0
+        }
+
+    def start(self) -> "ABSAServer":
+        """Serve from background threads; /ready reports 200 once the sentiment model is loaded."""
+        absa_server = self
+
+        class ABSAHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Idle keep-alive connections are closed, so shutdown does not wait on them for long
+            timeout = 5
+
+            def _reply(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if absa_server.draining:
+                    self.send_header("Connection", "close")
+                    self.close_connection = True
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, absa_server.health())
+                elif self.path == "/ready":
+                    health = absa_server.health()
+                    self._reply(200 if health["status"] == "ready" else 503, health)
+                elif self.path == "/metrics":
+                    payload = REGISTRY.to_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                else:
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+
+            def do_POST(self):
+                if self.path != "/analyze":
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                    single = "review" in request
+                    review_texts = [request["review"]] if single else request["reviews"]
+                    if not isinstance(review_texts, list) or not all(isinstance(t, str) for t in review_texts):
+                        raise ValueError("reviews must be a list of strings")
+                except (KeyError, TypeError, ValueError) as e:
+                    self._reply(400, {"error": f"bad request: {e}"})
+                    return
+
+                if len(review_texts) > absa_server.max_queue:
+                    # Could never fit in the queue, so retrying after a 429 would loop forever
+                    REGISTRY.inc("absa_server_rejected_total", reason="too_large")
+                    self._reply(413, {
+                        "error": f"{len(review_texts)} reviews exceed the limit of {absa_server.max_queue} per request",
+                        "max_reviews": absa_server.max_queue
+                    })
+                    return
+
+                if not absa_server.ready or absa_server.draining:
+                    REGISTRY.inc("absa_server_rejected_total", reason="not_ready")
+                    self._reply(503, {"error": "server is not accepting requests"}, {"Retry-After": "5"})
+                    return
+                futures = absa_server.submit(review_texts)
+                if futures is None:
+                    REGISTRY.inc("absa_server_rejected_total", reason="queue_full")
+                    self._reply(429, {"error": "queue is full, retry later"}, {"Retry-After": "1"})
+                    return
+
+                deadline = time.monotonic() + absa_server.request_timeout
+                try:
+                    results = [future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures]
+                except FutureTimeoutError:
+                    self._reply(504, {"error": f"no result within {absa_server.request_timeout}s"})
+                    return
+                except Exception as e:
+                    self._reply(500, {"error": f"analysis failed: {e}"})
+                    return
+                self._reply(200, {"result": results[0]} if single else {"results": results})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ABSAHTTPServer((self.host, self.port), ABSAHandler)
+        self.port = self._server.server_address[1]
+        self.started_at = time.time()
+        threading.Thread(target=self._server.serve_forever, name="absa-server", daemon=True).start()
+        self._batcher = threading.Thread(target=self._run_batches, name="absa-batcher", daemon=True)
+        self._batcher.start()
+        print(f"Listening on http://{self.host}:{self.port} (max batch {self.max_batch_size}, "
+              f"max wait {self.max_wait * 1000:.0f}ms, queue {self.max_queue})")
+
+        # Load the sentiment model before reporting ready; the LLM is loaded by Ollama itself
+        load = getattr(self.pipeline.sentiment_analyzer, "load", None)
+        if load is not None:
+            load()
+        self.ready = True
+        print("Ready")
+        return self
+
+    def stop(self, timeout: float = 60):
+        """
+        Shut down gracefully.
+
+        New requests are refused with 503 (and /ready reports 503) while
+        queued and in-flight reviews are finished, then the HTTP server and
+        the pipeline's LLM connections are closed.
+
+        Args:
+            timeout: Longest wait in seconds for queued reviews to finish
+        """
+        with self._condition:
+            self.draining = True
+            self._condition.notify_all()
+        if self._batcher is not None:
+            self._batcher.join(timeout)
+            if self._batcher.is_alive():
+                print(f"Gave up waiting for {len(self._queue) + self.in_flight} reviews after {timeout}s")
+            self._batcher = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.ready = False
+        self.pipeline.aspect_extractor.close()
+        print(f"Stopped after {self.reviews_served:,} reviews in {self.batches:,} batches")
+
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+    from src.aspect_extraction import AspectExtractor
+    from src.sentiment_analyzer import SentimentAnalyzer
+
+    parser = argparse.ArgumentParser(description="Serve ABSAPipeline over HTTP with dynamic micro-batching")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Most reviews per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=25, help="Longest wait for a micro-batch to fill")
+    parser.add_argument("--max-queue", type=int, default=1000, help="Queued reviews before requests get 429")
+    parser.add_argument("--ollama-url", default="http://localhost:11434")
+    parser.add_argument("--extract-concurrency", type=int, default=4, help="Concurrent Ollama requests per batch")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Schema-constrained, streamed LLM extraction (see AspectExtractor)")
+    parser.add_argument("--model-path", default="Anudeep-Narala/fabsa-roberta-sentiment")
+    parser.add_argument("--backend", default="torch", help="torch, torch-int8 or onnx")
+    args = parser.parse_args()
+
+    pipeline = ABSAPipeline(
+        aspect_extractor=AspectExtractor(
+            ollama_url=args.ollama_url,
+            max_concurrency=args.extract_concurrency,
+            structured_output=args.structured_output
+        ),
+        sentiment_analyzer=SentimentAnalyzer(args.model_path, backend=args.backend)
+    )
+    server = ABSAServer(
+        pipeline, args.port, args.host,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue
+    )
+
+    # SIGTERM (e.g. from a process manager) drains like Ctrl+C
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.set())
+    server.start()
+    try:
+        stop_requested.wait()
+    except KeyboardInterrupt:
+        pass
+    print("Draining...")
+    server.stop()
@@ -3,9 +3,48 @@ Multi-label aspect extraction using Qwen2.5-14B-Instruct via Ollama.
 Extracts all relevant subcategories from food delivery reviews.
 """
 
+import hashlib
 import json
+import threading
+import time
 import requests
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional, Tuple
+from src.extraction_cache import ExtractionCache
+from src.metrics import REGISTRY
+from src.prefilter import LexicalPrefilter
+
+
+class _JsonValueScanner:
+    """Detects, chunk by chunk, when the first top-level JSON array or object of a stream is complete."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume more output; True once the value has closed."""
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.started:
+                self.in_string = True
+            elif char in "[{":
+                self.depth += 1
+                self.started = True
+            elif char in "]}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
 
 
 class AspectExtractor:
@@ -124,75 +163,415 @@ class AspectExtractor:
     # Create reverse mapping for parent lookup
     SUBCATEGORIES = {k: v["parent"] for k, v in SUBCATEGORY_DEFINITIONS.items()}
 
-    def __init__(self, ollama_url: str = "http://localhost:11434", model: str = "qwen2.5:14b-instruct"):
-        """Initialize aspect extractor with Ollama endpoint."""
-        self.ollama_url = ollama_url
-        self.model = model
-        self.api_endpoint = f"{ollama_url}/api/generate"
-
-    def _build_prompt(self, review_text: str) -> str:
-        """Build extraction prompt with strict boundaries for the LLM."""
-
-        # Format subcategory definitions for the prompt
-        definitions = []
-        for subcat, info in self.SUBCATEGORY_DEFINITIONS.items():
-            definitions.append(f"- {subcat}: {info['definition']}")
-
-        definitions_text = "\n".join(definitions)
+    # Bump when extraction behaviour changes in a way the prompt text does not capture
+    PROMPT_VERSION = 1
 
-        prompt = f"""You are a precise aspect extraction system. Extract ALL subcategories mentioned in this food delivery review.
+    # Static instructions shared by the single-review and packed prompts
+    INSTRUCTIONS_TEMPLATE = """You are a precise aspect extraction system. {task}
 
 CRITICAL RULES:
 1. Each subcategory has STRICT boundaries - do NOT overlap
 2. ONLY select a subcategory if the review explicitly discusses that specific aspect
 3. A review can have MULTIPLE subcategories
-4. If nothing specific is mentioned, return ONLY ["overall_satisfaction"]
+4. {fallback_rule}
 
 SUBCATEGORY DEFINITIONS (NO OVERLAP ALLOWED):
 
-{definitions_text}
+{definitions}
 
 EXAMPLES:
 - "Pizza was cold" → ["food_quality"] (NOT food_taste or food_freshness - temperature is quality)
 - "Tasted bland" → ["food_taste"] (NOT food_quality - flavor is taste)
 - "Driver was rude but food was great" → ["driver_behavior", "food_quality"] (multiple aspects)
-- "Love this app!" → ["overall_satisfaction"] (vague, no specifics)
+- "Love this app!" → ["overall_satisfaction"] (vague, no specifics)"""
+
+    # HTTP status codes worth retrying (overloaded or restarting server)
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        ollama_url: str = "http://localhost:11434",
+        model: str = "qwen2.5:14b-instruct",
+        max_concurrency: int = 4,
+        timeout: float = 60,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache: Optional[ExtractionCache] = None,
+        reviews_per_prompt: int = 1,
+        prefilter: Optional[LexicalPrefilter] = None,
+        structured_output: bool = False,
+        keep_alive: Optional[str] = None,
+        static_prefix: bool = False
+    ):
+        """
+        Initialize aspect extractor with Ollama endpoint.
+
+        Args:
+            ollama_url: Base URL of the Ollama server
+            model: Ollama model name
+            max_concurrency: Maximum number of in-flight requests to Ollama
+            timeout: Per-request timeout in seconds
+            max_retries: Retries for connection errors, timeouts and 429/5xx responses
+            backoff_factor: Base delay in seconds for exponential backoff between retries
+            cache: Optional persistent cache consulted before calling Ollama
+            reviews_per_prompt: Reviews packed into one LLM request (1 = one request per review)
+            prefilter: Optional lexical pre-filter that answers trivially vague reviews without the LLM
+            structured_output: Constrain replies to a JSON schema over SUBCATEGORIES and stream
+                them, closing the connection as soon as the JSON value is complete
+            keep_alive: How long Ollama keeps the model loaded after each request
+                (e.g. "30m", or "-1" for indefinitely); None leaves the server default
+            static_prefix: Send the static instructions as the `system` prompt and only
+                the review(s) as the prompt, so every request shares an identical prefix
+        """
+        self.ollama_url = ollama_url
+        self.model = model
+        self.api_endpoint = f"{ollama_url}/api/generate"
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.reviews_per_prompt = max(1, reviews_per_prompt)
+        self.prefilter = prefilter
+        self.structured_output = structured_output
+        self.keep_alive = keep_alive
+        self.static_prefix = static_prefix
+
+        # Request timing per extraction path, for comparing packed vs single prompts
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "single_requests": 0,
+            "single_reviews": 0,
+            "single_seconds": 0.0,
+            "packed_requests": 0,
+            "packed_reviews": 0,
+            "packed_seconds": 0.0,
+            "slot_fallbacks": 0,
+            "generated_tokens": 0,
+            "early_stops": 0,
+            "parse_failures": 0,
+            "prompt_eval_tokens": 0,
+            "prompt_eval_requests": 0
+        }
+
+        # Persistent session so connections are reused across requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = None
+
+        # Cached results are only valid for this exact model/prompt configuration. Single-review
+        # and packed answers are keyed by their own prompt shape, neither of which depends on
+        # reviews_per_prompt, so changing it keeps every cached answer
+        self.cache = cache
+        self.fingerprint = self.prompt_fingerprint()
+        self.packed_fingerprint = self.prompt_fingerprint(packed=True)
+        if self.cache is not None:
+            removed = self.cache.invalidate_stale(*self.cache_fingerprints)
+            if removed:
+                print(f"Invalidated {removed} cached extractions from a previous model/prompt")
+
+    @property
+    def cache_fingerprints(self) -> Tuple[str, str]:
+        """Fingerprints whose cached answers this extractor reuses, preferred first."""
+        return self.fingerprint, self.packed_fingerprint
+
+    def prompt_fingerprint(self, packed: bool = False) -> str:
+        """
+        Hash of everything that determines the LLM output besides the review text.
 
-Review to analyze: "{review_text}"
+        Args:
+            packed: Fingerprint the packed prompt shape instead of the single-review one
+        """
+        settings = {
+            "model": self.model,
+            "prompt_version": self.PROMPT_VERSION,
+            "subcategories": self.SUBCATEGORY_DEFINITIONS
+        }
+        if packed:
+            settings["multi_prompt_template"] = self._build_multi_prompt(["{review_text}"])
+        else:
+            settings["prompt_template"] = self._build_prompt("{review_text}")
+            # Kept as None so single-review fingerprints match those of earlier versions
+            settings["multi_prompt_template"] = None
+        # Optional settings are only present when enabled, so existing caches stay valid without them
+        if self.structured_output:
+            settings["response_schema"] = self._response_schema(1 if packed else None)
+        if self.static_prefix:
+            if packed:
+                settings["multi_system_prompt"] = self._multi_instructions()
+            else:
+                settings["system_prompt"] = self._single_instructions()
+                settings["multi_system_prompt"] = None
+        content = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _response_schema(self, slots: Optional[int]) -> Dict:
+        """JSON schema for Ollama's `format`: an array of known subcategories, or an object of such arrays per slot."""
+        aspects = {
+            "type": "array",
+            "items": {"type": "string", "enum": list(self.SUBCATEGORIES)},
+            "minItems": 1,
+            "uniqueItems": True
+        }
+        if slots is None:
+            return aspects
+        keys = [str(slot) for slot in range(1, slots + 1)]
+        return {
+            "type": "object",
+            "properties": {key: aspects for key in keys},
+            "required": keys,
+            "additionalProperties": False
+        }
+
+    def _definitions_text(self) -> str:
+        """Format subcategory definitions for the prompt."""
+        definitions = []
+        for subcat, info in self.SUBCATEGORY_DEFINITIONS.items():
+            definitions.append(f"- {subcat}: {info['definition']}")
+
+        return "\n".join(definitions)
+
+    def _instructions(self, task: str, fallback_rule: str) -> str:
+        """Shared rules, definitions and examples, around the task and fallback wording of one prompt shape."""
+        return self.INSTRUCTIONS_TEMPLATE.format(
+            task=task, fallback_rule=fallback_rule, definitions=self._definitions_text()
+        )
+
+    def _single_instructions(self) -> str:
+        """Static part of the single-review prompt: rules, definitions and examples."""
+        return self._instructions(
+            "Extract ALL subcategories mentioned in this food delivery review.",
+            'If nothing specific is mentioned, return ONLY ["overall_satisfaction"]'
+        )
+
+    @staticmethod
+    def _single_request(review_text: str) -> str:
+        """Per-review part of the single-review prompt."""
+        return f"""Review to analyze: "{review_text}"
 
 Return ONLY a valid JSON array of subcategories, nothing else.
 JSON array:"""
 
-        return prompt
-
-    def extract_aspects(self, review_text: str) -> List[str]:
+    def _build_prompt(self, review_text: str) -> str:
+        """Build extraction prompt with strict boundaries for the LLM."""
+        return f"{self._single_instructions()}\n\n{self._single_request(review_text)}"
+
+    def _multi_instructions(self) -> str:
+        """Static part of the packed prompt."""
+        return self._instructions(
+            "Extract ALL subcategories mentioned in EACH of the numbered food delivery reviews below. "
+            "Analyze every review independently.",
+            'If nothing specific is mentioned in a review, use ONLY ["overall_satisfaction"] for it'
+        )
+
+    @staticmethod
+    def _multi_request(review_texts: List[str]) -> str:
+        """Per-request part of the packed prompt: the numbered reviews and the output format."""
+        reviews_text = "\n".join(
+            f'{slot}. "{review_text}"' for slot, review_text in enumerate(review_texts, 1)
+        )
+        slot_keys = ", ".join(f'"{slot}"' for slot in range(1, len(review_texts) + 1))
+
+        return f"""Reviews to analyze:
+{reviews_text}
+
+Return ONLY a valid JSON object mapping each review number ({slot_keys}) to its JSON array of subcategories, nothing else.
+Example format: {{"1": ["food_quality"], "2": ["overall_satisfaction"]}}
+JSON object:"""
+
+    def _build_multi_prompt(self, review_texts: List[str]) -> str:
+        """Build one extraction prompt covering several reviews in numbered slots."""
+        return f"{self._multi_instructions()}\n\n{self._multi_request(review_texts)}"
+
+    def _prompt_parts(self, review_texts: List[str]) -> Tuple[Optional[str], str]:
         """
-        Extract all relevant subcategories from a review.
+        (system, prompt) for a request.
 
-        Args:
-            review_text: The review text to analyze
-
-        Returns:
-            List of subcategory strings (e.g., ["food_quality", "driver_behavior"])
+        With `static_prefix` the instructions go in Ollama's `system` field and
+        the prompt holds only the review(s), so every request starts with the
+        same tokens and Ollama can reuse their evaluation. Otherwise the whole
+        text is sent as the prompt.
+        """
+        packed = len(review_texts) > 1
+        if not self.static_prefix:
+            return None, self._build_multi_prompt(review_texts) if packed else self._build_prompt(review_texts[0])
+        if packed:
+            return self._multi_instructions(), self._multi_request(review_texts)
+        return self._single_instructions(), self._single_request(review_texts[0])
+
+    def _post_with_retry(self, payload: Dict, stream: bool = False):
         """
-        prompt = self._build_prompt(review_text)
+        POST a payload to Ollama, retrying transient failures with exponential backoff.
 
+        Returns the decoded JSON reply, or with `stream` the open response
+        (status already checked) for the caller to read and close.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with REGISTRY.timer("llm_http_seconds"):
+                    response = self.session.post(self.api_endpoint, json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                    REGISTRY.inc("llm_retries_total", reason=response.status_code)
+                    response.close()
+                    time.sleep(self.backoff_factor * (2 ** attempt))
+                    continue
+                response.raise_for_status()
+                return response if stream else response.json()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                REGISTRY.inc("llm_retries_total", reason=type(e).__name__)
+                time.sleep(self.backoff_factor * (2 ** attempt))
+
+    def _payload(self, system: Optional[str], prompt: str, num_predict: int, stream: bool = False) -> Dict:
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "temperature": 0.1,  # Low temperature for more deterministic outputs
             "options": {
-                "num_predict": 200  # Limit tokens for faster response
+                "num_predict": num_predict  # Limit tokens for faster response
             }
         }
+        if system is not None:
+            payload["system"] = system
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _generate(self, review_texts: List[str], num_predict: int, path: str) -> str:
+        """
+        Run one LLM generation for one or several (packed) reviews and return the raw reply.
 
+        In structured mode the reply is constrained to `_response_schema` and
+        streamed, and the connection is closed once the JSON value is complete,
+        so nothing the model would emit after it is generated or waited for.
+        With `static_prefix` one more chunk is read after the value: if it is
+        the final chunk, its prompt-eval timings (which show the prefix
+        reuse) are recorded; anything else is still cut off.
+
+        Args:
+            review_texts: Reviews in the request (more than one builds a packed prompt)
+            num_predict: Cap on generated tokens
+            path: "single" or "packed", for token accounting
+        """
+        system, prompt = self._prompt_parts(review_texts)
+        payload = self._payload(system, prompt, num_predict, stream=self.structured_output)
+        if not self.structured_output:
+            result = self._post_with_retry(payload)
+            self._record_server_timings(path, result, ttft=None)
+            self._count_tokens(path, result.get("eval_count", 0), stopped_early=False)
+            return result.get("response", "")
+
+        payload["format"] = self._response_schema(len(review_texts) if len(review_texts) > 1 else None)
+        start_time = time.perf_counter()
+        response = self._post_with_retry(payload, stream=True)
+        scanner = _JsonValueScanner()
+        pieces = []
+        tokens = 0
+        ttft = None
+        stopped_early = False
+        value_closed = False
         try:
-            response = requests.post(self.api_endpoint, json=payload, timeout=60)
-            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                piece = chunk.get("response", "")
+                if value_closed:
+                    # The chunk after the value: keep the final chunk's timings, otherwise cut off
+                    if chunk.get("done"):
+                        tokens = chunk.get("eval_count", tokens)
+                        self._record_server_timings(path, chunk, ttft=ttft)
+                    else:
+                        stopped_early = True
+                    break
+                if piece:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start_time
+                        REGISTRY.observe("llm_ttft_seconds", ttft, path=path)
+                    # Ollama streams one token per chunk
+                    tokens += 1
+                    pieces.append(piece)
+                if chunk.get("done"):
+                    tokens = chunk.get("eval_count", tokens)
+                    # Only the final chunk carries timings; an early stop never receives it
+                    self._record_server_timings(path, chunk, ttft=ttft)
+                    break
+                if piece and scanner.feed(piece):
+                    if self.static_prefix:
+                        value_closed = True
+                        continue
+                    stopped_early = True
+                    break
+        finally:
+            # Closing mid-stream drops the connection, which makes Ollama stop generating
+            response.close()
+
+        self._count_tokens(path, tokens, stopped_early)
+        return "".join(pieces)
+
+    def _record_server_timings(self, path: str, result: Dict, ttft: Optional[float]):
+        """
+        Record Ollama's own timings for one request.
 
-            result = response.json()
-            llm_output = result.get("response", "").strip()
+        `prompt_eval_count` counts only prompt tokens the server had to
+        evaluate; tokens of a prefix reused from an earlier request are not
+        included, so it drops when the static prefix is being reused.
+        Without streaming, time to first token is estimated as model load
+        plus prompt evaluation time as reported by the server.
+        """
+        if "prompt_eval_count" in result:
+            REGISTRY.inc("llm_prompt_eval_tokens_total", result["prompt_eval_count"], path=path)
+            with self._stats_lock:
+                self.stats["prompt_eval_tokens"] += result["prompt_eval_count"]
+                self.stats["prompt_eval_requests"] += 1
+        if "prompt_eval_duration" in result:
+            REGISTRY.observe("llm_prompt_eval_seconds", result["prompt_eval_duration"] / 1e9, path=path)
+        if result.get("load_duration"):
+            REGISTRY.observe("llm_load_seconds", result["load_duration"] / 1e9)
+        if ttft is None and "prompt_eval_duration" in result:
+            server_ttft = (result.get("load_duration", 0) + result["prompt_eval_duration"]) / 1e9
+            REGISTRY.observe("llm_ttft_seconds", server_ttft, path=path)
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Load the model and evaluate the static instructions once before real requests.
+
+        With `keep_alive` the model then stays loaded between bursts, and with
+        `static_prefix` the following requests can reuse the evaluated prefix.
+
+        Returns:
+            Server-reported load seconds, prompt tokens evaluated and total seconds
+        """
+        warm_reviews = [["Love this app!"]]
+        if self.reviews_per_prompt > 1:
+            warm_reviews.append(["Love this app!", "Pizza was cold"])
+
+        report = {"load_seconds": 0.0, "prompt_eval_tokens": 0, "total_seconds": 0.0}
+        for review_texts in warm_reviews:
+            system, prompt = self._prompt_parts(review_texts)
+            result = self._post_with_retry(self._payload(system, prompt, num_predict=1))
+            report["load_seconds"] += result.get("load_duration", 0) / 1e9
+            report["prompt_eval_tokens"] += result.get("prompt_eval_count", 0)
+            report["total_seconds"] += result.get("total_duration", 0) / 1e9
+        return {key: round(value, 3) for key, value in report.items()}
+
+    def _count_tokens(self, path: str, tokens: int, stopped_early: bool):
+        REGISTRY.inc("llm_generated_tokens_total", tokens, path=path)
+        if stopped_early:
+            REGISTRY.inc("llm_early_stops_total", path=path)
+        with self._stats_lock:
+            self.stats["generated_tokens"] += tokens
+            self.stats["early_stops"] += int(stopped_early)
+
+    def _extract_one(self, review_text: str) -> Tuple[List[str], str]:
+        """Extract subcategories for one review with a single LLM request; returns (subcategories, source)."""
+        try:
+            start_time = time.time()
+            llm_output = self._generate([review_text], 200, "single").strip()
+            self._record("single", 1, time.time() - start_time)
 
             # Parse JSON response
             aspects = self._parse_llm_output(llm_output)
@@ -200,19 +579,203 @@ JSON array:"""
             # Validate aspects exist in our subcategories
             valid_aspects = [a for a in aspects if a in self.SUBCATEGORIES]
 
-            # If no valid aspects found, default to overall_satisfaction
+            # If no valid aspects found, default to overall_satisfaction; the
+            # default is not cached, so a later run asks the LLM again
             if not valid_aspects:
-                valid_aspects = ["overall_satisfaction"]
+                REGISTRY.inc("extraction_fallbacks_total", reason="no_valid_aspects")
+                return ["overall_satisfaction"], "fallback"
+
+            if self.cache is not None:
+                self.cache.put(review_text, self.fingerprint, valid_aspects)
 
-            return valid_aspects
+            return valid_aspects, "llm"
 
         except Exception as e:
             print(f"Error extracting aspects: {e}")
+            REGISTRY.inc("llm_request_errors_total", path="single")
             # Fallback to overall_satisfaction on error
-            return ["overall_satisfaction"]
+            REGISTRY.inc("extraction_fallbacks_total", reason="request_error")
+            return ["overall_satisfaction"], "fallback"
+
+    def _extract_packed(self, review_texts: List[str]) -> List[Tuple[List[str], str]]:
+        """
+        Extract subcategories for several reviews with a single multi-slot LLM request.
+
+        Slots that are missing or hold no valid subcategory fall back to
+        single-review extraction; the other slots keep the packed result.
+        """
+        if len(review_texts) == 1:
+            return [self._extract_one(review_texts[0])]
+
+        try:
+            start_time = time.time()
+            llm_output = self._generate(review_texts, 60 * len(review_texts) + 40, "packed")
+            self._record("packed", len(review_texts), time.time() - start_time)
+            slots = self._parse_llm_object(llm_output.strip())
+        except Exception as e:
+            print(f"Error extracting aspects for {len(review_texts)} packed reviews: {e}")
+            REGISTRY.inc("llm_request_errors_total", path="packed")
+            slots = {}
+
+        results = []
+        for slot, review_text in enumerate(review_texts, 1):
+            aspects = slots.get(str(slot))
+            valid_aspects = (
+                [a for a in aspects if isinstance(a, str) and a in self.SUBCATEGORIES]
+                if isinstance(aspects, list) else []
+            )
+
+            if not valid_aspects:
+                with self._stats_lock:
+                    self.stats["slot_fallbacks"] += 1
+                REGISTRY.inc("extraction_slot_fallbacks_total")
+                results.append(self._extract_one(review_text))
+                continue
+
+            if self.cache is not None:
+                self.cache.put(review_text, self.packed_fingerprint, valid_aspects)
+            results.append((valid_aspects, "llm"))
+
+        return results
+
+    def _record(self, path: str, reviews: int, seconds: float):
+        """Add one LLM request to the per-path timing stats."""
+        with self._stats_lock:
+            self.stats[f"{path}_requests"] += 1
+            self.stats[f"{path}_reviews"] += reviews
+            self.stats[f"{path}_seconds"] += seconds
+
+    def throughput_report(self) -> Dict[str, object]:
+        """
+        Compare packed and single-review extraction.
+
+        Returns:
+            Dict with request counts, reviews per request-second for each path,
+            and the number of packed slots that fell back to single requests
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+
+        report = {}
+        for path in ("single", "packed"):
+            seconds = stats[f"{path}_seconds"]
+            report[f"{path}_requests"] = stats[f"{path}_requests"]
+            report[f"{path}_reviews"] = stats[f"{path}_reviews"]
+            report[f"{path}_reviews_per_sec"] = round(stats[f"{path}_reviews"] / seconds, 3) if seconds else 0.0
+        report["slot_fallbacks"] = stats["slot_fallbacks"]
+        requests_made = stats["single_requests"] + stats["packed_requests"]
+        report["generated_tokens"] = stats["generated_tokens"]
+        report["tokens_per_request"] = round(stats["generated_tokens"] / requests_made, 1) if requests_made else 0.0
+        report["early_stops"] = stats["early_stops"]
+        report["parse_failures"] = stats["parse_failures"]
+        # Early-stopped streams never see the final chunk, so there may be nothing to average
+        report["prompt_eval_tokens_per_request"] = (
+            round(stats["prompt_eval_tokens"] / stats["prompt_eval_requests"], 1) if stats["prompt_eval_requests"] else "n/a"
+        )
+
+        return report
+
+    def extract_aspects_batch(self, review_texts: List[str]) -> List[List[str]]:
+        """
+        Extract subcategories for many reviews with concurrent LLM requests.
+
+        Reviews the pre-filter can route directly, or found in the cache, are
+        answered without a request. With
+        `reviews_per_prompt` > 1 the remaining reviews are packed into shared
+        prompts. At most `max_concurrency` requests are in flight at once;
+        results are returned in input order.
+
+        Args:
+            review_texts: The review texts to analyze
+
+        Returns:
+            List of subcategory lists, one per review
+        """
+        return self.extract_with_sources(review_texts)[0]
+
+    def extract_with_sources(self, review_texts: List[str]) -> Tuple[List[List[str]], List[str]]:
+        """
+        Same as `extract_aspects_batch`, also reporting where each answer came from.
+
+        Args:
+            review_texts: The review texts to analyze
+
+        Returns:
+            (subcategory lists, sources), one of each per review. The source is
+            "llm" (answered by the LLM now), "cache" (an earlier LLM answer),
+            "prefilter" (routed without the LLM) or "fallback" (the LLM gave no
+            usable answer, so overall_satisfaction was assigned)
+        """
+        results = [None] * len(review_texts)
+        sources = [None] * len(review_texts)
+        pending = []
+        for i, review_text in enumerate(review_texts):
+            routed = self.prefilter.route(review_text) if self.prefilter is not None else None
+            if routed is not None:
+                results[i], sources[i] = routed, "prefilter"
+                continue
+
+            cached = self.cache.get(review_text, *self.cache_fingerprints) if self.cache is not None else None
+            if cached is not None:
+                results[i], sources[i] = cached, "cache"
+            else:
+                pending.append(i)
+
+        pending_texts = [review_texts[i] for i in pending]
+        if self.reviews_per_prompt > 1 and len(pending_texts) > 1:
+            extract, size = self._extract_packed, self.reviews_per_prompt
+        else:
+            extract, size = (lambda texts: [self._extract_one(texts[0])]), 1
+        groups = [pending_texts[start:start + size] for start in range(0, len(pending_texts), size)]
+
+        if len(groups) <= 1 or self.max_concurrency == 1:
+            extracted = [aspects for group in groups for aspects in extract(group)]
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            extracted = [aspects for group_result in self._executor.map(extract, groups) for aspects in group_result]
+
+        for i, (aspects, source) in zip(pending, extracted):
+            results[i], sources[i] = aspects, source
+
+        return results, sources
+
+    def extract_aspects(self, review_text: str) -> List[str]:
+        """
+        Extract all relevant subcategories from a review.
+
+        Args:
+            review_text: The review text to analyze
+
+        Returns:
+            List of subcategory strings (e.g., ["food_quality", "driver_behavior"])
+        """
+        return self.extract_aspects_batch([review_text])[0]
+
+    def close(self):
+        """Release the worker threads and pooled HTTP connections."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
 
     def _parse_llm_output(self, output: str) -> List[str]:
         """Parse LLM output to extract JSON array."""
+        with REGISTRY.timer("llm_parse_seconds", format="array"):
+            parsed = self._parse_json_array(output)
+        if not isinstance(parsed, list):
+            self._count_parse_failure("array")
+        # Fallback: return empty list
+        return [] if parsed is None else parsed
+
+    def _count_parse_failure(self, response_format: str):
+        REGISTRY.inc("llm_parse_failures_total", format=response_format)
+        with self._stats_lock:
+            self.stats["parse_failures"] += 1
+
+    @staticmethod
+    def _parse_json_array(output: str):
+        """Decode the response, or the first [...] span in it; None if neither is valid JSON."""
         try:
             # Try direct JSON parsing
             return json.loads(output)
@@ -228,8 +791,30 @@ JSON array:"""
                 except json.JSONDecodeError:
                     pass
 
-            # Fallback: return empty list
-            return []
+            return None
+
+    def _parse_llm_object(self, output: str) -> Dict[str, List[str]]:
+        """Parse LLM output to extract a JSON object keyed by review slot."""
+        start_time = time.perf_counter()
+        try:
+            parsed = json.loads(output)
+        except json.JSONDecodeError:
+            # Try to find JSON object in output
+            start_idx = output.find("{")
+            end_idx = output.rfind("}")
+            parsed = None
+
+            if start_idx != -1 and end_idx != -1:
+                try:
+                    parsed = json.loads(output[start_idx:end_idx + 1])
+                except json.JSONDecodeError:
+                    pass
+
+        REGISTRY.observe("llm_parse_seconds", time.perf_counter() - start_time, format="object")
+        if not isinstance(parsed, dict):
+            self._count_parse_failure("object")
+            return {}
+        return {str(k).strip(): v for k, v in parsed.items()}
 
     def get_parent_aspect(self, subcategory: str) -> Optional[str]:
         """Get the parent aspect for a subcategory (for sentiment analysis)."""
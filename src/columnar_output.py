@@ -0,0 +1,390 @@
+"""
+Normalized columnar output for analysis results.
+Stores a reviews table and an aspect-results table (joined by review_id) as Parquet,
+either in one directory or split into platform/day partitions that are rewritten independently.
+"""
+
+import glob
+import json
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from src.ingest import review_day
+from src.metrics import REGISTRY
+from src.result_store import _json_default
+
+
+REVIEWS_FILE = "reviews.parquet"
+ASPECTS_FILE = "aspects.parquet"
+
+# Per-aspect fields; everything else in a result row describes the review
+ASPECT_FIELDS = ["subcategory", "parent_aspect", "sentiment", "confidence"]
+
+DICTIONARY_COLUMNS = ["subcategory", "parent_aspect", "sentiment", "platform"]
+
+ASPECTS_SCHEMA = pa.schema([
+    ("review_id", pa.string()),
+    ("subcategory", pa.dictionary(pa.int8(), pa.string())),
+    ("parent_aspect", pa.dictionary(pa.int8(), pa.string())),
+    ("sentiment", pa.dictionary(pa.int8(), pa.string())),
+    ("confidence", pa.float32()),
+    ("platform", pa.dictionary(pa.int8(), pa.string())),
+])
+
+# Review fields written by the pipeline itself; other review fields come from the
+# input files, and their types are inferred per chunk and unified on close
+REVIEW_FIELD_TYPES = {
+    "review_id": pa.string(),
+    "review_text": pa.string(),
+    "extraction_source": pa.string(),
+    "platform": pa.string(),
+}
+
+
+def _reviews_table(reviews: pd.DataFrame) -> pa.Table:
+    """Arrow table of review rows; pipeline fields get their declared types, untypable columns become strings."""
+    reviews = reviews.convert_dtypes()
+    columns = []
+    for name in reviews.columns:
+        values = reviews[name]
+        if name in REVIEW_FIELD_TYPES:
+            columns.append(pa.array(values.astype("string"), type=REVIEW_FIELD_TYPES[name], from_pandas=True))
+            continue
+        try:
+            columns.append(pa.array(values, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types in one column (e.g. numbers and text)
+            columns.append(pa.array(values.map(lambda v: None if pd.isna(v) else str(v)), type=pa.string()))
+    return pa.Table.from_arrays(columns, names=[str(name) for name in reviews.columns])
+
+
+def _unified_type(types: List[pa.DataType]) -> pa.DataType:
+    """One type that every chunk's type of a column can be cast to."""
+    known = [t for t in types if not pa.types.is_null(t)]
+    if not known:
+        return pa.null()
+    if all(t == known[0] for t in known):
+        return known[0]
+    if all(pa.types.is_integer(t) for t in known):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in known):
+        return pa.float64()
+    return pa.string()
+
+
+class NormalizedResultWriter:
+    """Appends result-row chunks to reviews.parquet and aspects.parquet in one directory."""
+
+    def __init__(self, output_dir: str):
+        """
+        Args:
+            output_dir: Directory receiving reviews.parquet and aspects.parquet
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        # Review chunks are staged as part files, since later chunks may add or
+        # lack columns, and merged into one file under a unified schema on close
+        self._reviews_parts_dir = os.path.join(output_dir, f"{REVIEWS_FILE}.parts")
+        self._reviews_parts: List[str] = []
+        self._aspects_writer = pq.ParquetWriter(os.path.join(output_dir, ASPECTS_FILE), ASPECTS_SCHEMA)
+        self._seen_reviews = set()
+        self.review_count = 0
+        self.aspect_count = 0
+
+    def write_chunk(self, chunk: pd.DataFrame):
+        """
+        Split wide result rows into review and aspect rows and append them.
+
+        Args:
+            chunk: Result rows as produced by ABSAPipeline (review_id, review_text,
+                subcategory, parent_aspect, sentiment, confidence, source fields...)
+        """
+        if chunk.empty:
+            return
+        chunk = chunk.assign(review_id=chunk["review_id"].astype(str))
+
+        aspects = pd.DataFrame({
+            "review_id": chunk["review_id"],
+            "subcategory": chunk["subcategory"].astype("category"),
+            "parent_aspect": chunk["parent_aspect"].astype("category"),
+            "sentiment": chunk["sentiment"].astype("category"),
+            "confidence": chunk["confidence"].astype("float32"),
+            "platform": (chunk["platform"] if "platform" in chunk else pd.Series("", index=chunk.index)).astype("category"),
+        })
+        self._aspects_writer.write_table(pa.Table.from_pandas(aspects, schema=ASPECTS_SCHEMA, preserve_index=False))
+        self.aspect_count += len(aspects)
+
+        # One row per review; a review's rows may straddle chunks
+        reviews = chunk.drop(columns=ASPECT_FIELDS).drop_duplicates("review_id")
+        reviews = reviews[~reviews["review_id"].isin(self._seen_reviews)]
+        if reviews.empty:
+            return
+        self._seen_reviews.update(reviews["review_id"])
+
+        os.makedirs(self._reviews_parts_dir, exist_ok=True)
+        part_path = os.path.join(self._reviews_parts_dir, f"part-{len(self._reviews_parts):06d}.parquet")
+        pq.write_table(_reviews_table(reviews), part_path)
+        self._reviews_parts.append(part_path)
+        self.review_count += len(reviews)
+
+    def close(self):
+        """Finish both Parquet files, merging the review parts under one schema."""
+        self._aspects_writer.close()
+        if not self._reviews_parts:
+            return
+
+        types: Dict[str, List[pa.DataType]] = {}
+        for part_path in self._reviews_parts:
+            for field in pq.read_schema(part_path):
+                types.setdefault(field.name, []).append(field.type)
+        schema = pa.schema([(name, _unified_type(column_types)) for name, column_types in types.items()])
+
+        with pq.ParquetWriter(os.path.join(self.output_dir, REVIEWS_FILE), schema) as writer:
+            for part_path in self._reviews_parts:
+                table = pq.read_table(part_path)
+                columns = [
+                    table[field.name].cast(field.type) if field.name in table.column_names
+                    else pa.nulls(len(table), field.type)
+                    for field in schema
+                ]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        shutil.rmtree(self._reviews_parts_dir)
+
+
+def write_normalized(chunks: Iterable[pd.DataFrame], output_dir: str) -> Tuple[int, int]:
+    """
+    Write result-row chunks (e.g. `JsonlResultStore.iter_chunks()`) as normalized Parquet.
+
+    Returns:
+        (number of reviews, number of aspect rows) written
+    """
+    writer = NormalizedResultWriter(output_dir)
+    try:
+        for chunk in chunks:
+            writer.write_chunk(chunk)
+    finally:
+        writer.close()
+    return writer.review_count, writer.aspect_count
+
+
+def result_dirs(output_dir: str) -> List[str]:
+    """
+    Directories holding a reviews/aspects table pair under an output location.
+
+    Args:
+        output_dir: A single normalized output directory, or the root of a
+            partitioned output (see PartitionedResultStore)
+    """
+    if os.path.exists(os.path.join(output_dir, ASPECTS_FILE)):
+        return [output_dir]
+    partitions = glob.glob(os.path.join(output_dir, "platform=*", "day=*", ASPECTS_FILE))
+    # Skip partitions that are mid-rewrite
+    return sorted(
+        os.path.dirname(path) for path in partitions
+        if not os.path.dirname(path).endswith((".tmp", ".old"))
+    )
+
+
+def _load_table(output_dir: str, file_name: str, columns=None) -> pd.DataFrame:
+    """Load one table from a single output directory or concatenate it across partitions."""
+    dirs = result_dirs(output_dir)
+    if not dirs:
+        raise FileNotFoundError(f"No analysis results under {output_dir}")
+    if len(dirs) == 1:
+        return pd.read_parquet(os.path.join(dirs[0], file_name), columns=columns)
+
+    df = pd.concat(
+        [pd.read_parquet(os.path.join(path, file_name), columns=columns) for path in dirs],
+        ignore_index=True
+    )
+    # Partitions carry their own dictionaries; restore categoricals after concatenation
+    for column in DICTIONARY_COLUMNS:
+        if column in df.columns and file_name == ASPECTS_FILE:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def load_aspects(output_dir: str, columns=None) -> pd.DataFrame:
+    """Load the aspect-results table; dictionary columns come back as categoricals."""
+    return _load_table(output_dir, ASPECTS_FILE, columns)
+
+
+def load_reviews(output_dir: str, columns=None) -> pd.DataFrame:
+    """Load the reviews table."""
+    return _load_table(output_dir, REVIEWS_FILE, columns)
+
+
+def iter_wide_chunks(output_dir: str, batch_size: int = 50000) -> Iterator[pd.DataFrame]:
+    """Rebuild the wide one-row-per-aspect layout by joining aspects to reviews, batch by batch."""
+    for result_dir in result_dirs(output_dir):
+        reviews = pd.read_parquet(os.path.join(result_dir, REVIEWS_FILE))
+        review_fields = [c for c in reviews.columns if c not in ("review_id", "review_text")]
+        column_order = ["review_id", "review_text"] + ASPECT_FIELDS + review_fields
+
+        aspects_file = pq.ParquetFile(os.path.join(result_dir, ASPECTS_FILE))
+        for batch in aspects_file.iter_batches(batch_size=batch_size, columns=["review_id"] + ASPECT_FIELDS):
+            aspects = batch.to_pandas()
+            for column in ("subcategory", "parent_aspect", "sentiment"):
+                aspects[column] = aspects[column].astype(str)
+            aspects["confidence"] = aspects["confidence"].astype("float64").round(4)
+            yield aspects.merge(reviews, on="review_id", how="left")[column_order]
+
+
+class PartitionedResultStore:
+    """
+    Result store that merges reviews into platform/day Parquet partitions.
+
+    Each partition is a normalized output directory
+    (`<root>/platform=<platform>/day=<YYYY-MM-DD>/`). Appending a batch only
+    stages its rows: one small JSONL part file per partition the reviews fall
+    into (or used to fall into, for reviews whose date changed), next to the
+    partition in `day=<YYYY-MM-DD>.staged/`. `compact` then rewrites each
+    staged partition once, replacing earlier results of the same review IDs,
+    so a run costs one rewrite per touched partition rather than one per flush.
+    It exposes the same `append_batch`/`is_processed` interface as
+    JsonlResultStore, so `ABSAPipeline.process_to_store` can write to it.
+    """
+
+    def __init__(self, root: str, platform: str, manifest=None):
+        """
+        Args:
+            root: Root directory of the partitioned output
+            platform: Platform whose partitions this store writes
+            manifest: Optional ReviewManifest; reviews are committed to it after
+                their partitions are written, and its previous days locate stale rows
+        """
+        self.root = root
+        self.path = os.path.join(root, f"platform={platform}")
+        self.platform = platform
+        self.manifest = manifest
+        self.processed_ids: Set[str] = set()
+        self.partitions_written: Set[str] = set()
+
+    def partition_dir(self, day: str) -> str:
+        """Directory of one day's partition."""
+        return os.path.join(self.path, f"day={day or 'unknown'}")
+
+    def _staged_dir(self, day: str) -> str:
+        return f"{self.partition_dir(day)}.staged"
+
+    def is_processed(self, review_id) -> bool:
+        """Whether a review was already merged during this run (repeated IDs in a feed)."""
+        return str(review_id) in self.processed_ids
+
+    def append_batch(self, batch: List[Tuple[object, List[Dict]]]):
+        """
+        Durably stage the result rows of several reviews for their partitions.
+
+        Args:
+            batch: List of (review_id, result_rows) tuples
+        """
+        if not batch:
+            return
+
+        with REGISTRY.timer("checkpoint_write_seconds", store="partitioned"):
+            self._stage_batch(batch)
+
+    def _stage_batch(self, batch: List[Tuple[object, List[Dict]]]):
+        """Write one part file per affected partition, then commit the reviews to the manifest."""
+        # Each entry replaces the review in that partition; a review that moved
+        # to another day leaves an entry without rows in its previous day
+        entries: Dict[str, Dict[str, List[Dict]]] = defaultdict(dict)
+        for review_id, rows in batch:
+            review_id = str(review_id)
+            for row in rows:
+                entries[review_day(row.get("date"))].setdefault(review_id, []).append({**row, "review_id": review_id})
+            previous = self.manifest.lookup(self.platform, review_id) if self.manifest is not None else None
+            if previous is not None:
+                entries[previous[1]].setdefault(review_id, [])
+
+        for day, day_entries in entries.items():
+            staged_dir = self._staged_dir(day)
+            os.makedirs(staged_dir, exist_ok=True)
+            part_path = os.path.join(staged_dir, f"part-{len(os.listdir(staged_dir)):06d}.jsonl")
+            with open(f"{part_path}.tmp", "w", encoding="utf-8") as f:
+                for review_id, rows in day_entries.items():
+                    f.write(json.dumps({"review_id": review_id, "rows": rows}, default=_json_default) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{part_path}.tmp", part_path)
+
+        # Staged parts survive a crash and are compacted by the next run
+        review_ids = [str(review_id) for review_id, _ in batch]
+        if self.manifest is not None:
+            self.manifest.commit(self.platform, review_ids)
+        self.processed_ids.update(review_ids)
+
+    def compact(self) -> int:
+        """
+        Merge every staged part file into its partition, rewriting each partition once.
+
+        Also picks up parts left behind by an interrupted run.
+
+        Returns:
+            Number of partitions rewritten
+        """
+        staged_dirs = sorted(glob.glob(os.path.join(self.path, "day=*.staged")))
+        for staged_dir in staged_dirs:
+            latest: Dict[str, List[Dict]] = {}
+            for part_path in sorted(glob.glob(os.path.join(staged_dir, "part-*.jsonl"))):
+                with open(part_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        latest[entry["review_id"]] = entry["rows"]
+            day = os.path.basename(staged_dir)[len("day="):-len(".staged")]
+            with REGISTRY.timer("checkpoint_write_seconds", store="partitioned_compact"):
+                self._rewrite_partition(
+                    "" if day == "unknown" else day,
+                    [row for rows in latest.values() for row in rows],
+                    set(latest)
+                )
+            # Replaying the parts after a crash here is harmless: they replace the same IDs
+            shutil.rmtree(staged_dir)
+        return len(staged_dirs)
+
+    def _rewrite_partition(self, day: str, rows: List[Dict], replaced_ids: Set[str]):
+        """Rewrite one partition with `replaced_ids` removed and `rows` added, swapping it in atomically."""
+        partition_dir = self.partition_dir(day)
+        tmp_dir = f"{partition_dir}.tmp"
+        old_dir = f"{partition_dir}.old"
+        if not os.path.isdir(partition_dir) and os.path.isdir(old_dir):
+            # A previous rewrite was interrupted between the two renames
+            os.replace(old_dir, partition_dir)
+
+        frames = []
+        if os.path.isdir(partition_dir):
+            for chunk in iter_wide_chunks(partition_dir):
+                frames.append(chunk[~chunk["review_id"].isin(replaced_ids)])
+        if rows:
+            frames.append(pd.DataFrame(rows))
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if not merged.empty:
+            write_normalized([merged], tmp_dir)
+
+        if os.path.isdir(partition_dir):
+            os.replace(partition_dir, old_dir)
+        if not merged.empty:
+            os.replace(tmp_dir, partition_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self.partitions_written.add(partition_dir)
+
+
+def export_dashboard_csv(output_dir: str, csv_path: str, batch_size: int = 50000) -> int:
+    """
+    Export normalized results to the wide CSV format the HTML dashboards read.
+
+    Returns:
+        Number of rows written
+    """
+    written = 0
+    for chunk in iter_wide_chunks(output_dir, batch_size):
+        chunk.to_csv(csv_path, mode="a" if written else "w", header=not written, index=False)
+        written += len(chunk)
+    return written
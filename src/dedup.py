@@ -0,0 +1,204 @@
+"""
+Duplicate review collapsing before inference.
+Groups exact (and optionally near-) duplicate reviews so each group is analyzed once.
+"""
+
+import hashlib
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+import numpy as np
+from typing import Dict, List, Optional
+
+
+def normalize_review(text) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivial variants compare equal."""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+
+class MinHashLSH:
+    """MinHash signatures over character shingles with banded locality-sensitive hashing."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 4, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Multiply-shift hash family: (a * x + b) mod 2^64, keeping the high 32 bits
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 64 - 1, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 64 - 1, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a normalized text."""
+        k = self.shingle_size
+        shingles = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) >> np.uint64(32)).min(axis=0)
+
+    def query(self, signature: np.ndarray, threshold: float) -> Optional[str]:
+        """Return the key of an indexed text whose estimated Jaccard similarity meets the threshold."""
+        seen = set()
+        for band, buckets in enumerate(self._buckets):
+            band_key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for key in buckets.get(band_key, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if np.mean(self._signatures[key] == signature) >= threshold:
+                    return key
+        return None
+
+    def insert(self, key: str, signature: np.ndarray):
+        """Index a signature under a key."""
+        self._signatures[key] = signature
+        for band, buckets in enumerate(self._buckets):
+            band_key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: str):
+        """Drop a key's signature and its entries in every band bucket."""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, buckets in enumerate(self._buckets):
+            band_key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket = buckets.get(band_key)
+            if bucket is not None and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del buckets[band_key]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+class ReviewDeduplicator:
+    """Assigns reviews to duplicate groups and remembers each group's analysis result."""
+
+    def __init__(
+        self,
+        near_duplicates: bool = False,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        max_entries: int = 1_000_000
+    ):
+        """
+        Args:
+            near_duplicates: Also merge reviews whose MinHash similarity is at least `threshold`
+            threshold: Estimated Jaccard similarity (over character 4-grams) for near-duplicates
+            num_perm: MinHash signature length
+            bands: LSH bands (num_perm must be divisible by bands)
+            max_entries: Review hashes remembered. Beyond it the least recently
+                used groups are forgotten whole: their member hashes, their
+                result and their LSH signature and bucket entries
+        """
+        self.near_duplicates = near_duplicates
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.lsh = MinHashLSH(num_perm=num_perm, bands=bands) if near_duplicates else None
+
+        self._lock = threading.Lock()
+        self._group_of_hash: Dict[str, str] = {}
+        # Member hashes of each group, least recently used first; evicting a group
+        # here is the only way entries leave _group_of_hash, _results and the LSH index
+        self._groups: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._results: Dict[str, Dict] = {}
+        self.counts = {"reviews": 0, "inferred": 0, "exact_duplicates": 0, "near_duplicates": 0}
+        self.inference_seconds = 0.0
+
+    def assign(self, review_texts: List[str]) -> List[str]:
+        """
+        Map each review to the key of its duplicate group, creating groups as needed.
+
+        Args:
+            review_texts: Review texts in input order
+
+        Returns:
+            Group key per review
+        """
+        keys = []
+        with self._lock:
+            for review_text in review_texts:
+                normalized = normalize_review(review_text)
+                text_hash = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+                key = self._group_of_hash.get(text_hash)
+                if key is not None:
+                    self.counts["exact_duplicates"] += 1
+                elif self.lsh is not None and normalized:
+                    signature = self.lsh.signature(normalized)
+                    key = self.lsh.query(signature, self.threshold)
+                    if key is not None:
+                        self.counts["near_duplicates"] += 1
+                    else:
+                        self.lsh.insert(text_hash, signature)
+                if key is None:
+                    key = text_hash
+                    self._groups[key] = []
+                if text_hash not in self._group_of_hash:
+                    self._group_of_hash[text_hash] = key
+                    self._groups[key].append(text_hash)
+                self._groups.move_to_end(key)
+                keys.append(key)
+            self._evict()
+
+        return keys
+
+    def _evict(self):
+        """Forget least recently used groups until at most max_entries hashes remain."""
+        while len(self._group_of_hash) > self.max_entries and self._groups:
+            key, members = self._groups.popitem(last=False)
+            for text_hash in members:
+                del self._group_of_hash[text_hash]
+            self._results.pop(key, None)
+            if self.lsh is not None:
+                self.lsh.remove(key)
+
+    def get_result(self, key: str) -> Optional[Dict]:
+        """Return the remembered analysis for a group, if any."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._groups.move_to_end(key)
+            return result
+
+    def store_result(self, key: str, result: Dict):
+        """Remember the analysis computed for a group's representative."""
+        with self._lock:
+            # A group evicted since `assign` stays forgotten
+            if key in self._groups:
+                self._results[key] = result
+                self._groups.move_to_end(key)
+
+    def record(self, reviews: int, inferred: int, seconds: float):
+        """Account for one batch: reviews seen, representatives inferred and time spent on them."""
+        with self._lock:
+            self.counts["reviews"] += reviews
+            self.counts["inferred"] += inferred
+            self.inference_seconds += seconds
+
+    def stats(self) -> Dict[str, float]:
+        """Dedup ratio and an estimate of inference time saved."""
+        with self._lock:
+            counts = dict(self.counts)
+            seconds = self.inference_seconds
+            groups = len(self._groups)
+
+        duplicates = counts["reviews"] - counts["inferred"]
+        per_review = seconds / counts["inferred"] if counts["inferred"] else 0.0
+        counts["dedup_ratio"] = round(duplicates / counts["reviews"], 4) if counts["reviews"] else 0.0
+        counts["est_seconds_saved"] = round(duplicates * per_review, 2)
+        counts["groups"] = groups
+        return counts
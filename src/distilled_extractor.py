@@ -0,0 +1,576 @@
+"""
+Distilled local aspect extractor.
+A one-vs-rest logistic model on hashed word and character n-grams, trained on the
+pipeline's own past LLM extractions. Confident reviews are answered locally and only
+low-confidence reviews are forwarded to the LLM.
+
+Usage:
+    python -m src.distilled_extractor train --results "/workspace/output/*_results.jsonl"
+    python -m src.distilled_extractor evaluate --results "/workspace/output/*_results.jsonl"
+    python -m src.distilled_extractor train --results /workspace/output/results  # --incremental output
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+import numpy as np
+import pyarrow.parquet as pq
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from src.aspect_extraction import AspectExtractor
+from src.columnar_output import REVIEWS_FILE, load_aspects, load_reviews, result_dirs
+from src.extraction_cache import ExtractionCache
+from src.metrics import REGISTRY
+
+
+class HashedNgramFeaturizer:
+    """Maps text to sparse, L2-normalized counts of hashed word and character n-grams."""
+
+    def __init__(self, n_features: int = 2 ** 18, word_ngrams: int = 2, char_ngrams: Tuple[int, int] = (3, 5)):
+        """
+        Args:
+            n_features: Hash space size; collisions share a weight
+            word_ngrams: Longest word n-gram (1 = unigrams only)
+            char_ngrams: Shortest and longest character n-gram, taken inside word boundaries
+        """
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = tuple(char_ngrams)
+
+    def config(self) -> Dict:
+        return {"n_features": self.n_features, "word_ngrams": self.word_ngrams, "char_ngrams": list(self.char_ngrams)}
+
+    def hashes(self, text: str) -> List[int]:
+        """Hash of every word and character n-gram of the text, with repeats."""
+        # crc32 rather than hash(): string hashes are salted per process, and saved models must reload.
+        # Word and character n-grams use different crc32 start values so they do not collide.
+        words = ExtractionCache.normalize_text(text).lower().split()
+        encoded = [word.encode("utf-8") for word in words]
+        hashes = []
+        for n in range(1, self.word_ngrams + 1):
+            hashes.extend(zlib.crc32(b" ".join(encoded[i:i + n]), 1) for i in range(len(encoded) - n + 1))
+        low, high = self.char_ngrams
+        for word in encoded:
+            padded = b"<" + word + b">"
+            for n in range(low, high + 1):
+                hashes.extend(zlib.crc32(padded[i:i + n]) for i in range(len(padded) - n + 1))
+        return hashes
+
+    def transform_one(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature indices and values of one text."""
+        indices, counts = np.unique(
+            np.array(self.hashes(text), dtype=np.int64) % self.n_features, return_counts=True
+        )
+        values = counts.astype(np.float32)
+        norm = np.linalg.norm(values)
+        return indices, values / norm if norm else values
+
+    def transform(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sparse feature matrix of several texts in CSR form.
+
+        Returns:
+            (indptr, indices, values); row i covers indices[indptr[i]:indptr[i + 1]]
+        """
+        rows = [self.transform_one(text) for text in texts]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(indices) for indices, _ in rows])
+        if not rows:
+            return indptr, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return indptr, np.concatenate([r[0] for r in rows]), np.concatenate([r[1] for r in rows])
+
+
+class DistilledAspectModel:
+    """Independent logistic classifier per subcategory over hashed n-gram features."""
+
+    def __init__(
+        self,
+        labels: Optional[List[str]] = None,
+        featurizer: Optional[HashedNgramFeaturizer] = None,
+        teacher_fingerprint: Optional[str] = None
+    ):
+        """
+        Args:
+            labels: Subcategories to predict (default: all of AspectExtractor.SUBCATEGORIES)
+            featurizer: Text featurizer (default: HashedNgramFeaturizer())
+            teacher_fingerprint: Prompt fingerprint of the LLM whose outputs the model was trained on
+        """
+        self.labels = list(labels or AspectExtractor.SUBCATEGORIES)
+        self.featurizer = featurizer or HashedNgramFeaturizer()
+        self.teacher_fingerprint = teacher_fingerprint
+        self.weights = np.zeros((self.featurizer.n_features, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        self.trained_on = 0
+        # Fraction of reviews kept out of training (see is_held_out)
+        self.holdout = 0.0
+
+    def _logits(self, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        n_rows = len(indptr) - 1
+        logits = np.tile(self.bias, (n_rows, 1))
+        nonempty = np.flatnonzero(np.diff(indptr))
+        if len(nonempty):
+            contributions = self.weights[indices] * values[:, None]
+            logits[nonempty] += np.add.reduceat(contributions, indptr[nonempty], axis=0)
+        return logits
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Probability of each label (columns in `labels` order) for each text."""
+        logits = self._logits(*self.featurizer.transform(texts))
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def decide(self, probabilities: np.ndarray) -> Tuple[List[List[str]], np.ndarray]:
+        """
+        Label sets and per-review confidence from label probabilities.
+
+        A review gets every label at or above 0.5, or its most probable label if
+        none is. Its confidence is that of its least certain label decision, so a
+        review is only as confident as its closest call.
+        """
+        chosen = probabilities >= 0.5
+        empty = ~chosen.any(axis=1)
+        chosen[empty, probabilities[empty].argmax(axis=1)] = True
+        confidence = np.where(chosen, probabilities, 1.0 - probabilities).min(axis=1)
+        label_sets = [[self.labels[j] for j in np.flatnonzero(row)] for row in chosen]
+        return label_sets, confidence
+
+    def fit(
+        self,
+        texts: List[str],
+        label_sets: List[List[str]],
+        epochs: int = 10,
+        learning_rate: float = 0.5,
+        l2: float = 1e-6,
+        batch_size: int = 64,
+        seed: int = 0
+    ) -> "DistilledAspectModel":
+        """
+        Train with mini-batch AdaGrad on the logistic loss.
+
+        Args:
+            texts: Review texts
+            label_sets: LLM-extracted subcategories of each review; unknown labels are ignored
+            epochs: Passes over the data
+            learning_rate: AdaGrad base step size
+            l2: L2 penalty on the weights touched by each batch
+            batch_size: Reviews per update
+            seed: Shuffle seed
+        """
+        column = {label: j for j, label in enumerate(self.labels)}
+        targets = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        for i, labels in enumerate(label_sets):
+            for label in labels:
+                if label in column:
+                    targets[i, column[label]] = 1.0
+
+        indptr, indices, values = self.featurizer.transform(texts)
+        weight_accumulator = np.zeros_like(self.weights)
+        bias_accumulator = np.zeros_like(self.bias)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                spans = [np.arange(indptr[r], indptr[r + 1]) for r in rows]
+                positions = np.concatenate(spans) if spans else np.zeros(0, dtype=np.int64)
+                batch_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+                batch_indptr[1:] = np.cumsum([len(span) for span in spans])
+                batch_indices, batch_values = indices[positions], values[positions]
+
+                logits = self._logits(batch_indptr, batch_indices, batch_values)
+                error = 1.0 / (1.0 + np.exp(-logits)) - targets[rows]
+
+                # Gradients only for the features present in this batch
+                touched, inverse = np.unique(batch_indices, return_inverse=True)
+                row_of = np.repeat(np.arange(len(rows)), np.diff(batch_indptr))
+                contributions = error[row_of] * batch_values[:, None]
+                gradient = np.stack([
+                    np.bincount(inverse, weights=contributions[:, j], minlength=len(touched))
+                    for j in range(len(self.labels))
+                ], axis=1).astype(np.float32)
+                gradient = gradient / len(rows) + l2 * self.weights[touched]
+                weight_accumulator[touched] += gradient ** 2
+                self.weights[touched] -= learning_rate * gradient / (np.sqrt(weight_accumulator[touched]) + 1e-8)
+
+                bias_gradient = error.mean(axis=0)
+                bias_accumulator += bias_gradient ** 2
+                self.bias -= learning_rate * bias_gradient / (np.sqrt(bias_accumulator) + 1e-8)
+
+        self.trained_on = len(texts)
+        return self
+
+    def save(self, path: str):
+        """Write weights and configuration to a compressed .npz file."""
+        meta = {
+            "labels": self.labels,
+            "featurizer": self.featurizer.config(),
+            "teacher_fingerprint": self.teacher_fingerprint,
+            "trained_on": self.trained_on,
+            "holdout": self.holdout
+        }
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path: str) -> "DistilledAspectModel":
+        """Read a model written by `save`."""
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(meta["labels"], HashedNgramFeaturizer(**meta["featurizer"]), meta["teacher_fingerprint"])
+            model.weights = data["weights"]
+            model.bias = data["bias"]
+        model.trained_on = meta["trained_on"]
+        model.holdout = meta.get("holdout", 0.0)
+        return model
+
+
+class DistilledAspectExtractor:
+    """
+    Drop-in AspectExtractor replacement that answers confident reviews with a distilled model.
+
+    Reviews whose confidence is below `threshold` (and reviews already in the
+    fallback's extraction cache) go through the fallback LLM extractor.
+    """
+
+    SUBCATEGORY_DEFINITIONS = AspectExtractor.SUBCATEGORY_DEFINITIONS
+    SUBCATEGORIES = AspectExtractor.SUBCATEGORIES
+
+    def __init__(
+        self,
+        model: DistilledAspectModel,
+        fallback: Optional[AspectExtractor] = None,
+        threshold: float = 0.9
+    ):
+        """
+        Args:
+            model: Trained distilled model
+            fallback: LLM extractor for low-confidence reviews (None answers everything locally)
+            threshold: Minimum confidence (0.5-1.0) for a local answer; higher sends more to the LLM
+        """
+        self.model = model
+        self.fallback = fallback
+        self.threshold = threshold
+        self._stats_lock = threading.Lock()
+        self.stats = {"local_reviews": 0, "llm_reviews": 0, "local_seconds": 0.0}
+
+        if fallback is not None and model.teacher_fingerprint not in (None, fallback.fingerprint):
+            print("Distilled extractor was trained on another LLM model/prompt; consider retraining it")
+
+    def extract_aspects_batch(self, review_texts: List[str]) -> List[List[str]]:
+        """
+        Extract subcategories for many reviews, forwarding low-confidence ones to the fallback.
+
+        Args:
+            review_texts: The review texts to analyze
+
+        Returns:
+            List of subcategory lists, one per review
+        """
+        return self.extract_with_sources(review_texts)[0]
+
+    def extract_with_sources(self, review_texts: List[str]) -> Tuple[List[List[str]], List[str]]:
+        """
+        Same as `extract_aspects_batch`, also reporting where each answer came from.
+
+        Returns:
+            (subcategory lists, sources); local answers have the source "distilled",
+            the others keep the fallback's source (see AspectExtractor.extract_with_sources)
+        """
+        results = [None] * len(review_texts)
+        sources = [None] * len(review_texts)
+        pending = list(range(len(review_texts)))
+
+        # An exact LLM answer from an earlier run beats a local guess
+        cache = self.fallback.cache if self.fallback is not None else None
+        if cache is not None:
+            uncached = []
+            for i in pending:
+                results[i] = cache.get(review_texts[i], *self.fallback.cache_fingerprints)
+                if results[i] is None:
+                    uncached.append(i)
+                else:
+                    sources[i] = "cache"
+            pending = uncached
+
+        start_time = time.perf_counter()
+        texts = [str(review_texts[i]) if isinstance(review_texts[i], str) else "" for i in pending]
+        label_sets, confidence = self.model.decide(self.model.predict_proba(texts))
+        local_seconds = time.perf_counter() - start_time
+
+        deferred = []
+        for i, labels, score in zip(pending, label_sets, confidence):
+            if self.fallback is None or score >= self.threshold:
+                results[i], sources[i] = labels, "distilled"
+            else:
+                deferred.append(i)
+        if deferred:
+            fallback_results, fallback_sources = self.fallback.extract_with_sources([review_texts[i] for i in deferred])
+            for i, labels, source in zip(deferred, fallback_results, fallback_sources):
+                results[i], sources[i] = labels, source
+
+        REGISTRY.inc("distilled_extraction_reviews_total", len(pending) - len(deferred), route="local")
+        REGISTRY.inc("distilled_extraction_reviews_total", len(deferred), route="llm")
+        with self._stats_lock:
+            self.stats["local_reviews"] += len(pending) - len(deferred)
+            self.stats["llm_reviews"] += len(deferred)
+            self.stats["local_seconds"] += local_seconds
+        return results, sources
+
+    def extract_aspects(self, review_text: str) -> List[str]:
+        """
+        Extract all relevant subcategories from a review.
+
+        Args:
+            review_text: The review text to analyze
+
+        Returns:
+            List of subcategory strings (e.g., ["food_quality", "driver_behavior"])
+        """
+        return self.extract_aspects_batch([review_text])[0]
+
+    def throughput_report(self) -> Dict[str, object]:
+        """The fallback's LLM report plus how many reviews were answered locally."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        report = self.fallback.throughput_report() if self.fallback is not None else {}
+        routed = stats["local_reviews"] + stats["llm_reviews"]
+        report["distilled_local_reviews"] = stats["local_reviews"]
+        report["distilled_llm_reviews"] = stats["llm_reviews"]
+        report["distilled_local_fraction"] = round(stats["local_reviews"] / routed, 4) if routed else 0.0
+        report["distilled_us_per_review"] = (
+            round(stats["local_seconds"] / routed * 1e6, 1) if routed else 0.0
+        )
+        return report
+
+    def get_parent_aspect(self, subcategory: str) -> Optional[str]:
+        """Get the parent aspect for a subcategory (for sentiment analysis)."""
+        return self.SUBCATEGORIES.get(subcategory)
+
+    def close(self):
+        """Release the fallback's worker threads and connections."""
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+# Extraction sources that are genuine LLM answers. Distilled guesses, prefilter
+# skips and overall_satisfaction fallbacks would teach the model its own mistakes.
+TRAINING_SOURCES = ("llm", "cache")
+
+
+def _jsonl_rows(path: str) -> Iterator[Tuple[object, object, Optional[str]]]:
+    """(review_text, subcategory, extraction_source) of each row in a JSONL result store."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from an interrupted run
+                continue
+            yield row.get("review_text"), row.get("subcategory"), row.get("extraction_source")
+
+
+def _parquet_rows(output_dir: str) -> Iterator[Tuple[object, object, Optional[str]]]:
+    """(review_text, subcategory, extraction_source) of each aspect row in normalized or partitioned Parquet output."""
+    for result_dir in result_dirs(output_dir):
+        # Partitions written before sources were recorded have no extraction_source column
+        review_columns = [
+            name for name in ("review_id", "review_text", "extraction_source")
+            if name in pq.read_schema(os.path.join(result_dir, REVIEWS_FILE)).names
+        ]
+        reviews = load_reviews(result_dir, columns=review_columns)
+        aspects = load_aspects(result_dir, columns=["review_id", "subcategory"])
+        aspects["subcategory"] = aspects["subcategory"].astype(str)
+        rows = aspects.merge(reviews, on="review_id")
+        sources = rows["extraction_source"] if "extraction_source" in rows.columns else [None] * len(rows)
+        yield from zip(rows["review_text"], rows["subcategory"], sources)
+
+
+def load_training_data(patterns: List[str]) -> Tuple[List[str], List[List[str]]]:
+    """
+    Review texts and LLM-extracted subcategories from pipeline result files.
+
+    Reads the JSONL result stores written by run_analysis (one row per review
+    and subcategory), or directories of normalized or partitioned Parquet
+    output (e.g. the `--incremental` results root), and regroups them per
+    review; each distinct text is kept once.
+    Only rows whose `extraction_source` is in TRAINING_SOURCES are used; rows
+    written before sources were recorded are skipped as well.
+
+    Args:
+        patterns: Glob patterns of results files or directories
+            (e.g. /workspace/output/*_results.jsonl, /workspace/output/results)
+
+    Returns:
+        (texts, label_sets)
+    """
+    labels_by_text: Dict[str, Set[str]] = {}
+    skipped: Dict[str, int] = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            rows = _parquet_rows(path) if os.path.isdir(path) else _jsonl_rows(path)
+            for text, subcategory, source in rows:
+                source = source if isinstance(source, str) and source else "unknown"
+                if source not in TRAINING_SOURCES:
+                    skipped[source] = skipped.get(source, 0) + 1
+                elif isinstance(text, str) and subcategory in AspectExtractor.SUBCATEGORIES:
+                    labels_by_text.setdefault(text, set()).add(subcategory)
+    if skipped:
+        print("Skipped rows not answered by the LLM: "
+              + ", ".join(f"{source}={count:,}" for source, count in sorted(skipped.items())))
+    texts = list(labels_by_text)
+    return texts, [sorted(labels_by_text[text]) for text in texts]
+
+
+def evaluate(
+    model: DistilledAspectModel,
+    texts: List[str],
+    label_sets: List[List[str]],
+    thresholds: List[float]
+) -> Dict[str, object]:
+    """
+    Agreement of the distilled model with the LLM labels, overall and per confidence threshold.
+
+    Pass reviews the model was not trained on (see split_holdout). For each
+    threshold, `local_fraction` is the share of reviews answered locally,
+    `llm_forward_rate` the share forwarded to the LLM and `local_agreement`
+    the exact-set agreement on the local answers. `pipeline_agreement` assumes
+    forwarded reviews get the LLM's own answer, and `llm_speedup` is the
+    reduction in LLM requests.
+
+    Returns:
+        Dict with exact_match, micro precision/recall/F1, per-label F1 and a threshold sweep
+    """
+    start_time = time.perf_counter()
+    probabilities = model.predict_proba(texts)
+    predicted, confidence = model.decide(probabilities)
+    seconds = time.perf_counter() - start_time
+
+    expected = [set(labels) for labels in label_sets]
+    predicted = [set(labels) for labels in predicted]
+    matches = np.array([p == e for p, e in zip(predicted, expected)])
+
+    per_label = {}
+    true_positives = false_positives = false_negatives = 0
+    for label in model.labels:
+        tp = sum(label in p and label in e for p, e in zip(predicted, expected))
+        fp = sum(label in p and label not in e for p, e in zip(predicted, expected))
+        fn = sum(label not in p and label in e for p, e in zip(predicted, expected))
+        true_positives, false_positives, false_negatives = true_positives + tp, false_positives + fp, false_negatives + fn
+        if tp + fp + fn:
+            per_label[label] = round(2 * tp / (2 * tp + fp + fn), 4)
+
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+    sweep = []
+    for threshold in thresholds:
+        local = confidence >= threshold
+        sweep.append({
+            "threshold": threshold,
+            "local_fraction": round(float(local.mean()), 4) if len(local) else 0.0,
+            "llm_forward_rate": round(float((~local).mean()), 4) if len(local) else 0.0,
+            "local_agreement": round(float(matches[local].mean()), 4) if local.any() else 0.0,
+            "pipeline_agreement": round(float((matches | ~local).mean()), 4) if len(local) else 0.0,
+            "llm_speedup": round(len(local) / max(1, int((~local).sum())), 2)
+        })
+
+    return {
+        "reviews": len(texts),
+        "exact_match": round(float(matches.mean()), 4) if len(matches) else 0.0,
+        "micro_precision": round(precision, 4),
+        "micro_recall": round(recall, 4),
+        "micro_f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "us_per_review": round(seconds / max(1, len(texts)) * 1e6, 1),
+        "per_label_f1": per_label,
+        "thresholds": sweep
+    }
+
+
+def print_evaluation(report: Dict[str, object]):
+    """Print an evaluation report as a summary plus a threshold table."""
+    print(f"Held-out reviews: {report['reviews']:,}")
+    print(f"Exact-set agreement with the LLM: {report['exact_match']:.2%}")
+    print(f"Micro precision/recall/F1: {report['micro_precision']:.3f} / "
+          f"{report['micro_recall']:.3f} / {report['micro_f1']:.3f}")
+    print(f"Local inference: {report['us_per_review']:,.1f} us per review")
+    print()
+    print("| Threshold | Answered locally | Sent to LLM | Local agreement | Pipeline agreement | LLM speedup |")
+    print("|-----------|------------------|-------------|-----------------|--------------------|-------------|")
+    for row in report["thresholds"]:
+        print(f"| {row['threshold']:.2f} | {row['local_fraction']:.1%} | {row['llm_forward_rate']:.1%} "
+              f"| {row['local_agreement']:.1%} | {row['pipeline_agreement']:.1%} | {row['llm_speedup']:.1f}x |")
+
+
+def is_held_out(text: str, holdout: float) -> bool:
+    """Whether a review belongs to the held-out split, decided by a hash of its text."""
+    # A hash rather than a shuffle: the split stays the same as results files grow,
+    # so `evaluate` never scores a review that `train` has seen
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < holdout
+
+
+def split_holdout(
+    texts: List[str],
+    label_sets: List[List[str]],
+    holdout: float
+) -> Tuple[Tuple[List[str], List[List[str]]], Tuple[List[str], List[List[str]]]]:
+    """Split into (train, held-out) parts; about `holdout` of the reviews are held out."""
+    held_out = [is_held_out(text, holdout) for text in texts]
+    train = [i for i, flag in enumerate(held_out) if not flag]
+    test = [i for i, flag in enumerate(held_out) if flag]
+    return ([texts[i] for i in train], [label_sets[i] for i in train]), ([texts[i] for i in test], [label_sets[i] for i in test])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train and evaluate the distilled aspect extractor")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--results", nargs="+", default=["/workspace/output/*_results.jsonl"],
+                        help="Pipeline result files or Parquet result directories holding past LLM extractions "
+                             "(glob patterns)")
+    parser.add_argument("--model", default="/workspace/output/distilled_extractor.npz")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Fraction held out for evaluation when training; evaluate reuses the model's own")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--n-features", type=int, default=2 ** 18)
+    parser.add_argument("--seed", type=int, default=0)
+    # The LLM configuration that produced the results, as passed to run_analysis
+    parser.add_argument("--llm-model", default="qwen2.5:14b-instruct", help="Ollama model that extracted the training labels")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="The results came from run_analysis --structured-output")
+    parser.add_argument("--static-prefix", action="store_true",
+                        help="The results came from run_analysis --warm-llm (instructions sent as a system prompt)")
+    args = parser.parse_args()
+
+    texts, label_sets = load_training_data(args.results)
+    print(f"Loaded {len(texts):,} distinct reviews with LLM extractions")
+
+    if args.command == "train":
+        (train_texts, train_labels), (test_texts, test_labels) = split_holdout(texts, label_sets, args.holdout)
+        # Record which LLM configuration produced the labels, so a changed prompt can be noticed
+        teacher = AspectExtractor(
+            model=args.llm_model,
+            structured_output=args.structured_output,
+            static_prefix=args.static_prefix
+        )
+        teacher.close()
+        model = DistilledAspectModel(
+            featurizer=HashedNgramFeaturizer(n_features=args.n_features),
+            teacher_fingerprint=teacher.fingerprint
+        )
+        model.holdout = args.holdout
+        start_time = time.time()
+        model.fit(train_texts, train_labels, epochs=args.epochs, seed=args.seed)
+        print(f"Trained on {len(train_texts):,} reviews in {time.time() - start_time:.1f}s")
+        model.save(args.model)
+        print(f"Saved model to {args.model}\n")
+        if test_texts:
+            print_evaluation(evaluate(model, test_texts, test_labels, args.thresholds))
+    else:
+        model = DistilledAspectModel.load(args.model)
+        if not model.holdout:
+            parser.error(f"{args.model} was trained without a held-out split; retrain with --holdout")
+        _, (test_texts, test_labels) = split_holdout(texts, label_sets, model.holdout)
+        print_evaluation(evaluate(model, test_texts, test_labels, args.thresholds))
@@ -0,0 +1,151 @@
+"""
+Persistent content-addressed cache for LLM aspect extraction results.
+Lets re-runs skip Ollama for reviews whose text, model and prompt are unchanged.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+
+class ExtractionCache:
+    """SQLite-backed cache of extracted subcategories with LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = "/workspace/output/extraction_cache.sqlite",
+        max_entries: int = 1_000_000,
+        access_batch: int = 500
+    ):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of cached reviews; least recently used are evicted
+            access_batch: Hits whose access times are buffered before one batched write
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.access_batch = access_batch
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # Access times of recent hits, written in batches rather than one commit per hit
+        self._accessed: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                aspects TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_access ON extractions(last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize unicode form and whitespace so trivially different copies share a key."""
+        return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+    def make_key(self, review_text: str, fingerprint: str) -> str:
+        """Content hash of the normalized review text under a given extractor fingerprint."""
+        content = f"{fingerprint}\0{self.normalize_text(review_text)}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def invalidate_stale(self, *fingerprints: str) -> int:
+        """
+        Drop entries produced under any other extractor fingerprint.
+
+        Args:
+            *fingerprints: Fingerprints of the current model/prompt configuration
+                (one per prompt shape); their entries are kept
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM extractions WHERE fingerprint NOT IN ({','.join('?' * len(fingerprints))})",
+                fingerprints
+            )
+            self._conn.commit()
+            self._size -= cursor.rowcount
+            return cursor.rowcount
+
+    def _write_accessed(self):
+        """Write buffered access times; the caller holds the lock and commits."""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE extractions SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def get(self, review_text: str, *fingerprints: str) -> Optional[List[str]]:
+        """Return cached subcategories for a review under the first fingerprint that has them, or None on a miss."""
+        keys = [self.make_key(review_text, fingerprint) for fingerprint in fingerprints]
+        with self._lock:
+            found = dict(self._conn.execute(
+                f"SELECT key, aspects FROM extractions WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall())
+            key = next((key for key in keys if key in found), None)
+            if key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.access_batch:
+                self._write_accessed()
+                self._conn.commit()
+            return json.loads(found[key])
+
+    def put(self, review_text: str, fingerprint: str, aspects: List[str]):
+        """Store subcategories for a review, evicting the least recently used entries if full."""
+        key = self.make_key(review_text, fingerprint)
+        with self._lock:
+            # Eviction below must see recent hits as recently used
+            self._write_accessed()
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO extractions (key, fingerprint, aspects, last_access) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(aspects), time.time())
+            )
+            self._size += cursor.rowcount
+
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                cursor = self._conn.execute(
+                    "DELETE FROM extractions WHERE key IN "
+                    "(SELECT key FROM extractions ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._size -= cursor.rowcount
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self._size
+        }
+
+    def close(self):
+        """Write buffered access times and close the underlying database connection."""
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -3,56 +3,144 @@ Generate visual insights and summary statistics from analysis results.
 Creates markdown-friendly tables and statistics for portfolio presentation.
 """
 
+import os
 import pandas as pd
 import sys
+from typing import Dict
+from src.columnar_output import load_aspects
 
 
-def generate_insights(csv_path: str):
-    """Generate business insights from analysis results."""
+SENTIMENTS = ['negative', 'neutral', 'positive']
+PLATFORMS = ['doordash', 'ubereats', 'grubhub']
+CUBE_DIMENSIONS = ['platform', 'subcategory', 'parent_aspect']
 
-    print("=" * 80)
-    print("BUSINESS INSIGHTS GENERATOR")
-    print("=" * 80)
-    print()
 
-    # Load data
-    df = pd.read_csv(csv_path)
+def load_results(path: str) -> pd.DataFrame:
+    """
+    Load only the columns the insights need, with low-cardinality columns as categoricals.
+
+    Args:
+        path: Normalized Parquet output directory (see src.columnar_output) or a wide results CSV
+    """
+    columns = ['review_id'] + CUBE_DIMENSIONS + ['sentiment']
+    if os.path.isdir(path):
+        return load_aspects(path, columns=columns)
+
+    return pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={column: 'category' for column in CUBE_DIMENSIONS + ['sentiment']}
+    )
 
-    print(f"📊 Loaded {len(df)} aspect-sentiment pairs from {df['review_id'].nunique()} reviews\n")
+
+def build_sentiment_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count aspect-sentiment pairs once by (platform, subcategory, parent_aspect) x sentiment.
+
+    Every insight table is derived from this cube instead of re-filtering the rows.
+    """
+    cube = (
+        df.groupby(CUBE_DIMENSIONS + ['sentiment'], observed=True)
+        .size()
+        .unstack('sentiment', fill_value=0)
+    )
+    return cube.reindex(columns=SENTIMENTS, fill_value=0)
+
+
+def compute_insights(df: pd.DataFrame) -> Dict[str, object]:
+    """
+    Compute all insight tables from one pass over the analysis results.
+
+    Args:
+        df: Analysis results with review_id, platform, subcategory, parent_aspect and sentiment
+
+    Returns:
+        Dict of summary numbers and DataFrames used by the report
+    """
+    cube = build_sentiment_cube(df)
+
+    # Subcategory x sentiment and platform x sentiment rollups of the cube
+    subcat_sentiment = cube.groupby(level='subcategory', observed=True).sum()
+    subcat_totals = subcat_sentiment.sum(axis=1)
+    platform_sentiment = cube.groupby(level='platform', observed=True).sum()
+    platform_totals = platform_sentiment.sum(axis=1)
+    sentiment_counts = cube.sum()
+
+    pain_points = subcat_sentiment['negative'][subcat_sentiment['negative'] > 0]
+    pain_points = pain_points.sort_values(ascending=False, kind='stable').head(10)
+
+    # Only include subcategories with sufficient data
+    eligible = subcat_totals >= 50
+    positive = pd.DataFrame({
+        'positive_count': subcat_sentiment.loc[eligible, 'positive'],
+        'total': subcat_totals[eligible],
+    })
+    positive['positive_pct'] = positive['positive_count'] / positive['total'] * 100
+
+    platform_negatives = cube['negative'].groupby(level=['platform', 'subcategory'], observed=True).sum()
+    platform_pain_points = {}
+    for platform in PLATFORMS:
+        if platform in platform_negatives.index.get_level_values('platform'):
+            counts = platform_negatives.xs(platform, level='platform')
+            counts = counts[counts > 0].sort_values(ascending=False, kind='stable').head(3)
+        else:
+            counts = pd.Series(dtype='int64')
+        platform_pain_points[platform] = counts
+
+    return {
+        'total_reviews': df['review_id'].nunique(),
+        'total_pairs': int(sentiment_counts.sum()),
+        'unique_subcategories': int((subcat_totals > 0).sum()),
+        'platforms': [str(p) for p in pd.unique(df['platform'])],
+        'sentiment_counts': sentiment_counts,
+        'sentiment_pcts': sentiment_counts / sentiment_counts.sum() * 100,
+        'platform_sentiment': platform_sentiment,
+        'platform_totals': platform_totals,
+        'platform_pcts': platform_sentiment.div(platform_totals, axis=0) * 100,
+        'top_subcategories': subcat_totals.sort_values(ascending=False, kind='stable').head(10),
+        'pain_points': pain_points,
+        'pain_point_pcts': pain_points / subcat_totals[pain_points.index] * 100,
+        'positive_highlights': positive.sort_values('positive_pct', ascending=False).head(10),
+        'platform_pain_points': platform_pain_points,
+    }
+
+
+def print_insights(insights: Dict[str, object]):
+    """Print the insight tables as markdown."""
+    print(f"📊 Loaded {insights['total_pairs']} aspect-sentiment pairs from {insights['total_reviews']} reviews\n")
 
     # Overall Statistics
     print("## OVERALL STATISTICS")
     print("-" * 80)
-    print(f"Total Reviews Analyzed: {df['review_id'].nunique():,}")
-    print(f"Total Aspect-Sentiment Pairs: {len(df):,}")
-    print(f"Unique Subcategories: {df['subcategory'].nunique()}")
-    print(f"Platforms: {', '.join(df['platform'].unique())}")
+    print(f"Total Reviews Analyzed: {insights['total_reviews']:,}")
+    print(f"Total Aspect-Sentiment Pairs: {insights['total_pairs']:,}")
+    print(f"Unique Subcategories: {insights['unique_subcategories']}")
+    print(f"Platforms: {', '.join(insights['platforms'])}")
     print()
 
     # Sentiment Distribution
     print("## SENTIMENT DISTRIBUTION")
     print("-" * 80)
-    sentiment_counts = df['sentiment'].value_counts()
-    sentiment_pcts = df['sentiment'].value_counts(normalize=True) * 100
+    sentiment_counts = insights['sentiment_counts']
+    sentiment_pcts = insights['sentiment_pcts']
 
     print("| Sentiment | Count | Percentage |")
     print("|-----------|-------|------------|")
-    for sentiment in ['negative', 'neutral', 'positive']:
-        if sentiment in sentiment_counts:
+    for sentiment in SENTIMENTS:
+        if sentiment_counts[sentiment] > 0:
             print(f"| {sentiment.capitalize():9} | {sentiment_counts[sentiment]:5,} | {sentiment_pcts[sentiment]:5.1f}% |")
     print()
 
     # Platform Comparison
     print("## PLATFORM COMPARISON")
     print("-" * 80)
-    platform_sentiment = df.groupby(['platform', 'sentiment']).size().unstack(fill_value=0)
-    platform_totals = platform_sentiment.sum(axis=1)
-    platform_pcts = platform_sentiment.div(platform_totals, axis=0) * 100
+    platform_pcts = insights['platform_pcts']
+    platform_totals = insights['platform_totals']
 
     print("| Platform | Negative | Neutral | Positive | Total |")
     print("|----------|----------|---------|----------|-------|")
-    for platform in ['doordash', 'ubereats', 'grubhub']:
-        if platform in platform_sentiment.index:
+    for platform in PLATFORMS:
+        if platform in platform_pcts.index:
             neg_pct = platform_pcts.loc[platform, 'negative']
             pos_pct = platform_pcts.loc[platform, 'positive']
             total = platform_totals[platform]
@@ -62,26 +150,21 @@ def generate_insights(csv_path: str):
     # Top Subcategories by Volume
     print("## TOP 10 SUBCATEGORIES (BY VOLUME)")
     print("-" * 80)
-    top_subcats = df['subcategory'].value_counts().head(10)
 
     print("| Rank | Subcategory | Mentions |")
     print("|------|-------------|----------|")
-    for rank, (subcat, count) in enumerate(top_subcats.items(), 1):
+    for rank, (subcat, count) in enumerate(insights['top_subcategories'].items(), 1):
         print(f"| {rank:4} | {subcat:30} | {count:6,} |")
     print()
 
     # Top Pain Points (Negative Sentiment)
     print("## TOP 10 PAIN POINTS (HIGHEST NEGATIVE SENTIMENT)")
     print("-" * 80)
-    negative_df = df[df['sentiment'] == 'negative']
-    pain_points = negative_df['subcategory'].value_counts().head(10)
 
-    # Calculate negative percentage for each
     print("| Rank | Subcategory | Negative Mentions | Negative % |")
     print("|------|-------------|-------------------|------------|")
-    for rank, (subcat, neg_count) in enumerate(pain_points.items(), 1):
-        total_count = len(df[df['subcategory'] == subcat])
-        neg_pct = (neg_count / total_count) * 100
+    for rank, (subcat, neg_count) in enumerate(insights['pain_points'].items(), 1):
+        neg_pct = insights['pain_point_pcts'][subcat]
         print(f"| {rank:4} | {subcat:30} | {neg_count:9,} | {neg_pct:7.1f}% |")
     print()
 
@@ -89,45 +172,37 @@ def generate_insights(csv_path: str):
     print("## POSITIVE HIGHLIGHTS (HIGHEST POSITIVE SENTIMENT)")
     print("-" * 80)
 
-    # Calculate positive percentage for each subcategory
-    subcat_stats = []
-    for subcat in df['subcategory'].unique():
-        subcat_df = df[df['subcategory'] == subcat]
-        total = len(subcat_df)
-        positive = len(subcat_df[subcat_df['sentiment'] == 'positive'])
-
-        if total >= 50:  # Only include subcategories with sufficient data
-            pos_pct = (positive / total) * 100
-            subcat_stats.append({
-                'subcategory': subcat,
-                'positive_count': positive,
-                'total': total,
-                'positive_pct': pos_pct
-            })
-
-    positive_df = pd.DataFrame(subcat_stats).sort_values('positive_pct', ascending=False).head(10)
-
     print("| Rank | Subcategory | Positive % | Positive/Total |")
     print("|------|-------------|------------|----------------|")
-    for rank, row in enumerate(positive_df.itertuples(), 1):
-        print(f"| {rank:4} | {row.subcategory:30} | {row.positive_pct:7.1f}% | {row.positive_count:4}/{row.total:4} |")
+    for rank, (subcat, row) in enumerate(insights['positive_highlights'].iterrows(), 1):
+        print(f"| {rank:4} | {subcat:30} | {row.positive_pct:7.1f}% | {int(row.positive_count):4}/{int(row.total):4} |")
     print()
 
     # Platform-Specific Pain Points
     print("## PLATFORM-SPECIFIC TOP PAIN POINTS")
     print("-" * 80)
 
-    for platform in ['doordash', 'ubereats', 'grubhub']:
-        platform_df = df[df['platform'] == platform]
-        platform_negatives = platform_df[platform_df['sentiment'] == 'negative']
-        top_3 = platform_negatives['subcategory'].value_counts().head(3)
-
+    for platform, top_3 in insights['platform_pain_points'].items():
         print(f"\n### {platform.upper()}")
         print("| Rank | Pain Point | Mentions |")
         print("|------|------------|----------|")
         for rank, (subcat, count) in enumerate(top_3.items(), 1):
             print(f"| {rank:4} | {subcat:30} | {count:6,} |")
 
+
+def generate_insights(csv_path: str):
+    """Generate business insights from analysis results (wide CSV or normalized Parquet directory)."""
+
+    print("=" * 80)
+    print("BUSINESS INSIGHTS GENERATOR")
+    print("=" * 80)
+    print()
+
+    # Load data
+    df = load_results(csv_path)
+
+    print_insights(compute_insights(df))
+
     print("\n" + "=" * 80)
     print("INSIGHTS GENERATION COMPLETE")
     print("=" * 80)
@@ -0,0 +1,88 @@
+"""
+Chunked review ingestion for CSV and JSONL exports.
+Reads files in bounded chunks so arbitrarily large inputs run in constant memory.
+"""
+
+import hashlib
+import json
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterator
+
+
+def iter_review_chunks(path: str, chunk_size: int = 1000, **extra_columns) -> Iterator[pd.DataFrame]:
+    """
+    Read a review file as a sequence of DataFrames of at most `chunk_size` rows.
+
+    Args:
+        path: CSV or JSONL (one JSON object per line) review file
+        chunk_size: Maximum rows per chunk
+        **extra_columns: Constant columns added to every chunk (e.g. platform="doordash")
+
+    Yields:
+        DataFrame chunks
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        chunks = _iter_jsonl_chunks(path, chunk_size)
+    else:
+        # Keep review IDs as strings; hex IDs like "12e4..." would otherwise parse as floats
+        chunks = pd.read_csv(path, chunksize=chunk_size, dtype={"id": str})
+
+    for chunk in chunks:
+        for column, value in extra_columns.items():
+            chunk[column] = value
+        yield chunk
+
+
+def _iter_jsonl_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Read a JSONL file as DataFrame chunks."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            records.append(json.loads(line))
+            if len(records) >= chunk_size:
+                yield pd.DataFrame(records)
+                records = []
+    if records:
+        yield pd.DataFrame(records)
+
+
+def iter_reviews(path: str, chunk_size: int = 1000, **extra_columns) -> Iterator[Dict]:
+    """
+    Lazily yield reviews from a CSV or JSONL file as dicts, one chunk in memory at a time.
+
+    Args:
+        path: CSV or JSONL review file
+        chunk_size: Rows read from disk at once
+        **extra_columns: Constant fields added to every review (e.g. platform="doordash")
+
+    Yields:
+        One dict per review
+    """
+    for chunk in iter_review_chunks(path, chunk_size, **extra_columns):
+        yield from chunk.to_dict("records")
+
+
+def review_id(review: Dict):
+    """
+    The review's `id`, or a content hash of its other fields if it has none.
+
+    A missing or NaN `id` (an empty cell in a CSV export) gets the hash, so the
+    same review gets the same ID on every run and in every input order. Such a
+    review cannot be told apart from a new one once its text is edited.
+    """
+    value = review.get("id")
+    if value is not None and not (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return value
+    content = json.dumps({key: val for key, val in review.items() if key != "id"}, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def review_day(date) -> str:
+    """ISO day (YYYY-MM-DD) of a review's date field, or "" if it cannot be parsed."""
+    try:
+        return datetime.fromisoformat(str(date).strip()).date().isoformat()
+    except ValueError:
+        return ""
@@ -0,0 +1,121 @@
+"""
+Manifest of processed reviews for incremental runs.
+Records each review's text hash and day so re-exported feeds only reprocess new or edited reviews.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from src.ingest import review_day, review_id
+
+
+class ReviewManifest:
+    """SQLite table of (platform, review id) -> text hash and day of the analyzed version."""
+
+    def __init__(self, path: str = "/workspace/output/manifest.sqlite"):
+        """
+        Open (or create) the manifest database.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.counts = Counter()
+
+        self._lock = threading.Lock()
+        # Reviews handed out by select_changed but not yet committed
+        self._pending: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS reviews (
+                platform TEXT NOT NULL,
+                review_id TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                day TEXT NOT NULL,
+                PRIMARY KEY (platform, review_id)
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(review_text) -> str:
+        """Hash of the exact review text, so any edit is detected."""
+        text = review_text if isinstance(review_text, str) else ""
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def lookup(self, platform: str, review_id) -> Optional[Tuple[str, str]]:
+        """Return (text_hash, day) of the analyzed version of a review, or None if never processed."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT text_hash, day FROM reviews WHERE platform = ? AND review_id = ?",
+                (platform, str(review_id))
+            ).fetchone()
+
+    def select_changed(self, reviews: Iterable[Dict], platform: str, review_column: str = "review") -> Iterator[Dict]:
+        """
+        Yield only reviews that are new or whose text or date changed since they were analyzed.
+
+        Reviews without an `id` (missing or NaN) are tracked under a content
+        hash (see `src.ingest.review_id`) and yielded with it as their `id`.
+
+        Args:
+            reviews: Iterable of review dicts (e.g. `src.ingest.iter_reviews`)
+            platform: Platform the reviews belong to
+            review_column: Name of the field containing review text
+
+        Yields:
+            Review dicts that need (re)processing
+        """
+        for review in reviews:
+            key = review_id(review)
+            if key is not review.get("id"):
+                self.counts["hashed_ids"] += 1
+                review = {**review, "id": key}
+
+            current = (self.text_hash(review.get(review_column)), review_day(review.get("date")))
+            previous = self.lookup(platform, key)
+            if previous is not None and tuple(previous) == current:
+                self.counts["unchanged"] += 1
+                continue
+
+            self.counts["new" if previous is None else "changed"] += 1
+            with self._lock:
+                self._pending[(platform, str(key))] = current
+            yield review
+
+    def commit(self, platform: str, review_ids: List) -> int:
+        """
+        Record reviews handed out by `select_changed` as analyzed.
+
+        Call this only after their results are durably written, so a crash
+        between the two makes the next run reprocess them instead of losing them.
+
+        Returns:
+            Number of manifest entries written
+        """
+        with self._lock:
+            entries = []
+            for review_id in review_ids:
+                key = (platform, str(review_id))
+                if key in self._pending:
+                    text_hash, day = self._pending.pop(key)
+                    entries.append((platform, str(review_id), text_hash, day))
+            self._conn.executemany("INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?)", entries)
+            self._conn.commit()
+            return len(entries)
+
+    def stats(self) -> Dict[str, int]:
+        """New, changed and unchanged review counts seen by `select_changed`, plus the manifest size."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+        counts = {name: self.counts[name] for name in ("new", "changed", "unchanged", "hashed_ids")}
+        counts["entries"] = size
+        return counts
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
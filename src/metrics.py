@@ -0,0 +1,285 @@
+"""
+In-process metrics for the pipeline stages.
+Counters and latency histograms, dumped as JSON or Prometheus text or served over HTTP.
+"""
+
+import bisect
+import json
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+# Latency buckets in seconds, from sub-millisecond tokenization to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PERCENTILES = (50, 90, 99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucketed distribution plus a uniform reservoir sample for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size: int = 4096, seed: int = 0):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.reservoir_size = reservoir_size
+        self._reservoir: List[float] = []
+        self._rng = random.Random(seed)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._reservoir) < self.reservoir_size:
+            self._reservoir.append(value)
+        else:
+            slot = self._rng.randrange(self.count)
+            if slot < self.reservoir_size:
+                self._reservoir[slot] = value
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile of the sampled observations."""
+        if not self._reservoir:
+            return 0.0
+        ordered = sorted(self._reservoir)
+        rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+        return ordered[rank]
+
+    def summary(self) -> Dict[str, float]:
+        summary = {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "min": round(self.min, 6) if self.count else 0.0,
+            "max": round(self.max, 6) if self.count else 0.0
+        }
+        for q in PERCENTILES:
+            summary[f"p{q}"] = round(self.percentile(q), 6)
+        return summary
+
+
+class MetricsRegistry:
+    """Thread-safe named counters and histograms, optionally labeled."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @staticmethod
+    def _key(labels: Dict[str, object]) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def describe(self, name: str, help_text: str):
+        """Attach a help string shown in the Prometheus output."""
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation (usually seconds) in a histogram."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time a block into a histogram, also when it raises."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def reset(self):
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        All metrics as plain data.
+
+        Returns:
+            {"counters": {name: [{"labels", "value"}]}, "histograms": {name: [{"labels", count, sum, mean, p50...}]}}
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+                    for name, series in sorted(self._counters.items())
+                },
+                "histograms": {
+                    name: [{"labels": dict(key), **histogram.summary()} for key, histogram in sorted(series.items())]
+                    for name, series in sorted(self._histograms.items())
+                }
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render metrics in the Prometheus text exposition format."""
+        def label_text(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+            return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{label_text(key)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (math.inf,), histogram.bucket_counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(bound)
+                        lines.append(f"{name}_bucket{label_text(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{label_text(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{label_text(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Dump metrics to a file: Prometheus text for .prom/.txt, JSON otherwise."""
+        content = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def print_summary(self):
+        """Print latency percentiles and counters as markdown tables."""
+        snapshot = self.snapshot()
+        print("| Timing | Labels | Count | Mean (ms) | p50 (ms) | p90 (ms) | p99 (ms) | Total (s) |")
+        print("|--------|--------|-------|-----------|----------|----------|----------|-----------|")
+        for name, series in snapshot["histograms"].items():
+            for entry in series:
+                labels = ",".join(f"{k}={v}" for k, v in entry["labels"].items()) or "-"
+                print(
+                    f"| {name} | {labels} | {entry['count']:,} | {entry['mean'] * 1000:.1f} | {entry['p50'] * 1000:.1f} "
+                    f"| {entry['p90'] * 1000:.1f} | {entry['p99'] * 1000:.1f} | {entry['sum']:.2f} |"
+                )
+        print()
+        print("| Counter | Labels | Value |")
+        print("|---------|--------|-------|")
+        for name, series in snapshot["counters"].items():
+            for entry in series:
+                labels = ",".join(f"{k}={v}" for k, v in entry["labels"].items()) or "-"
+                print(f"| {name} | {labels} | {entry['value']:,} |")
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve metrics over HTTP from a background thread.
+
+        `/metrics` returns Prometheus text and `/metrics.json` returns JSON.
+
+        Args:
+            port: Port to listen on (0 picks a free one)
+            host: Interface to bind; localhost by default
+
+        Returns:
+            The running server (see `server_address` for the bound port)
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Serving metrics on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def stop_serving(self):
+        """Shut down the HTTP endpoint if it is running."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Registry shared by every pipeline component in the process
+REGISTRY = MetricsRegistry()
+
+for _name, _help in {
+    "sentiment_tokenize_seconds": "Tokenizing the (review, aspect) pairs of one analyze_batch call",
+    "sentiment_pad_seconds": "Padding one forward-pass batch",
+    "sentiment_forward_seconds": "One sentiment forward pass",
+    "sentiment_pairs_total": "(review, aspect) pairs classified",
+    "token_cache_reviews_total": "Distinct reviews tokenized per analyze_batch call, by source (hit, miss, full_encode)",
+    "sentiment_memo_lookups_total": "(review, aspect) pairs looked up in the sentiment memo cache, by tier (memory, disk, miss)",
+    "llm_http_seconds": "One Ollama HTTP round trip (each retry attempt counts)",
+    "llm_retries_total": "Ollama requests retried after a transient failure",
+    "llm_request_errors_total": "Extraction requests that failed after all retries",
+    "llm_generated_tokens_total": "Tokens generated by the LLM (up to the early stop for streamed structured output)",
+    "llm_early_stops_total": "Streamed structured replies closed as soon as the JSON value was complete",
+    "llm_ttft_seconds": "Time to first token (measured when streaming, else Ollama's load + prompt eval time)",
+    "llm_prompt_eval_tokens_total": "Prompt tokens Ollama evaluated (a reused prefix is not counted)",
+    "llm_prompt_eval_seconds": "Ollama prompt evaluation time of one request",
+    "llm_load_seconds": "Ollama model load time reported on a request (model was not resident)",
+    "llm_parse_seconds": "Parsing one LLM response",
+    "llm_parse_failures_total": "LLM responses with no usable JSON array/object",
+    "distilled_extraction_reviews_total": "Reviews answered by the distilled extractor (route=local) or sent on to the LLM (route=llm)",
+    "extraction_fallbacks_total": "Reviews assigned overall_satisfaction because extraction gave nothing usable",
+    "extraction_slot_fallbacks_total": "Packed-prompt slots retried as single-review requests",
+    "checkpoint_write_seconds": "One durable result-store write",
+    "reviews_processed_total": "Reviews analyzed by the pipeline",
+    "review_batch_seconds": "Analyzing one group of reviews end to end",
+    "scheduler_stage_seconds": "One review group in one StagedScheduler stage",
+    "absa_server_queue_wait_seconds": "Time a review queued in ABSAServer before its micro-batch started",
+    "absa_server_batch_seconds": "Analyzing one ABSAServer micro-batch",
+    "absa_server_batches_total": "Micro-batches analyzed by ABSAServer",
+    "absa_server_reviews_total": "Reviews analyzed by ABSAServer",
+    "absa_server_batch_errors_total": "ABSAServer micro-batches that failed",
+    "absa_server_rejected_total": "ABSAServer requests refused, by reason (queue_full, not_ready)"
+}.items():
+    REGISTRY.describe(_name, _help)
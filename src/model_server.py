@@ -0,0 +1,213 @@
+"""
+Warm sentiment model server.
+A long-lived local process holds the loaded RoBERTa model so repeated CLI runs skip the load cost.
+
+Usage: python -m src.model_server --port 8765
+Then:  python run_analysis.py --sentiment-server http://127.0.0.1:8765
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import requests
+from src.sentiment_analyzer import SentimentAnalyzer
+from src.sentiment_cache import SentimentCache
+
+
+class ModelServer:
+    """HTTP front end for one loaded SentimentAnalyzer."""
+
+    def __init__(self, analyzer: SentimentAnalyzer, port: int = 8765, host: str = "127.0.0.1"):
+        """
+        Args:
+            analyzer: Analyzer to serve; loaded before the server starts accepting requests
+            port: Port to listen on (0 picks a free one)
+            host: Interface to bind; localhost by default
+        """
+        self.analyzer = analyzer
+        self.host = host
+        self.port = port
+        self.pairs_served = 0
+        self.started_at = None
+        # The tokenizer and model are not safe to call from several threads at once
+        self._inference_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def health(self) -> Dict[str, object]:
+        return {
+            "model_path": self.analyzer.model_path,
+            "backend": self.analyzer.backend_name,
+            "device": str(self.analyzer.device),
+            "pairs_served": self.pairs_served,
+            "uptime_seconds": round(time.time() - self.started_at, 1)
+        }
+
+    def analyze(self, pairs: List[Tuple[str, str]], batch_size: int) -> List[Dict[str, object]]:
+        with self._inference_lock:
+            results = self.analyzer.analyze_batch(pairs, batch_size=batch_size)
+            self.pairs_served += len(pairs)
+        return results
+
+    def start(self) -> "ModelServer":
+        """Load the model, then serve from a background thread."""
+        self.analyzer.load()
+        model_server = self
+
+        class ModelHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: Dict):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, model_server.health())
+                else:
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+
+            def do_POST(self):
+                if self.path != "/analyze":
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                    pairs = [(str(review_text), str(aspect)) for review_text, aspect in request["pairs"]]
+                    batch_size = int(request.get("batch_size", 32))
+                except (KeyError, TypeError, ValueError) as e:
+                    self._reply(400, {"error": f"bad request: {e}"})
+                    return
+                try:
+                    results = model_server.analyze(pairs, batch_size)
+                except Exception as e:
+                    print(f"Error analyzing {len(pairs)} pairs: {e}")
+                    self._reply(500, {"error": f"analysis failed: {e}"})
+                    return
+                self._reply(200, {"results": results})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), ModelHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.started_at = time.time()
+        threading.Thread(target=self._server.serve_forever, name="model-server", daemon=True).start()
+        print(f"Serving {self.analyzer.model_path} on http://{self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class RemoteSentimentAnalyzer:
+    """Drop-in SentimentAnalyzer replacement that sends inference to a running model server."""
+
+    ASPECT_MAPPING = SentimentAnalyzer.ASPECT_MAPPING
+    SENTIMENT_LABELS = SentimentAnalyzer.SENTIMENT_LABELS
+
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 300):
+        """
+        Connect to a model server.
+
+        Args:
+            url: Base URL of the server started with `python -m src.model_server`
+            timeout: Per-request timeout in seconds
+
+        Raises:
+            ConnectionError: If no model server answers at the URL
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        try:
+            info = self.session.get(f"{self.url}/health", timeout=5).json()
+        except requests.RequestException as e:
+            raise ConnectionError(f"No model server at {self.url}; start one with: python -m src.model_server") from e
+        self.model_path = info["model_path"]
+        self.backend_name = info["backend"]
+        self.device = info["device"]
+        print(f"Using warm sentiment model {self.model_path} at {self.url} ({self.device})")
+
+    def load(self) -> "RemoteSentimentAnalyzer":
+        """The server already holds the loaded model."""
+        return self
+
+    def analyze_sentiment(self, review_text: str, aspect: str) -> Dict[str, any]:
+        """Analyze sentiment for a specific aspect in the review."""
+        return self.analyze_batch([(review_text, aspect)])[0]
+
+    def analyze_batch(
+        self,
+        pairs: List[Tuple[str, str]],
+        batch_size: int = 32
+    ) -> List[Dict[str, any]]:
+        """Analyze sentiment for many (review, aspect) pairs on the model server."""
+        if not pairs:
+            return []
+        response = self.session.post(
+            f"{self.url}/analyze",
+            json={"pairs": [[review_text, aspect] for review_text, aspect in pairs], "batch_size": batch_size},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["results"]
+
+    def analyze_multiple_aspects(
+        self,
+        review_text: str,
+        aspects: List[str]
+    ) -> Dict[str, Dict[str, any]]:
+        """Analyze sentiment for multiple aspects in a single review."""
+        batch_results = self.analyze_batch([(review_text, aspect) for aspect in aspects])
+        return dict(zip(aspects, batch_results))
+
+    def analyze_all_aspects(
+        self,
+        review_texts: List[str],
+        batch_size: int = 32
+    ) -> List[Dict[str, Dict[str, any]]]:
+        """Analyze sentiment for every parent aspect in ASPECT_MAPPING, for many reviews."""
+        aspects = list(self.ASPECT_MAPPING.values())
+        pairs = [(review_text, aspect) for review_text in review_texts for aspect in aspects]
+        results = self.analyze_batch(pairs, batch_size=batch_size)
+        return [
+            dict(zip(aspects, results[start:start + len(aspects)]))
+            for start in range(0, len(results), len(aspects))
+        ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Keep the sentiment model loaded and serve it to CLI runs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--model-path", default="Anudeep-Narala/fabsa-roberta-sentiment")
+    parser.add_argument("--backend", default="torch", help="torch, torch-int8 or onnx")
+    parser.add_argument("--token-store", help="Directory persisting review token IDs across requests and restarts")
+    parser.add_argument("--memo-cache", help="SQLite file of sentiment results reused across requests and restarts")
+    args = parser.parse_args()
+
+    analyzer = SentimentAnalyzer(
+        args.model_path,
+        backend=args.backend,
+        token_store_dir=args.token_store,
+        memo_cache=SentimentCache(args.memo_cache) if args.memo_cache else None
+    )
+    server = ModelServer(analyzer, args.port, args.host).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
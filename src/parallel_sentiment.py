@@ -0,0 +1,159 @@
+"""
+Multi-process sentiment inference for CPU-only machines.
+Shards (review, aspect) pairs across worker processes that each hold one model copy.
+"""
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from src.sentiment_analyzer import SentimentAnalyzer
+
+
+# Model instance owned by each worker process, loaded once by the initializer
+_worker_analyzer = None
+
+
+def _init_worker(model_path: str, num_threads: int, backend: str):
+    """Load the model once per worker and pin its intra-op thread count."""
+    global _worker_analyzer
+    import torch
+    torch.set_num_threads(num_threads)
+    _worker_analyzer = SentimentAnalyzer(model_path, backend=backend).load()
+
+
+def _analyze_shard(pairs: List[Tuple[str, str]], batch_size: int) -> Tuple[int, List[Dict], float]:
+    """Run one shard in a worker; returns (worker pid, results, seconds spent)."""
+    start_time = time.time()
+    results = _worker_analyzer.analyze_batch(pairs, batch_size=batch_size)
+    return os.getpid(), results, time.time() - start_time
+
+
+class ShardedSentimentAnalyzer:
+    """Drop-in SentimentAnalyzer replacement that spreads inference over a process pool."""
+
+    ASPECT_MAPPING = SentimentAnalyzer.ASPECT_MAPPING
+    SENTIMENT_LABELS = SentimentAnalyzer.SENTIMENT_LABELS
+
+    def __init__(
+        self,
+        model_path: str = "Anudeep-Narala/fabsa-roberta-sentiment",
+        num_workers: int = None,
+        threads_per_worker: int = None,
+        backend: str = "torch"
+    ):
+        """
+        Start the worker pool.
+
+        Args:
+            model_path: Model loaded by every worker
+            num_workers: Number of worker processes (defaults to one per core)
+            threads_per_worker: torch intra-op threads per worker (defaults to cores / workers)
+            backend: Inference backend loaded by every worker (see SentimentAnalyzer)
+        """
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.worker_stats: Dict[int, Dict[str, float]] = {}
+
+        # Spawn rather than fork: forked children inherit torch's thread pool state
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, self.threads_per_worker, backend)
+        )
+        print(f"Started {self.num_workers} sentiment workers ({self.threads_per_worker} threads each)")
+
+    def analyze_sentiment(self, review_text: str, aspect: str) -> Dict[str, any]:
+        """Analyze sentiment for a specific aspect in the review."""
+        return self.analyze_batch([(review_text, aspect)])[0]
+
+    def analyze_batch(
+        self,
+        pairs: List[Tuple[str, str]],
+        batch_size: int = 32
+    ) -> List[Dict[str, any]]:
+        """
+        Analyze sentiment for many (review, aspect) pairs across the worker pool.
+
+        Pairs are ordered by length before sharding so each worker receives
+        similarly sized inputs, and results are merged back by input position,
+        so the output does not depend on which worker finishes first.
+
+        Args:
+            pairs: List of (review_text, parent_aspect) tuples
+            batch_size: Maximum number of pairs per forward pass inside a worker
+
+        Returns:
+            List of dicts with sentiment label and confidence score, one per pair
+        """
+        if not pairs:
+            return []
+
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        shard_size = math.ceil(len(pairs) / self.num_workers)
+        shards = [order[start:start + shard_size] for start in range(0, len(order), shard_size)]
+
+        futures = [
+            self._executor.submit(_analyze_shard, [pairs[i] for i in shard], batch_size)
+            for shard in shards
+        ]
+
+        results = [None] * len(pairs)
+        for shard, future in zip(shards, futures):
+            pid, shard_results, seconds = future.result()
+            stats = self.worker_stats.setdefault(pid, {"pairs": 0, "seconds": 0.0})
+            stats["pairs"] += len(shard)
+            stats["seconds"] += seconds
+            for i, result in zip(shard, shard_results):
+                results[i] = result
+
+        return results
+
+    def analyze_multiple_aspects(
+        self,
+        review_text: str,
+        aspects: List[str]
+    ) -> Dict[str, Dict[str, any]]:
+        """Analyze sentiment for multiple aspects in a single review."""
+        batch_results = self.analyze_batch([(review_text, aspect) for aspect in aspects])
+        return dict(zip(aspects, batch_results))
+
+    def analyze_all_aspects(
+        self,
+        review_texts: List[str],
+        batch_size: int = 32
+    ) -> List[Dict[str, Dict[str, any]]]:
+        """Analyze sentiment for every parent aspect in ASPECT_MAPPING, for many reviews."""
+        aspects = list(self.ASPECT_MAPPING.values())
+        pairs = [(review_text, aspect) for review_text in review_texts for aspect in aspects]
+        results = self.analyze_batch(pairs, batch_size=batch_size)
+        return [
+            dict(zip(aspects, results[start:start + len(aspects)]))
+            for start in range(0, len(results), len(aspects))
+        ]
+
+    def throughput(self) -> Dict[int, Dict[str, float]]:
+        """Per-worker pairs processed, busy seconds and pairs per second."""
+        return {
+            pid: {
+                "pairs": stats["pairs"],
+                "seconds": round(stats["seconds"], 3),
+                "pairs_per_sec": round(stats["pairs"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+            }
+            for pid, stats in sorted(self.worker_stats.items())
+        }
+
+    def print_throughput(self):
+        """Print the per-worker throughput table."""
+        print("| Worker PID | Pairs | Busy (s) | Pairs/s |")
+        print("|------------|-------|----------|---------|")
+        for pid, stats in self.throughput().items():
+            print(f"| {pid:10} | {stats['pairs']:5,} | {stats['seconds']:8.2f} | {stats['pairs_per_sec']:7.2f} |")
+
+    def close(self):
+        """Shut down the worker processes."""
+        self._executor.shutdown(wait=True)
@@ -3,24 +3,73 @@ Complete aspect-based sentiment analysis pipeline.
 Combines aspect extraction (LLM) and sentiment analysis (RoBERTa).
 """
 
+import itertools
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from src.aspect_extraction import AspectExtractor
+from src.dedup import ReviewDeduplicator
+from src.ingest import review_id as resolve_review_id
+from src.metrics import REGISTRY
+from src.parallel_sentiment import ShardedSentimentAnalyzer
+from src.result_store import JsonlResultStore
 from src.sentiment_analyzer import SentimentAnalyzer
 import time
 
 
+class DuplicatePlan(NamedTuple):
+    """Duplicate grouping of one group of reviews (see ABSAPipeline.plan_duplicates)."""
+    keys: Optional[List[str]]
+    review_count: int
+    results: Dict[str, Dict]
+    to_infer: Dict[object, str]
+
+    @property
+    def texts_to_infer(self) -> List[str]:
+        return list(self.to_infer.values())
+
+
 class ABSAPipeline:
     """Complete pipeline for aspect-based sentiment analysis."""
 
     def __init__(
         self,
         aspect_extractor: AspectExtractor = None,
-        sentiment_analyzer: SentimentAnalyzer = None
+        sentiment_analyzer: SentimentAnalyzer = None,
+        sentiment_batch_size: int = 32,
+        sentiment_workers: int = 0,
+        deduplicator: Optional[ReviewDeduplicator] = None
     ):
-        """Initialize pipeline with aspect extractor and sentiment analyzer."""
+        """
+        Initialize pipeline with aspect extractor and sentiment analyzer.
+
+        Args:
+            aspect_extractor: Extractor used for subcategory detection
+            sentiment_analyzer: Analyzer used for parent aspect sentiment
+            sentiment_batch_size: Maximum (review, aspect) pairs per sentiment forward pass
+            sentiment_workers: If > 1 and no analyzer is given, shard sentiment
+                inference across this many worker processes
+            deduplicator: Optional duplicate grouping; only one review per group is inferred
+        """
         self.aspect_extractor = aspect_extractor or AspectExtractor()
-        self.sentiment_analyzer = sentiment_analyzer or SentimentAnalyzer()
+        if sentiment_analyzer is None:
+            if sentiment_workers > 1:
+                sentiment_analyzer = ShardedSentimentAnalyzer(num_workers=sentiment_workers)
+            else:
+                sentiment_analyzer = SentimentAnalyzer()
+        self.sentiment_analyzer = sentiment_analyzer
+        self.sentiment_batch_size = sentiment_batch_size
+        self.deduplicator = deduplicator
+
+    def _group_by_parent(self, subcategories: List[str]) -> Dict[str, List[str]]:
+        """Group extracted subcategories under their parent aspects."""
+        parent_aspects = {}
+        for subcat in subcategories:
+            parent = self.aspect_extractor.get_parent_aspect(subcat)
+            if parent not in parent_aspects:
+                parent_aspects[parent] = []
+            parent_aspects[parent].append(subcat)
+
+        return parent_aspects
 
     def process_review(self, review_text: str) -> Dict:
         """
@@ -32,34 +81,334 @@ class ABSAPipeline:
         Returns:
             Dict with subcategories and their sentiments
         """
-        # Step 1: Extract subcategories using LLM
-        subcategories = self.aspect_extractor.extract_aspects(review_text)
+        return self.process_reviews([review_text])[0]
 
-        # Step 2: Get parent aspects for sentiment analysis
-        parent_aspects = {}
-        for subcat in subcategories:
-            parent = self.aspect_extractor.get_parent_aspect(subcat)
-            if parent not in parent_aspects:
-                parent_aspects[parent] = []
-            parent_aspects[parent].append(subcat)
+    def process_reviews(self, review_texts: List[str]) -> List[Dict]:
+        """
+        Process several reviews through the pipeline, batching sentiment inference.
+
+        All parent aspects of all reviews are scored together, so a group of
+        reviews costs a handful of forward passes instead of one per aspect.
+        With a deduplicator, duplicates reuse their group representative's result.
+
+        Args:
+            review_texts: The review texts to analyze
+
+        Returns:
+            List of dicts with subcategories and their sentiments, one per review
+        """
+        if self.deduplicator is None:
+            return self._analyze_reviews(review_texts)
+
+        plan = self.plan_duplicates(review_texts)
+        start_time = time.time()
+        analyses = self._analyze_reviews(plan.texts_to_infer)
+        return self.finish_duplicates(plan, analyses, time.time() - start_time)
+
+    def plan_duplicates(self, review_texts: List[str]) -> "DuplicatePlan":
+        """
+        Collapse a group of reviews to the ones that still need inference.
 
-        # Step 3: Analyze sentiment for each parent aspect
+        Without a deduplicator every review is inferred.
+
+        Args:
+            review_texts: The review texts to analyze
+
+        Returns:
+            Plan listing the representatives to infer, used by `finish_duplicates`
+        """
+        if self.deduplicator is None:
+            return DuplicatePlan(None, len(review_texts), {}, dict(enumerate(review_texts)))
+
+        keys = self.deduplicator.assign(review_texts)
         results = {}
-        for parent_aspect, subcats in parent_aspects.items():
-            sentiment_result = self.sentiment_analyzer.analyze_sentiment(
-                review_text,
-                parent_aspect
-            )
-
-            # Assign same sentiment to all subcategories under this parent
-            for subcat in subcats:
-                results[subcat] = {
-                    "sentiment": sentiment_result["sentiment"],
-                    "confidence": sentiment_result["confidence"],
-                    "parent_aspect": parent_aspect
-                }
-
-        return results
+        to_infer = {}
+        for key, review_text in zip(keys, review_texts):
+            if key in results or key in to_infer:
+                continue
+            cached = self.deduplicator.get_result(key)
+            if cached is not None:
+                results[key] = cached
+            else:
+                to_infer[key] = review_text
+        return DuplicatePlan(keys, len(review_texts), results, to_infer)
+
+    def finish_duplicates(self, plan: "DuplicatePlan", analyses: List[Dict], seconds: float) -> List[Dict]:
+        """
+        Fan the representatives' analyses out to every review of a plan.
+
+        Args:
+            plan: Plan from `plan_duplicates`
+            analyses: One analysis per `plan.texts_to_infer`
+            seconds: Time spent inferring them
+
+        Returns:
+            List of dicts with subcategories and their sentiments, one per review
+        """
+        if plan.keys is None:
+            return analyses
+
+        self.deduplicator.record(plan.review_count, len(plan.to_infer), seconds)
+        results = dict(plan.results)
+        for key, analysis in zip(plan.to_infer, analyses):
+            self.deduplicator.store_result(key, analysis)
+            results[key] = analysis
+
+        # Fan out copies so callers can modify one review's result safely
+        return [
+            {subcat: dict(data) for subcat, data in results[key].items()}
+            for key in plan.keys
+        ]
+
+    def _analyze_reviews(self, review_texts: List[str]) -> List[Dict]:
+        """Run extraction and batched sentiment inference for the given reviews."""
+        if not review_texts:
+            return []
+
+        # Step 1: Extract subcategories using LLM (concurrent requests)
+        all_subcategories, sources = self.aspect_extractor.extract_with_sources(review_texts)
+        return self.score_sentiment(review_texts, all_subcategories, sources)
+
+    def score_sentiment(
+        self,
+        review_texts: List[str],
+        all_subcategories: List[List[str]],
+        sources: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Classify sentiment for reviews whose subcategories are already extracted.
+
+        Args:
+            review_texts: The review texts
+            all_subcategories: Extracted subcategories, one list per review
+            sources: Optional extraction source of each review (see
+                AspectExtractor.extract_with_sources), kept as `extraction_source`
+
+        Returns:
+            List of dicts with subcategories and their sentiments, one per review
+        """
+        if not review_texts:
+            return []
+
+        # Step 2: Get parent aspects for sentiment analysis
+        grouped = [self._group_by_parent(subcats) for subcats in all_subcategories]
+
+        # Step 3: Analyze sentiment for every (review, parent aspect) pair at once
+        pairs = [
+            (review_text, parent_aspect)
+            for review_text, parent_aspects in zip(review_texts, grouped)
+            for parent_aspect in parent_aspects
+        ]
+        sentiment_results = iter(self.sentiment_analyzer.analyze_batch(
+            pairs,
+            batch_size=self.sentiment_batch_size
+        ))
+
+        all_results = []
+        for i, parent_aspects in enumerate(grouped):
+            results = {}
+            for parent_aspect, subcats in parent_aspects.items():
+                sentiment_result = next(sentiment_results)
+
+                # Assign same sentiment to all subcategories under this parent
+                for subcat in subcats:
+                    results[subcat] = {
+                        "sentiment": sentiment_result["sentiment"],
+                        "confidence": sentiment_result["confidence"],
+                        "parent_aspect": parent_aspect
+                    }
+                    if sources is not None:
+                        results[subcat]["extraction_source"] = sources[i]
+            all_results.append(results)
+
+        return all_results
+
+    def score_all_aspects(self, review_texts: List[str]) -> List[Dict[str, Dict]]:
+        """
+        Classify sentiment for all six parent aspects of each review, without LLM extraction.
+
+        Every (review, aspect) pair goes through the same batched forward passes,
+        so scoring all aspects costs little more than scoring the ones a review
+        mentions. Per-aspect results match `score_sentiment` exactly.
+
+        Args:
+            review_texts: The review texts
+
+        Returns:
+            One dict per review mapping parent aspect -> {"sentiment", "confidence"}
+        """
+        return self.sentiment_analyzer.analyze_all_aspects(review_texts, batch_size=self.sentiment_batch_size)
+
+    @staticmethod
+    def format_rows(review_id, record: Dict, review_column: str, analysis: Dict) -> List[Dict]:
+        """Result rows of one review; source fields are collected once per review, not per row."""
+        review_text = record[review_column]
+        metadata = {k: v for k, v in record.items() if k != review_column}
+        return [
+            {
+                "review_id": review_id,
+                "review_text": review_text,
+                "subcategory": subcategory,
+                "parent_aspect": data["parent_aspect"],
+                "sentiment": data["sentiment"],
+                "confidence": data["confidence"],
+                **({"extraction_source": data["extraction_source"]} if "extraction_source" in data else {}),
+                **metadata
+            }
+            for subcategory, data in analysis.items()
+        ]
+
+    @staticmethod
+    def _iter_records(reviews, chunk_size: int = 1000) -> Iterator[Dict]:
+        """
+        Yield review dicts from a DataFrame or an iterable of dicts.
+
+        DataFrames are converted slice by slice rather than with `iterrows`.
+        """
+        if isinstance(reviews, pd.DataFrame):
+            for start in range(0, len(reviews), chunk_size):
+                yield from reviews.iloc[start:start + chunk_size].to_dict("records")
+        else:
+            yield from reviews
+
+    def _iter_analyzed(
+        self,
+        reviews,
+        review_column: str,
+        reviews_per_batch: int,
+        skip_review=None,
+        total: Optional[int] = None
+    ) -> Iterator[Tuple[object, List[Dict]]]:
+        """
+        Analyze reviews in groups, yielding (review_id, result_rows) per review.
+
+        Args:
+            reviews: DataFrame or iterable of review dicts
+            review_column: Name of the field containing review text
+            reviews_per_batch: Number of reviews whose sentiment pairs share forward passes
+            skip_review: Optional predicate on review_id; matching reviews are not processed
+            total: Number of reviews, if known, for progress reporting
+        """
+        if total is None and isinstance(reviews, pd.DataFrame):
+            total = len(reviews)
+        records = self._iter_records(reviews)
+        processed = 0
+        skipped = 0
+        analyzed = 0
+        analysis_seconds = 0.0
+
+        while True:
+            batch = []
+            seen = 0
+            for record in itertools.islice(records, reviews_per_batch):
+                seen += 1
+                # Reviews without an ID get a content hash, stable across runs for resuming
+                review_id = resolve_review_id(record)
+                if skip_review is not None and skip_review(review_id):
+                    skipped += 1
+                    continue
+                batch.append((review_id, record))
+
+            if not seen:
+                break
+
+            previous = processed
+            processed += seen
+            if not batch:
+                continue
+
+            # Process reviews
+            start_time = time.time()
+            with REGISTRY.timer("review_batch_seconds"):
+                analyses = self.process_reviews([record[review_column] for _, record in batch])
+            elapsed = time.time() - start_time
+            analyzed += len(batch)
+            analysis_seconds += elapsed
+            REGISTRY.inc("reviews_processed_total", len(batch))
+
+            # Format results
+            for (review_id, record), analysis in zip(batch, analyses):
+                yield review_id, self.format_rows(review_id, record, review_column, analysis)
+
+            if processed // 10 > previous // 10 or processed == total:
+                of_total = f"/{total}" if total is not None else ""
+                resumed = f", {skipped} already done" if skipped else ""
+                print(
+                    f"Processed {processed}{of_total} reviews{resumed} "
+                    f"(avg {analysis_seconds / analyzed:.2f}s per review, last batch {elapsed / len(batch):.2f}s per review)"
+                )
+
+    def process_stream(
+        self,
+        reviews: Iterable[Dict],
+        review_column: str = "review",
+        reviews_per_batch: int = 16
+    ) -> Iterator[Dict]:
+        """
+        Lazily analyze a stream of reviews, yielding one result row per subcategory.
+
+        Only `reviews_per_batch` reviews are held in memory at a time, so this
+        works on inputs of any size (e.g. `src.ingest.iter_reviews`).
+
+        Args:
+            reviews: Iterable of review dicts (or a DataFrame)
+            review_column: Name of the field containing review text
+            reviews_per_batch: Number of reviews whose sentiment pairs share forward passes
+
+        Yields:
+            Result rows with review_id, subcategory, sentiment and source fields
+        """
+        for _, rows in self._iter_analyzed(reviews, review_column, reviews_per_batch):
+            yield from rows
+
+    def process_to_store(
+        self,
+        reviews,
+        store: JsonlResultStore,
+        review_column: str = "review",
+        batch_size: int = 100,
+        reviews_per_batch: int = 16
+    ) -> int:
+        """
+        Stream results into an append-only store, resuming past work.
+
+        Reviews whose IDs the store already marks as processed are skipped, and
+        results are flushed every `batch_size` reviews, so memory stays flat and
+        a crashed run loses at most one batch.
+
+        Args:
+            reviews: DataFrame or iterable of review dicts
+            store: Result store to append to (JsonlResultStore, or
+                src.columnar_output.PartitionedResultStore for incremental runs)
+            review_column: Name of the field containing review text
+            batch_size: Number of reviews between durable flushes
+            reviews_per_batch: Number of reviews whose sentiment pairs share forward passes
+
+        Returns:
+            Number of reviews processed in this call
+        """
+        if store.processed_ids:
+            print(f"Resuming from {store.path}: {len(store.processed_ids)} reviews already processed")
+
+        pending = []
+        processed = 0
+        analyzed = self._iter_analyzed(reviews, review_column, reviews_per_batch, store.is_processed)
+        for review_id, rows in analyzed:
+            pending.append((review_id, rows))
+            if len(pending) >= batch_size:
+                store.append_batch(pending)
+                processed += len(pending)
+                pending = []
+                print(f"Checkpoint saved ({len(store.processed_ids)} reviews in {store.path})")
+
+        store.append_batch(pending)
+        processed += len(pending)
+        # PartitionedResultStore stages rows until they are compacted into their partitions
+        compact = getattr(store, "compact", None)
+        if compact is not None:
+            compact()
+
+        return processed
 
     def process_dataframe(
         self,
@@ -67,56 +416,32 @@ class ABSAPipeline:
         review_column: str = "review",
         batch_size: int = 100,
         save_checkpoints: bool = True,
-        checkpoint_path: str = "/workspace/output/checkpoint.csv"
+        checkpoint_path: str = "/workspace/output/checkpoint.jsonl",
+        reviews_per_batch: int = 16
     ) -> pd.DataFrame:
         """
         Process multiple reviews from a DataFrame.
 
+        With checkpoints enabled, results are appended to a single JSONL file
+        and a rerun with the same checkpoint path resumes where it stopped.
+
         Args:
             df: DataFrame with reviews
             review_column: Name of the column containing review text
             batch_size: Number of reviews to process before saving checkpoint
             save_checkpoints: Whether to save progress checkpoints
-            checkpoint_path: Path to save checkpoints
+            checkpoint_path: Path of the append-only checkpoint file
+            reviews_per_batch: Number of reviews whose sentiment pairs share forward passes
 
         Returns:
             DataFrame with analysis results
         """
-        results = []
-
-        for idx, row in df.iterrows():
-            start_time = time.time()
-
-            review_text = row[review_column]
-            review_id = row.get('id', idx)
-
-            # Process review
-            analysis = self.process_review(review_text)
-
-            # Format results
-            for subcategory, data in analysis.items():
-                results.append({
-                    "review_id": review_id,
-                    "review_text": review_text,
-                    "subcategory": subcategory,
-                    "parent_aspect": data["parent_aspect"],
-                    "sentiment": data["sentiment"],
-                    "confidence": data["confidence"],
-                    **{k: v for k, v in row.items() if k != review_column}
-                })
-
-            elapsed = time.time() - start_time
-
-            if (idx + 1) % 10 == 0:
-                print(f"Processed {idx + 1}/{len(df)} reviews ({elapsed:.2f}s per review)")
-
-            # Save checkpoint
-            if save_checkpoints and (idx + 1) % batch_size == 0:
-                checkpoint_df = pd.DataFrame(results)
-                checkpoint_df.to_csv(checkpoint_path.replace(".csv", f"_{idx+1}.csv"), index=False)
-                print(f"Checkpoint saved at {idx + 1} reviews")
+        if save_checkpoints:
+            store = JsonlResultStore(checkpoint_path)
+            self.process_to_store(df, store, review_column, batch_size, reviews_per_batch)
+            return store.read_dataframe()
 
-        return pd.DataFrame(results)
+        return pd.DataFrame(list(self.process_stream(df, review_column, reviews_per_batch)))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+"""
+Lexical pre-filter for aspect extraction.
+Routes short, vague reviews straight to overall_satisfaction so they skip the LLM.
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+
+class LexicalPrefilter:
+    """Keyword matcher plus length heuristic that decides which reviews need the LLM."""
+
+    def __init__(
+        self,
+        subcategory_definitions: Dict[str, Dict[str, str]],
+        max_words: int = 6,
+        default_subcategory: str = "overall_satisfaction",
+        verbose: bool = False
+    ):
+        """
+        Compile the keyword matcher.
+
+        Args:
+            subcategory_definitions: Mapping of subcategory to info with a comma-separated `keywords` field
+            max_words: Reviews longer than this always go to the LLM
+            default_subcategory: Subcategory assigned to reviews routed directly
+            verbose: Print every routing decision
+        """
+        self.max_words = max_words
+        self.default_subcategory = default_subcategory
+        self.verbose = verbose
+
+        # Keyword -> subcategories it signals (a keyword may belong to several)
+        self.keyword_subcategories: Dict[str, Set[str]] = {}
+        for subcat, info in subcategory_definitions.items():
+            for keyword in info.get("keywords", "").split(","):
+                keyword = keyword.strip().lower()
+                if keyword:
+                    self.keyword_subcategories.setdefault(keyword, set()).add(subcat)
+
+        # One alternation, longest keywords first; no trailing word boundary, so
+        # "delivery fee" also matches "delivery fees" (extra matches only send more to the LLM)
+        alternatives = sorted(self.keyword_subcategories, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"\b(" + "|".join(re.escape(keyword).replace(r"\ ", r"\s+") for keyword in alternatives) + r")",
+            re.IGNORECASE
+        )
+
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def matched_subcategories(self, review_text: str) -> Set[str]:
+        """Subcategories whose keywords appear in the review."""
+        matched = set()
+        for match in self.pattern.finditer(review_text):
+            keyword = " ".join(match.group(1).lower().split())
+            matched.update(self.keyword_subcategories.get(keyword, ()))
+        return matched
+
+    def route(self, review_text: str) -> Optional[List[str]]:
+        """
+        Decide whether a review can be classified without the LLM.
+
+        Args:
+            review_text: The review text
+
+        Returns:
+            Subcategory list for a directly routed review, or None if the LLM is needed
+        """
+        text = review_text if isinstance(review_text, str) else ""
+        word_count = len(text.split())
+
+        if word_count == 0:
+            decision, reason = [self.default_subcategory], "empty"
+        elif word_count > self.max_words:
+            decision, reason = None, "long"
+        else:
+            specific = self.matched_subcategories(text) - {self.default_subcategory}
+            if specific:
+                decision, reason = None, "specific_keywords"
+            else:
+                decision, reason = [self.default_subcategory], "short_vague"
+
+        with self._lock:
+            self.counts["direct" if decision else "llm"] += 1
+            self.counts[f"reason_{reason}"] += 1
+
+        if self.verbose:
+            target = decision[0] if decision else "LLM"
+            print(f"[prefilter] {reason:17} -> {target}: {text[:80]!r}")
+
+        return decision
+
+    def stats(self) -> Dict[str, int]:
+        """Routing counters, including how many LLM calls were avoided."""
+        with self._lock:
+            counts = dict(self.counts)
+        counts.setdefault("direct", 0)
+        counts.setdefault("llm", 0)
+        counts["llm_calls_avoided"] = counts["direct"]
+        return counts
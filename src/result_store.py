@@ -0,0 +1,165 @@
+"""
+Append-only result storage for long pipeline runs.
+Writes result rows incrementally and records durable progress so runs can resume.
+"""
+
+import json
+import os
+import pandas as pd
+from typing import Dict, Iterator, List, Set, Tuple
+from src.metrics import REGISTRY
+
+
+def _json_default(value):
+    """Serialize numpy scalars and timestamps found in DataFrame rows."""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def read_committed_offset(path: str) -> int:
+    """
+    Byte offset up to which a results file holds only finished reviews.
+
+    Reads the progress marker without modifying it, so it is safe to call
+    while another process is still appending to the store.
+    """
+    committed_offset = 0
+    progress_path = f"{path}.progress"
+    if os.path.exists(progress_path):
+        with open(progress_path, "rb") as f:
+            for line in f:
+                try:
+                    committed_offset = json.loads(line)["offset"]
+                except json.JSONDecodeError:
+                    break
+    return committed_offset
+
+
+class JsonlResultStore:
+    """Append-only JSONL file of result rows plus a progress marker of finished reviews."""
+
+    def __init__(self, path: str):
+        """
+        Open a store, recovering its state from a previous run if present.
+
+        Args:
+            path: Results file; the progress marker is written next to it as `<path>.progress`
+        """
+        self.path = path
+        self.progress_path = f"{path}.progress"
+        self.processed_ids: Set[str] = set()
+        self._recover()
+
+    def _recover(self):
+        """Load finished review IDs and drop result rows written after the last durable marker."""
+        committed_offset = 0
+        if os.path.exists(self.progress_path):
+            valid_bytes = 0
+            with open(self.progress_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written marker from an interrupted run
+                        break
+                    self.processed_ids.add(entry["review_id"])
+                    committed_offset = entry["offset"]
+                    valid_bytes += len(line)
+            with open(self.progress_path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+        # Rows past the last marker belong to a batch that never completed
+        if os.path.exists(self.path) and os.path.getsize(self.path) > committed_offset:
+            with open(self.path, "r+b") as f:
+                f.truncate(committed_offset)
+
+    def is_processed(self, review_id) -> bool:
+        """Whether all result rows for a review were durably written."""
+        return str(review_id) in self.processed_ids
+
+    def append_batch(self, batch: List[Tuple[object, List[Dict]]]):
+        """
+        Durably append the result rows of several reviews.
+
+        Rows are written and fsynced before their review IDs are added to the
+        progress marker, so a crash never leaves a review marked as done with
+        missing rows.
+
+        Args:
+            batch: List of (review_id, result_rows) tuples
+        """
+        if not batch:
+            return
+
+        with REGISTRY.timer("checkpoint_write_seconds", store="jsonl"):
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Tuple[object, List[Dict]]]):
+        """Write and fsync rows, then their progress markers."""
+        markers = []
+        with open(self.path, "a", encoding="utf-8") as f:
+            for review_id, rows in batch:
+                for row in rows:
+                    f.write(json.dumps(row, default=_json_default) + "\n")
+                f.flush()
+                markers.append({"review_id": str(review_id), "offset": f.tell()})
+            os.fsync(f.fileno())
+
+        with open(self.progress_path, "a", encoding="utf-8") as f:
+            for marker in markers:
+                f.write(json.dumps(marker) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.processed_ids.update(marker["review_id"] for marker in markers)
+
+    def iter_rows(self) -> Iterator[Dict]:
+        """Yield stored result rows one at a time."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def iter_chunks(self, chunk_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """Yield stored result rows as DataFrames of at most `chunk_size` rows."""
+        chunk = []
+        for row in self.iter_rows():
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk)
+
+    def read_dataframe(self) -> pd.DataFrame:
+        """Load every stored result row into a DataFrame."""
+        return pd.DataFrame(list(self.iter_rows()))
+
+    def export_csv(self, csv_path: str, chunk_size: int = 10000, append: bool = False) -> int:
+        """
+        Write stored rows to CSV chunk by chunk.
+
+        Args:
+            csv_path: Destination CSV file
+            chunk_size: Rows held in memory at once
+            append: Append to an existing CSV (without header) instead of overwriting
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        columns = None
+        write_header = not (append and os.path.exists(csv_path))
+        mode = "a" if append else "w"
+
+        for chunk in self.iter_chunks(chunk_size):
+            if columns is None:
+                columns = list(chunk.columns)
+            chunk = chunk.reindex(columns=columns)
+            chunk.to_csv(csv_path, mode=mode, header=write_header, index=False)
+            mode, write_header = "a", False
+            written += len(chunk)
+
+        return written
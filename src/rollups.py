@@ -0,0 +1,339 @@
+"""
+Pre-aggregated rollups for the HTML dashboards.
+Folds result stores into compact day x platform x subcategory x sentiment cubes, incrementally.
+"""
+
+import hashlib
+import json
+import os
+import random
+from datetime import datetime
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from src.columnar_output import iter_wide_chunks
+from src.ingest import review_day
+from src.result_store import read_committed_offset
+
+
+ROLLUP_VERSION = 2
+SENTIMENTS = ['negative', 'neutral', 'positive']
+
+
+def _rating(value) -> Optional[float]:
+    """Numeric rating, or None for missing values."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return value
+
+
+def store_identity(path: str) -> str:
+    """
+    Identity of a result store file: its inode plus a hash of its first line.
+
+    Appending keeps it; deleting and rewriting the store changes it, even if
+    the new file has already grown past an earlier offset.
+    """
+    with open(path, "rb") as f:
+        first_line = f.readline()
+        return f"{os.fstat(f.fileno()).st_ino}:{hashlib.sha1(first_line).hexdigest()}"
+
+
+class DashboardRollup:
+    """Running dashboard aggregates plus the result-store offsets already folded into them."""
+
+    def __init__(self, state_path: Optional[str] = None, examples_per_cell: int = 3, max_example_chars: int = 280, seed: int = 0):
+        """
+        Load previous rollup state if present.
+
+        Args:
+            state_path: JSON file holding aggregates and per-store offsets between runs
+                (None for a one-off rollup that is exported but not saved)
+            examples_per_cell: Example reviews kept per (platform, subcategory, sentiment)
+            max_example_chars: Example review texts are cut to this length
+            seed: Seed for reservoir sampling of examples
+        """
+        self.state_path = state_path
+        self.examples_per_cell = examples_per_cell
+        self.max_example_chars = max_example_chars
+        self._rng = random.Random(seed)
+        self.reset()
+
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") == ROLLUP_VERSION:
+                for name in ("offsets", "identities", "parent_aspects", "aspects", "reviews", "pairs", "examples"):
+                    setattr(self, name, state[name])
+
+    def reset(self):
+        """Drop all aggregates and offsets."""
+        self.offsets: Dict[str, int] = {}
+        # Store path -> store_identity() when its offset was recorded
+        self.identities: Dict[str, str] = {}
+        # Append-only, so a parent's bit in the review masks never moves
+        self.parent_aspects: List[str] = []
+        # "day|platform|subcategory|parent|sentiment" -> [rows, rating_sum, rated_rows]
+        self.aspects: Dict[str, List[float]] = {}
+        # "day|platform|parent mask" -> [reviews, rating_sum, rated_reviews]
+        self.reviews: Dict[str, List[float]] = {}
+        # "day|platform|subcategory|subcategory" -> reviews mentioning both (diagonal: reviews mentioning one)
+        self.pairs: Dict[str, int] = {}
+        # "platform|subcategory|sentiment" -> {"seen": n, "items": [...]}
+        self.examples: Dict[str, Dict] = {}
+
+    def _parent_bit(self, parent: str) -> int:
+        if parent not in self.parent_aspects:
+            self.parent_aspects.append(parent)
+        return 1 << self.parent_aspects.index(parent)
+
+    @staticmethod
+    def _iter_reviews(path: str, start: int, end: int) -> Iterator[List[Dict]]:
+        """Yield the rows of each review stored between two byte offsets (a review's rows are contiguous)."""
+        with open(path, "rb") as f:
+            f.seek(start)
+            review_rows = []
+            while f.tell() < end:
+                row = json.loads(f.readline())
+                if review_rows and row["review_id"] != review_rows[0]["review_id"]:
+                    yield review_rows
+                    review_rows = []
+                review_rows.append(row)
+            if review_rows:
+                yield review_rows
+
+    def _add_review(self, rows: List[Dict]):
+        """Fold one review's result rows into every aggregate."""
+        first = rows[0]
+        day = review_day(first.get("date"))
+        platform = str(first.get("platform", ""))
+        rating = _rating(first.get("rating"))
+        rating_sum, rated = (rating, 1) if rating is not None else (0, 0)
+
+        mask = 0
+        subcategories = set()
+        for row in rows:
+            mask |= self._parent_bit(row["parent_aspect"])
+            subcategories.add(row["subcategory"])
+
+            key = f"{day}|{platform}|{row['subcategory']}|{row['parent_aspect']}|{row['sentiment']}"
+            cell = self.aspects.setdefault(key, [0, 0, 0])
+            cell[0] += 1
+            cell[1] += rating_sum
+            cell[2] += rated
+
+            self._sample_example(f"{platform}|{row['subcategory']}|{row['sentiment']}", first, rating)
+
+        cell = self.reviews.setdefault(f"{day}|{platform}|{mask}", [0, 0, 0])
+        cell[0] += 1
+        cell[1] += rating_sum
+        cell[2] += rated
+
+        ordered = sorted(subcategories)
+        for i, first_subcategory in enumerate(ordered):
+            for second_subcategory in ordered[i:]:
+                key = f"{day}|{platform}|{first_subcategory}|{second_subcategory}"
+                self.pairs[key] = self.pairs.get(key, 0) + 1
+
+    def _sample_example(self, key: str, row: Dict, rating: Optional[float]):
+        """Reservoir-sample a review as an example for one cell."""
+        slot = self.examples.setdefault(key, {"seen": 0, "items": []})
+        slot["seen"] += 1
+        if len(slot["items"]) < self.examples_per_cell:
+            index = len(slot["items"])
+            slot["items"].append(None)
+        else:
+            index = self._rng.randrange(slot["seen"])
+            if index >= self.examples_per_cell:
+                return
+        slot["items"][index] = {
+            "review_id": str(row["review_id"]),
+            "review_text": str(row.get("review_text", ""))[:self.max_example_chars],
+            "rating": rating,
+            "date": str(row.get("date", ""))
+        }
+
+    def update(self, store_paths: List[str]) -> int:
+        """
+        Fold reviews appended to result stores since the last update.
+
+        Only bytes covered by a store's progress marker are read, so reviews a
+        running pipeline is still writing are picked up on a later update. If a
+        store shrank or was replaced by a new file (see `store_identity`), the
+        rollup is rebuilt.
+
+        Args:
+            store_paths: JSONL result store files (see src.result_store)
+
+        Returns:
+            Number of reviews added
+        """
+        for path in store_paths:
+            if not os.path.exists(path) or not self.offsets.get(path):
+                continue
+            if os.path.getsize(path) < self.offsets[path] or store_identity(path) != self.identities.get(path):
+                print(f"{path} shrank or was rewritten since the last rollup; rebuilding from scratch")
+                self.reset()
+                break
+
+        added = 0
+        for path in store_paths:
+            if not os.path.exists(path):
+                continue
+            start = self.offsets.get(path, 0)
+            end = read_committed_offset(path)
+            if end <= start:
+                continue
+            for rows in self._iter_reviews(path, start, end):
+                self._add_review(rows)
+                added += 1
+            self.offsets[path] = end
+            self.identities[path] = store_identity(path)
+        return added
+
+    def add_chunks(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Fold wide result-row chunks (e.g. `src.columnar_output.iter_wide_chunks`).
+
+        A review's rows must be contiguous, which holds for every result
+        writer in this package. Used to rebuild the rollup from partitioned
+        output, where edited reviews replace earlier rows instead of appending.
+
+        Returns:
+            Number of reviews added
+        """
+        added = 0
+        review_rows = []
+        for chunk in chunks:
+            for row in chunk.to_dict("records"):
+                if review_rows and row["review_id"] != review_rows[0]["review_id"]:
+                    self._add_review(review_rows)
+                    added += 1
+                    review_rows = []
+                review_rows.append(row)
+        if review_rows:
+            self._add_review(review_rows)
+            added += 1
+        return added
+
+    def save(self):
+        """Atomically write the aggregates and offsets to the state file."""
+        state = {
+            "version": ROLLUP_VERSION,
+            "offsets": self.offsets,
+            "identities": self.identities,
+            "parent_aspects": self.parent_aspects,
+            "aspects": self.aspects,
+            "reviews": self.reviews,
+            "pairs": self.pairs,
+            "examples": self.examples
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        Build the compact rollup the dashboards load.
+
+        Dimension values are stored once in lookup lists and cells refer to them
+        by index. `reviews` cells carry a bitmask over `parent_aspects` so unique
+        review counts stay exact under the parent-aspect filter.
+        """
+        aspect_keys = [key.split("|") for key in self.aspects]
+        review_keys = [key.split("|") for key in self.reviews]
+        pair_keys = [key.split("|") for key in self.pairs]
+        example_keys = [key.split("|") for key in self.examples]
+
+        days = sorted({key[0] for key in aspect_keys + review_keys} - {""})
+        platforms = sorted({key[1] for key in aspect_keys + review_keys})
+        subcategories = sorted({key[2] for key in aspect_keys})
+        sentiments = SENTIMENTS + sorted({key[4] for key in aspect_keys} - set(SENTIMENTS))
+
+        day_index = {day: i for i, day in enumerate(days)}
+        day_index[""] = -1
+        platform_index = {platform: i for i, platform in enumerate(platforms)}
+        subcategory_index = {subcategory: i for i, subcategory in enumerate(subcategories)}
+        parent_index = {parent: i for i, parent in enumerate(self.parent_aspects)}
+        sentiment_index = {sentiment: i for i, sentiment in enumerate(sentiments)}
+
+        return {
+            "version": ROLLUP_VERSION,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "days": days,
+            "platforms": platforms,
+            "subcategories": subcategories,
+            "parent_aspects": self.parent_aspects,
+            "sentiments": sentiments,
+            "aspects": [
+                [day_index[day], platform_index[platform], subcategory_index[subcategory],
+                 parent_index[parent], sentiment_index[sentiment]] + cell
+                for (day, platform, subcategory, parent, sentiment), cell in zip(aspect_keys, self.aspects.values())
+            ],
+            "reviews": [
+                [day_index[day], platform_index[platform], int(mask)] + cell
+                for (day, platform, mask), cell in zip(review_keys, self.reviews.values())
+            ],
+            "pairs": [
+                [day_index[day], platform_index[platform], subcategory_index[first], subcategory_index[second], count]
+                for (day, platform, first, second), count in zip(pair_keys, self.pairs.values())
+            ],
+            "examples": [
+                [platform_index[platform], subcategory_index[subcategory], sentiment_index[sentiment], slot["items"]]
+                for (platform, subcategory, sentiment), slot in zip(example_keys, self.examples.values())
+            ]
+        }
+
+    def export(self, output_path: str) -> int:
+        """
+        Write the compact rollup JSON.
+
+        Returns:
+            Size of the written file in bytes
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp_path, output_path)
+        return os.path.getsize(output_path)
+
+
+def update_rollup(store_paths: List[str], state_path: str, output_path: str) -> Tuple[int, int]:
+    """
+    Fold new results into the rollup state and re-export the dashboard file.
+
+    Returns:
+        (reviews added, rollup file size in bytes)
+    """
+    rollup = DashboardRollup(state_path)
+    added = rollup.update(store_paths)
+    rollup.save()
+    return added, rollup.export(output_path)
+
+
+def rebuild_rollup(results_dir: str, output_path: str) -> Tuple[int, int]:
+    """
+    Build the dashboard file from scratch out of normalized or partitioned Parquet output.
+
+    Returns:
+        (reviews added, rollup file size in bytes)
+    """
+    rollup = DashboardRollup()
+    added = rollup.add_chunks(iter_wide_chunks(results_dir))
+    return added, rollup.export(output_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Update the pre-aggregated dashboard rollup from result stores")
+    parser.add_argument("--stores", default="/workspace/output/*_results.jsonl", help="Glob of JSONL result stores")
+    parser.add_argument("--state", default="/workspace/output/rollup_state.json")
+    parser.add_argument("--out", default="/workspace/output/rollup.json")
+    args = parser.parse_args()
+
+    added, size = update_rollup(sorted(glob.glob(args.stores)), args.state, args.out)
+    print(f"Added {added} reviews; wrote {args.out} ({size / 1024:.1f} KB)")
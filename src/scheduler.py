@@ -0,0 +1,355 @@
+"""
+Overlapping extraction and sentiment stages across several review datasets.
+LLM extraction and RoBERTa classification run as producer/consumer stages joined by bounded queues.
+"""
+
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from src.ingest import review_id as resolve_review_id
+from src.metrics import REGISTRY
+from src.pipeline import ABSAPipeline
+
+
+class PlatformJob(NamedTuple):
+    """One dataset to analyze: its name, review stream and the store receiving its results."""
+    name: str
+    reviews: Iterable[Dict]
+    store: object
+
+
+class StageStats:
+    """Counters for one stage: work done, busy time and the depth of its input queue."""
+
+    def __init__(self, name: str, concurrency: int, input_queue: Optional[queue.Queue] = None):
+        self.name = name
+        self.concurrency = concurrency
+        self.input_queue = input_queue
+        self.batches = 0
+        self.reviews = 0
+        self.busy_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self._lock = threading.Lock()
+
+    def record(self, reviews: int, seconds: float):
+        REGISTRY.observe("scheduler_stage_seconds", seconds, stage=self.name)
+        with self._lock:
+            self.batches += 1
+            self.reviews += reviews
+            self.busy_seconds += seconds
+
+    def sample_depth(self):
+        if self.input_queue is None:
+            return
+        depth = self.input_queue.qsize()
+        with self._lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def snapshot(self, elapsed: float) -> Dict[str, float]:
+        """Throughput and queue depth figures for this stage."""
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "batches": self.batches,
+                "reviews": self.reviews,
+                "busy_seconds": round(self.busy_seconds, 2),
+                "reviews_per_sec": round(self.reviews / elapsed, 2) if elapsed else 0.0,
+                # Share of the stage's worker time spent working rather than waiting
+                "utilization": round(self.busy_seconds / (elapsed * self.concurrency), 3) if elapsed else 0.0,
+                "queue_depth": self.input_queue.qsize() if self.input_queue is not None else 0,
+                "queue_capacity": self.input_queue.maxsize if self.input_queue is not None else 0,
+                "queue_depth_avg": round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+                "queue_depth_max": self.depth_max
+            }
+
+
+class _Stopped(Exception):
+    """Raised inside stage threads once the scheduler is shutting down."""
+
+
+class StagedScheduler:
+    """
+    Runs several datasets through one pipeline with extraction and sentiment overlapped.
+
+    A reader thread takes groups of reviews from every dataset in turn and feeds
+    the extraction stage. Extraction workers call the LLM and hand the
+    subcategories to sentiment workers, which hand result rows to a single
+    writer that appends them to each dataset's store. Bounded queues between the
+    stages keep memory flat and let the slower stage set the pace, so Ollama
+    and the sentiment model are busy at the same time.
+    """
+
+    def __init__(
+        self,
+        pipeline: ABSAPipeline,
+        extract_concurrency: int = 2,
+        sentiment_concurrency: int = 1,
+        queue_size: int = 8,
+        reviews_per_batch: int = 16,
+        report_interval: float = 30.0
+    ):
+        """
+        Args:
+            pipeline: Pipeline whose extractor, sentiment analyzer and deduplicator are shared by all datasets
+            extract_concurrency: Review groups in LLM extraction at once (HTTP requests are
+                additionally capped by the extractor's own max_concurrency)
+            sentiment_concurrency: Review groups in sentiment inference at once; keep at 1 for an
+                in-process SentimentAnalyzer and raise it with a ShardedSentimentAnalyzer
+            queue_size: Capacity (in review groups) of each queue between stages
+            reviews_per_batch: Reviews per group handed between stages
+            report_interval: Seconds between progress reports (0 disables them)
+        """
+        self.pipeline = pipeline
+        self.reviews_per_batch = reviews_per_batch
+        self.report_interval = report_interval
+
+        self.extract_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.sentiment_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.write_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self.stages = {
+            "read": StageStats("read", 1),
+            "extract": StageStats("extract", extract_concurrency, self.extract_queue),
+            "sentiment": StageStats("sentiment", sentiment_concurrency, self.sentiment_queue),
+            "write": StageStats("write", 1, self.write_queue)
+        }
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self._start_time = None
+        self._end_time = None
+
+    def _put(self, target: queue.Queue, item):
+        """Block until there is room in a queue, giving up if the scheduler stops."""
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source: queue.Queue):
+        """Block until a queue has an item, giving up if the scheduler stops."""
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _run_stage(self, work, *args):
+        """Thread body: run a stage loop and stop the whole scheduler if it fails."""
+        try:
+            work(*args)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _read(self, jobs: List[PlatformJob]):
+        """Round-robin review groups from every dataset into the extraction queue."""
+        stats = self.stages["read"]
+        sources = {job.name: iter(job.reviews) for job in jobs}
+        seen_ids = {job.name: set() for job in jobs}
+
+        while sources:
+            for job in jobs:
+                if job.name not in sources:
+                    continue
+                start_time = time.time()
+                group = []
+                for record in sources[job.name]:
+                    review_id = resolve_review_id(record)
+                    if job.store.is_processed(review_id) or str(review_id) in seen_ids[job.name]:
+                        continue
+                    seen_ids[job.name].add(str(review_id))
+                    group.append((review_id, record))
+                    if len(group) >= self.reviews_per_batch:
+                        break
+                else:
+                    del sources[job.name]
+
+                if group:
+                    stats.record(len(group), time.time() - start_time)
+                    self._put(self.extract_queue, (job, group))
+                    stats.sample_depth()
+
+        for _ in range(self.stages["extract"].concurrency):
+            self._put(self.extract_queue, None)
+
+    def _extract(self, review_column: str, finished: List[int], lock: threading.Lock):
+        """Extraction worker: LLM subcategories for each review group."""
+        stats = self.stages["extract"]
+        while True:
+            stats.sample_depth()
+            item = self._get(self.extract_queue)
+            if item is None:
+                break
+            job, group = item
+            start_time = time.time()
+            plan = self.pipeline.plan_duplicates([record[review_column] for _, record in group])
+            texts = plan.texts_to_infer
+            subcategories, sources = self.pipeline.aspect_extractor.extract_with_sources(texts) if texts else ([], [])
+            seconds = time.time() - start_time
+            stats.record(len(group), seconds)
+            self._put(self.sentiment_queue, (job, group, plan, subcategories, sources, seconds))
+
+        # The last extraction worker to finish tells every sentiment worker to stop
+        with lock:
+            finished[0] += 1
+            last = finished[0] == stats.concurrency
+        if last:
+            for _ in range(self.stages["sentiment"].concurrency):
+                self._put(self.sentiment_queue, None)
+
+    def _classify(self, review_column: str, finished: List[int], lock: threading.Lock):
+        """Sentiment worker: classify extracted aspects and format result rows."""
+        stats = self.stages["sentiment"]
+        while True:
+            stats.sample_depth()
+            item = self._get(self.sentiment_queue)
+            if item is None:
+                break
+            job, group, plan, subcategories, sources, extract_seconds = item
+            start_time = time.time()
+            analyses = self.pipeline.score_sentiment(plan.texts_to_infer, subcategories, sources)
+            seconds = time.time() - start_time
+            analyses = self.pipeline.finish_duplicates(plan, analyses, extract_seconds + seconds)
+            results = [
+                (review_id, self.pipeline.format_rows(review_id, record, review_column, analysis))
+                for (review_id, record), analysis in zip(group, analyses)
+            ]
+            stats.record(len(group), time.time() - start_time)
+            REGISTRY.inc("reviews_processed_total", len(group))
+            self._put(self.write_queue, (job, results))
+
+        with lock:
+            finished[0] += 1
+            last = finished[0] == stats.concurrency
+        if last:
+            self._put(self.write_queue, None)
+
+    def _write(self, batch_size: int, processed: Dict[str, int]):
+        """Single writer: append results to each dataset's store every `batch_size` reviews."""
+        stats = self.stages["write"]
+        pending: Dict[str, List] = {}
+        jobs: Dict[str, PlatformJob] = {}
+
+        def flush(name: str):
+            start_time = time.time()
+            jobs[name].store.append_batch(pending[name])
+            stats.record(len(pending[name]), time.time() - start_time)
+            processed[name] += len(pending[name])
+            pending[name] = []
+
+        while True:
+            stats.sample_depth()
+            item = self._get(self.write_queue)
+            if item is None:
+                break
+            job, results = item
+            jobs[job.name] = job
+            pending.setdefault(job.name, []).extend(results)
+            if len(pending[job.name]) >= batch_size:
+                flush(job.name)
+                print(f"Checkpoint saved ({processed[job.name]} {job.name} reviews in {job.store.path})")
+
+        for name in pending:
+            if pending[name]:
+                flush(name)
+
+    def _report_loop(self):
+        """Print stage throughput and queue depths every `report_interval` seconds."""
+        while not self._stop.wait(self.report_interval):
+            self.print_report(compact=True)
+
+    def run(self, jobs: List[PlatformJob], review_column: str = "review", batch_size: int = 100) -> Dict[str, int]:
+        """
+        Analyze every dataset, overlapping extraction and sentiment across all of them.
+
+        Reviews already marked as processed in a job's store are skipped, so an
+        interrupted run resumes like `ABSAPipeline.process_to_store`.
+
+        Args:
+            jobs: Datasets to analyze
+            review_column: Name of the field containing review text
+            batch_size: Reviews per durable store append, per dataset
+
+        Returns:
+            Number of reviews processed per dataset
+        """
+        processed = {job.name: 0 for job in jobs}
+        for job in jobs:
+            if job.store.processed_ids:
+                print(f"Resuming {job.name} from {job.store.path}: {len(job.store.processed_ids)} reviews already processed")
+        extract_done, sentiment_done = [0], [0]
+        lock = threading.Lock()
+
+        threads = [threading.Thread(target=self._run_stage, args=(self._read, jobs), name="read")]
+        threads += [
+            threading.Thread(target=self._run_stage, args=(self._extract, review_column, extract_done, lock), name=f"extract-{i}")
+            for i in range(self.stages["extract"].concurrency)
+        ]
+        threads += [
+            threading.Thread(target=self._run_stage, args=(self._classify, review_column, sentiment_done, lock), name=f"sentiment-{i}")
+            for i in range(self.stages["sentiment"].concurrency)
+        ]
+        threads.append(threading.Thread(target=self._run_stage, args=(self._write, batch_size, processed), name="write"))
+
+        self._start_time = time.time()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        reporter = None
+        if self.report_interval:
+            reporter = threading.Thread(target=self._report_loop, name="report", daemon=True)
+            reporter.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        finally:
+            self._end_time = time.time()
+            self._stop.set()
+            if reporter is not None:
+                reporter.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return processed
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage throughput, utilization and queue depth figures."""
+        if self._start_time is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._end_time or time.time()) - self._start_time
+        return {name: stats.snapshot(elapsed) for name, stats in self.stages.items()}
+
+    def print_report(self, compact: bool = False):
+        """Print the per-stage report, as one line or as a table."""
+        report = self.report()
+        if compact:
+            print("[scheduler] " + " | ".join(
+                f"{name}: {stage['reviews']} reviews ({stage['reviews_per_sec']}/s), "
+                f"queue {stage['queue_depth']}/{stage['queue_capacity']}"
+                for name, stage in report.items()
+            ))
+            return
+
+        print("| Stage     | Workers | Reviews | Reviews/s | Utilization | Queue avg | Queue max |")
+        print("|-----------|---------|---------|-----------|-------------|-----------|-----------|")
+        for name, stage in report.items():
+            print(
+                f"| {name:9} | {stage['concurrency']:7} | {stage['reviews']:7,} | {stage['reviews_per_sec']:9.2f} "
+                f"| {stage['utilization']:11.1%} | {stage['queue_depth_avg']:9.2f} | {stage['queue_depth_max']:9} |"
+            )
@@ -3,9 +3,12 @@ Sentiment analysis using FABSA RoBERTa model.
 Analyzes sentiment for specific aspects in food delivery reviews.
 """
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from typing import Dict, List
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from src.metrics import REGISTRY
+from src.sentiment_cache import SentimentCache, model_fingerprint
+from src.token_cache import PairTokenizer, TokenStore, tokenizer_fingerprint
 
 
 class SentimentAnalyzer:
@@ -26,17 +29,97 @@ class SentimentAnalyzer:
         2: "positive"
     }
 
-    def __init__(self, model_path: str = "Anudeep-Narala/fabsa-roberta-sentiment"):
-        """Initialize sentiment analyzer with RoBERTa model."""
-        print(f"Loading sentiment model from {model_path}...")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    def __init__(
+        self,
+        model_path: str = "Anudeep-Narala/fabsa-roberta-sentiment",
+        backend: str = "torch",
+        cache_dir: Optional[str] = None,
+        token_store_dir: Optional[str] = None,
+        memo_cache: Optional[SentimentCache] = None
+    ):
+        """
+        Configure the sentiment analyzer; the model is loaded on first use.
+
+        torch and transformers are imported only then as well, so building a
+        pipeline for a dry run or importing this module stays fast.
+
+        Args:
+            model_path: Hugging Face model ID or local directory
+            backend: "torch" (fp32, GPU if available), "torch-int8" (dynamic
+                quantization, CPU) or "onnx" (ONNX Runtime, CPU)
+            cache_dir: Where quantized/exported models are kept between runs
+                (defaults to ~/.cache/absa_sentiment)
+            token_store_dir: Optional directory persisting review token IDs across runs
+            memo_cache: Optional cache of earlier results; pairs found there skip the model,
+                and results from another model or other weights are discarded
+        """
+        self.model_path = model_path
+        self.backend_name = backend
+        self.cache_dir = cache_dir
+        self.token_store_dir = token_store_dir
+        self.memo_cache = memo_cache
+
+        self.tokenizer = None
+        self.pair_tokenizer = None
+        self.backend = None
+        self.device = None
+        self._load_lock = threading.Lock()
+        self._fingerprint = None
+        self._fingerprint_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.backend is not None
+
+    def load(self) -> "SentimentAnalyzer":
+        """Load the tokenizer and model now instead of on the first analysis call."""
+        if self.backend is not None:
+            return self
+        with self._load_lock:
+            if self.backend is not None:
+                return self
+            from transformers import AutoTokenizer
+            from src.sentiment_backends import DEFAULT_CACHE_DIR, load_backend
+
+            print(f"Loading sentiment model from {self.model_path} ({self.backend_name} backend)...")
+            tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            store = TokenStore(self.token_store_dir, tokenizer_fingerprint(tokenizer)) if self.token_store_dir else None
+            # Each review is tokenized once and shared by all of its aspects
+            self.pair_tokenizer = PairTokenizer(tokenizer, max_length=512, store=store)
+            self.tokenizer = tokenizer
+            backend = load_backend(self.model_path, self.backend_name, self.cache_dir or DEFAULT_CACHE_DIR)
+            self.device = backend.device
+            # Set last: other threads treat a non-None backend as fully loaded
+            self.backend = backend
+            print(f"Model loaded on {self.device}")
+        return self
 
-        # Move to GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
-        self.model.eval()
-        print(f"Model loaded on {self.device}")
+    def model_fingerprint(self) -> str:
+        """
+        Fingerprint of the model path, backend and model files, computed once per analyzer.
+
+        Also drops memo cache entries written under any other fingerprint. The
+        model is only loaded if its files are not available locally yet.
+        """
+        if self._fingerprint is not None:
+            return self._fingerprint
+        with self._fingerprint_lock:
+            if self._fingerprint is not None:
+                return self._fingerprint
+            fingerprint = model_fingerprint(self.model_path, self.backend_name)
+            if fingerprint is None:
+                # Downloads the model, after which its files can be fingerprinted
+                self.load()
+                fingerprint = model_fingerprint(self.model_path, self.backend_name)
+            if fingerprint is None:
+                print(f"Cannot locate the files of {self.model_path}; memo cache keyed by model path only")
+                fingerprint = hashlib.sha256(f"{self.model_path}\0{self.backend_name}".encode("utf-8")).hexdigest()
+            if self.memo_cache is not None:
+                removed = self.memo_cache.invalidate_stale(fingerprint)
+                if removed:
+                    print(f"Invalidated {removed} cached sentiment results from a previous model")
+            self._fingerprint = fingerprint
+        return fingerprint
 
     def analyze_sentiment(self, review_text: str, aspect: str) -> Dict[str, any]:
         """
@@ -49,31 +132,81 @@ class SentimentAnalyzer:
         Returns:
             Dict with sentiment label and confidence score
         """
-        # Format input as expected by the model
-        input_text = f"{review_text} [SEP] {aspect}"
-
-        # Tokenize
-        inputs = self.tokenizer(
-            input_text,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-            padding=True
-        )
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-        # Get prediction
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
+        return self.analyze_batch([(review_text, aspect)])[0]
+
+    def analyze_batch(
+        self,
+        pairs: List[Tuple[str, str]],
+        batch_size: int = 32
+    ) -> List[Dict[str, any]]:
+        """
+        Analyze sentiment for many (review, aspect) pairs using batched forward passes.
+
+        With a memo cache, pairs already analyzed by this model are answered
+        from it and repeated pairs are inferred once. The rest are sorted by
+        token length so each batch is padded only up to its longest member,
+        then results are returned in the original input order.
+
+        Args:
+            pairs: List of (review_text, parent_aspect) tuples
+            batch_size: Maximum number of pairs per forward pass
+
+        Returns:
+            List of dicts with sentiment label and confidence score, one per pair
+        """
+        if not pairs:
+            return []
+        if self.memo_cache is None:
+            return self._infer_batch(pairs, batch_size)
+
+        fingerprint = self.model_fingerprint()
+        results = self.memo_cache.get_many(pairs, fingerprint)
+        missing = list(dict.fromkeys(
+            (str(review_text), aspect) for (review_text, aspect), result in zip(pairs, results) if result is None
+        ))
+        if missing:
+            computed = dict(zip(missing, self._infer_batch(missing, batch_size)))
+            self.memo_cache.put_many(missing, [computed[pair] for pair in missing], fingerprint)
+            results = [
+                result if result is not None else dict(computed[(str(review_text), aspect)])
+                for (review_text, aspect), result in zip(pairs, results)
+            ]
+        return results
+
+    def _infer_batch(self, pairs: List[Tuple[str, str]], batch_size: int) -> List[Dict[str, any]]:
+        """Run the model on (review, aspect) pairs in length-sorted batches."""
+        self.load()
+        import torch
+
+        # Tokenize "<review> [SEP] <aspect>" without padding; padding is applied per batch below
+        with REGISTRY.timer("sentiment_tokenize_seconds"):
+            encodings = self.pair_tokenizer.encode_pairs(pairs)
+        lengths = [len(features["input_ids"]) for features in encodings]
+        order = sorted(range(len(pairs)), key=lambda i: lengths[i])
+
+        results = [None] * len(pairs)
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            features = [encodings[i] for i in batch_indices]
+            with REGISTRY.timer("sentiment_pad_seconds"):
+                inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+
+            # Get predictions
+            with REGISTRY.timer("sentiment_forward_seconds", backend=self.backend_name):
+                logits = self.backend.logits(dict(inputs))
             probs = torch.softmax(logits, dim=-1)
-            predicted_class = torch.argmax(probs, dim=-1).item()
-            confidence = probs[0][predicted_class].item()
+            confidences, predicted = torch.max(probs, dim=-1)
 
-        return {
-            "sentiment": self.SENTIMENT_LABELS[predicted_class],
-            "confidence": round(confidence, 4)
-        }
+            for i, predicted_class, confidence in zip(
+                batch_indices, predicted.tolist(), confidences.tolist()
+            ):
+                results[i] = {
+                    "sentiment": self.SENTIMENT_LABELS[predicted_class],
+                    "confidence": round(confidence, 4)
+                }
+
+        REGISTRY.inc("sentiment_pairs_total", len(pairs))
+        return results
 
     def analyze_multiple_aspects(
         self,
@@ -90,11 +223,36 @@ class SentimentAnalyzer:
         Returns:
             Dict mapping each aspect to its sentiment result
         """
-        results = {}
-        for aspect in aspects:
-            results[aspect] = self.analyze_sentiment(review_text, aspect)
+        batch_results = self.analyze_batch([(review_text, aspect) for aspect in aspects])
+        return dict(zip(aspects, batch_results))
 
-        return results
+    def analyze_all_aspects(
+        self,
+        review_texts: List[str],
+        batch_size: int = 32
+    ) -> List[Dict[str, Dict[str, any]]]:
+        """
+        Analyze sentiment for every parent aspect in ASPECT_MAPPING, for many reviews.
+
+        The six "[SEP] <aspect>" variants of a review are tokenized from one
+        encode of the review and differ by a token or two in length, so they
+        share forward passes with almost no padding. Results are identical to
+        calling analyze_sentiment once per aspect.
+
+        Args:
+            review_texts: The review texts
+            batch_size: Maximum number of pairs per forward pass
+
+        Returns:
+            One dict per review mapping each parent aspect to its sentiment result
+        """
+        aspects = list(self.ASPECT_MAPPING.values())
+        pairs = [(review_text, aspect) for review_text in review_texts for aspect in aspects]
+        results = self.analyze_batch(pairs, batch_size=batch_size)
+        return [
+            dict(zip(aspects, results[start:start + len(aspects)]))
+            for start in range(0, len(results), len(aspects))
+        ]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+"""
+Inference backends for the FABSA RoBERTa sentiment model.
+Full-precision PyTorch, dynamically quantized int8 PyTorch, and ONNX Runtime.
+"""
+
+import glob
+import os
+import random
+import re
+import pandas as pd
+import torch
+from typing import Dict, List, Tuple
+from transformers import AutoConfig, AutoModelForSequenceClassification
+from src.sentiment_cache import model_fingerprint
+
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "absa_sentiment")
+
+
+def _model_cache_dir(cache_dir: str, model_path: str, backend: str, fingerprint: str) -> str:
+    """Directory holding the converted model for one (model, weights, backend) combination."""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_path.strip("/"))
+    return os.path.join(cache_dir, safe_name, fingerprint[:16], backend)
+
+
+def _source_fingerprint(model_path: str) -> Tuple[str, object]:
+    """
+    Fingerprint of the fp32 weights a converted model is derived from.
+
+    Returns:
+        (fingerprint, fp32 model or None); the model is only loaded (and so
+        downloaded) when its files are not available locally yet
+    """
+    fingerprint = model_fingerprint(model_path, "torch")
+    if fingerprint is not None:
+        return fingerprint, None
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    fingerprint = model_fingerprint(model_path, "torch")
+    if fingerprint is None:
+        raise FileNotFoundError(f"Cannot locate the files of {model_path} to key its converted-model cache")
+    return fingerprint, model
+
+
+class TorchBackend:
+    """Full-precision PyTorch model."""
+
+    def __init__(self, model_path: str, device: torch.device):
+        self.device = device
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        self.model.to(self.device)
+        self.model.eval()
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Return classification logits for a padded batch."""
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+
+class TorchInt8Backend(TorchBackend):
+    """PyTorch model with Linear layers dynamically quantized to int8 (CPU only)."""
+
+    def __init__(self, model_path: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.device = torch.device("cpu")
+        fingerprint, fp32_model = _source_fingerprint(model_path)
+        weights_path = os.path.join(_model_cache_dir(cache_dir, model_path, "torch-int8", fingerprint), "model_int8.pt")
+
+        self.model = None
+        if fp32_model is None and os.path.exists(weights_path):
+            try:
+                self.model = self._load_quantized(model_path, weights_path)
+            except Exception as e:
+                print(f"Discarding unreadable int8 model {weights_path}: {e}")
+                os.remove(weights_path)
+        if self.model is None:
+            self.model = self._quantize(fp32_model or AutoModelForSequenceClassification.from_pretrained(model_path))
+            # Written atomically, so an interrupted save never leaves a truncated file behind
+            os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+            tmp_path = f"{weights_path}.tmp"
+            torch.save(self.model.state_dict(), tmp_path)
+            os.replace(tmp_path, weights_path)
+            print(f"Saved int8 model to {weights_path}")
+
+    @staticmethod
+    def _quantize(model) -> torch.nn.Module:
+        model.eval()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    @classmethod
+    def _load_quantized(cls, model_path: str, weights_path: str) -> torch.nn.Module:
+        """Quantized skeleton built from the config, filled with the cached int8 weights; fp32 weights are not read."""
+        config = AutoConfig.from_pretrained(model_path)
+        model = cls._quantize(AutoModelForSequenceClassification.from_config(config))
+        model.load_state_dict(torch.load(weights_path))
+        return model
+
+
+class OnnxBackend:
+    """ONNX Runtime session over a one-time export of the model."""
+
+    def __init__(self, model_path: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("backend='onnx' requires onnxruntime: pip install onnxruntime onnx") from e
+
+        self.device = torch.device("cpu")
+        fingerprint, _ = _source_fingerprint(model_path)
+        onnx_path = os.path.join(_model_cache_dir(cache_dir, model_path, "onnx", fingerprint), "model.onnx")
+        if not os.path.exists(onnx_path):
+            self._export(model_path, onnx_path)
+
+        try:
+            self.session = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            print(f"Discarding unreadable ONNX model {onnx_path}: {e}")
+            os.remove(onnx_path)
+            self._export(model_path, onnx_path)
+            self.session = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    @staticmethod
+    def _export(model_path: str, onnx_path: str):
+        """Export the model with dynamic batch and sequence axes."""
+        print(f"Exporting {model_path} to ONNX...")
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, attn_implementation="eager")
+        model.eval()
+
+        # Trace with a padded batch so the attention-mask path is part of the graph
+        input_ids = torch.tensor([[0, 100, 200, 2], [0, 100, 2, 1]])
+        attention_mask = torch.tensor([[1, 1, 1, 1], [1, 1, 1, 0]])
+
+        os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+        tmp_path = f"{onnx_path}.tmp"
+        torch.onnx.export(
+            model,
+            (input_ids, attention_mask),
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"}
+            },
+            opset_version=17,
+            dynamo=False
+        )
+        os.replace(tmp_path, onnx_path)
+        print(f"Saved ONNX model to {onnx_path}")
+
+    def logits(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Return classification logits for a padded batch."""
+        feeds = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(["logits"], feeds)[0])
+
+
+def load_backend(model_path: str, backend: str = "torch", cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    Build an inference backend for a sentiment model.
+
+    Args:
+        model_path: Hugging Face model ID or local directory
+        backend: One of "torch", "torch-int8", "onnx"
+        cache_dir: Where converted models are stored between runs
+
+    Returns:
+        Backend object exposing `logits(inputs)` and `device`
+    """
+    if backend == "torch":
+        return TorchBackend(model_path, torch.device("cuda" if torch.cuda.is_available() else "cpu"))
+    if backend == "torch-int8":
+        return TorchInt8Backend(model_path, cache_dir)
+    if backend == "onnx":
+        return OnnxBackend(model_path, cache_dir)
+    raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+
+def backend_agreement(reference, candidate, pairs: List[Tuple[str, str]], batch_size: int = 32) -> Dict[str, float]:
+    """
+    Compare two analyzers on the same (review, aspect) pairs.
+
+    Args:
+        reference: Analyzer treated as ground truth (usually the fp32 torch backend)
+        candidate: Analyzer being evaluated
+        pairs: (review_text, aspect) pairs to score
+        batch_size: Pairs per forward pass
+
+    Returns:
+        Dict with pair count, label disagreements, disagreement rate and confidence drift
+    """
+    expected = reference.analyze_batch(pairs, batch_size=batch_size)
+    actual = candidate.analyze_batch(pairs, batch_size=batch_size)
+
+    disagreements = sum(e["sentiment"] != a["sentiment"] for e, a in zip(expected, actual))
+    deltas = [abs(e["confidence"] - a["confidence"]) for e, a in zip(expected, actual)]
+
+    return {
+        "pairs": len(pairs),
+        "disagreements": disagreements,
+        "disagreement_rate": round(disagreements / len(pairs), 4) if pairs else 0.0,
+        "mean_confidence_delta": round(sum(deltas) / len(deltas), 4) if deltas else 0.0,
+        "max_confidence_delta": round(max(deltas), 4) if deltas else 0.0
+    }
+
+
+def sample_review_pairs(data_glob: str, sample_size: int, aspects: List[str], seed: int = 0) -> List[Tuple[str, str]]:
+    """Draw a reproducible sample of (review, aspect) pairs from the review CSVs."""
+    reviews = []
+    for path in sorted(glob.glob(data_glob)):
+        reviews.extend(pd.read_csv(path, usecols=["review"])["review"].dropna().astype(str))
+
+    rng = random.Random(seed)
+    sampled = rng.sample(reviews, min(sample_size, len(reviews)))
+    return [(review, rng.choice(aspects)) for review in sampled]
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.sentiment_analyzer import SentimentAnalyzer
+
+    parser = argparse.ArgumentParser(description="Check label agreement of a backend against fp32 PyTorch")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="torch-int8")
+    parser.add_argument("--model-path", default="Anudeep-Narala/fabsa-roberta-sentiment")
+    parser.add_argument("--data", default="data/*_customer_reviews.csv")
+    parser.add_argument("--sample", type=int, default=500)
+    args = parser.parse_args()
+
+    reference = SentimentAnalyzer(args.model_path, backend="torch")
+    candidate = SentimentAnalyzer(args.model_path, backend=args.backend)
+    pairs = sample_review_pairs(args.data, args.sample, list(SentimentAnalyzer.ASPECT_MAPPING))
+
+    report = backend_agreement(reference, candidate, pairs)
+    print(f"\n{args.backend} vs torch fp32 on {report['pairs']} review/aspect pairs:")
+    print(f"  Label disagreements: {report['disagreements']} ({report['disagreement_rate']:.2%})")
+    print(f"  Confidence delta: mean {report['mean_confidence_delta']}, max {report['max_confidence_delta']}")
@@ -0,0 +1,224 @@
+"""
+Two-tier memo cache for sentiment results.
+An in-process LRU in front of a persistent SQLite store, keyed by a content hash of
+(review text, aspect) under a fingerprint of the sentiment model.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from src.metrics import REGISTRY
+
+
+# Files whose contents determine the model's outputs: weights, config and tokenizer
+MODEL_FILE_PATTERNS = (
+    "*.safetensors", "*.bin", "*.onnx", "config.json",
+    "tokenizer.json", "tokenizer_config.json", "vocab.json", "merges.txt", "special_tokens_map.json"
+)
+
+
+def _model_directory(model_path: str) -> Optional[str]:
+    """Local directory of a model: the path itself, or its snapshot in the Hugging Face cache."""
+    if os.path.isdir(model_path):
+        return model_path
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return None
+    config_path = try_to_load_from_cache(model_path, "config.json")
+    return os.path.dirname(config_path) if isinstance(config_path, str) else None
+
+
+def model_fingerprint(model_path: str, backend: str) -> Optional[str]:
+    """
+    Hash of the model files' identities, without reading the weights.
+
+    Each file contributes its name, size, modification time and the name of
+    the file it resolves to. In the Hugging Face cache that name is the blob's
+    content hash, so a new revision of the model always changes the fingerprint.
+    In a local directory, rewriting the weights changes their size or mtime.
+
+    Args:
+        model_path: Hugging Face model ID or local directory
+        backend: Inference backend, since int8 and ONNX outputs differ slightly from fp32
+
+    Returns:
+        Hex digest, or None if the model files are not available locally yet
+    """
+    directory = _model_directory(model_path)
+    if directory is None:
+        return None
+    files = sorted({path for pattern in MODEL_FILE_PATTERNS for path in glob.glob(os.path.join(directory, pattern))})
+    if not files:
+        return None
+    identities = []
+    for path in files:
+        stat = os.stat(path)
+        identities.append([os.path.basename(path), os.path.basename(os.path.realpath(path)), stat.st_size, stat.st_mtime_ns])
+    content = json.dumps({"model_path": model_path, "backend": backend, "files": identities})
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """Bounded in-memory LRU over a SQLite store of sentiment results."""
+
+    def __init__(
+        self,
+        path: str = "/workspace/output/sentiment_cache.sqlite",
+        max_memory_entries: int = 100_000,
+        max_entries: int = 5_000_000
+    ):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+            max_memory_entries: Results kept in the in-process LRU
+            max_entries: Maximum number of stored results; least recently used are evicted
+        """
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_entries = max_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sentiments (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiments_access ON sentiments(last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM sentiments").fetchone()[0]
+
+    @staticmethod
+    def make_key(review_text: str, aspect: str, fingerprint: str) -> str:
+        """Content hash of the exact review text and aspect under a model fingerprint."""
+        # Not normalized: whitespace and unicode form change the tokens, and so the result
+        content = f"{fingerprint}\0{aspect}\0{review_text}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def invalidate_stale(self, fingerprint: str) -> int:
+        """
+        Drop results produced under any other model fingerprint.
+
+        Returns:
+            Number of stored results removed
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sentiments WHERE fingerprint != ?", (fingerprint,))
+            self._conn.commit()
+            self._size -= cursor.rowcount
+            self._memory.clear()
+            return cursor.rowcount
+
+    def _remember(self, key: str, result: Dict[str, object]):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, pairs: List[Tuple[str, str]], fingerprint: str) -> List[Optional[Dict[str, object]]]:
+        """Cached result of each (review, aspect) pair, or None on a miss; memory first, then disk."""
+        keys = [self.make_key(str(review_text), aspect, fingerprint) for review_text, aspect in pairs]
+        results: List[Optional[Dict[str, object]]] = [None] * len(pairs)
+        with self._lock:
+            disk_keys = {}
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[i] = dict(self._memory[key])
+                else:
+                    disk_keys.setdefault(key, []).append(i)
+            memory_hits = len(pairs) - sum(len(indices) for indices in disk_keys.values())
+
+            lookup = list(disk_keys)
+            found = []
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(lookup), 500):
+                chunk = lookup[start:start + 500]
+                found.extend(self._conn.execute(
+                    f"SELECT key, sentiment, confidence FROM sentiments WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+            for key, sentiment, confidence in found:
+                result = {"sentiment": sentiment, "confidence": confidence}
+                self._remember(key, result)
+                for i in disk_keys[key]:
+                    results[i] = dict(result)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE sentiments SET last_access = ? WHERE key = ?", [(now, key) for key, _, _ in found])
+                self._conn.commit()
+
+            disk_hits = sum(len(disk_keys[key]) for key, _, _ in found)
+            misses = len(pairs) - memory_hits - disk_hits
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+        REGISTRY.inc("sentiment_memo_lookups_total", memory_hits, tier="memory")
+        REGISTRY.inc("sentiment_memo_lookups_total", disk_hits, tier="disk")
+        REGISTRY.inc("sentiment_memo_lookups_total", misses, tier="miss")
+        return results
+
+    def put_many(self, pairs: List[Tuple[str, str]], results: List[Dict[str, object]], fingerprint: str):
+        """Store results for (review, aspect) pairs, evicting the least recently used if full."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for (review_text, aspect), result in zip(pairs, results):
+                key = self.make_key(str(review_text), aspect, fingerprint)
+                self._remember(key, {"sentiment": result["sentiment"], "confidence": result["confidence"]})
+                rows.append((key, fingerprint, result["sentiment"], result["confidence"], now))
+
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sentiments (key, fingerprint, sentiment, confidence, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._size += self._conn.total_changes - before
+
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                cursor = self._conn.execute(
+                    "DELETE FROM sentiments WHERE key IN "
+                    "(SELECT key FROM sentiments ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._size -= cursor.rowcount
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit counters per tier, hit rate and current sizes."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "entries": self._size
+        }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
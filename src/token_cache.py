@@ -0,0 +1,244 @@
+"""
+Tokenization cache for the sentiment model.
+Encodes each review once, appends the "[SEP] <aspect>" suffix at the token-ID level,
+and keeps review token IDs in a memory-mapped store shared across runs.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.metrics import REGISTRY
+
+
+# One index record per stored review: key hash, offset into tokens.bin, token count
+INDEX_DTYPE = np.dtype([("key", "u1", (16,)), ("offset", "<i8"), ("length", "<i4")])
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of the tokenizer class and vocabulary; stored token IDs are only valid for this tokenizer."""
+    content = json.dumps([type(tokenizer).__name__, sorted(tokenizer.get_vocab().items())])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class TokenStore:
+    """
+    Append-only memory-mapped store of review token IDs keyed by a hash of the exact review text.
+
+    Safe for threads within one process; separate processes need separate directories.
+    """
+
+    def __init__(self, directory: str, fingerprint: str):
+        """
+        Open (or create) the store.
+
+        Args:
+            directory: Holds tokens.bin (int32 token IDs), index.bin and meta.json
+            fingerprint: Tokenizer fingerprint; a store written by another tokenizer is cleared
+        """
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.tokens_path = os.path.join(directory, "tokens.bin")
+        self.index_path = os.path.join(directory, "index.bin")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.Lock()
+        self._tokens: Optional[np.memmap] = None
+
+        os.makedirs(directory, exist_ok=True)
+        if self._stored_fingerprint() != fingerprint:
+            if os.path.exists(self.index_path):
+                print(f"Tokenizer changed; clearing token store {directory}")
+            for path in (self.tokens_path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint}, f)
+
+        self._index: Dict[bytes, Tuple[int, int]] = self._load_index()
+
+    def _stored_fingerprint(self) -> Optional[str]:
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("fingerprint")
+
+    def _load_index(self) -> Dict[bytes, Tuple[int, int]]:
+        """Read the index, dropping a torn trailing record or entries past the end of tokens.bin."""
+        tokens_size = os.path.getsize(self.tokens_path) // 4 if os.path.exists(self.tokens_path) else 0
+        if not os.path.exists(self.index_path):
+            return {}
+
+        valid_bytes = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize
+        records = np.fromfile(self.index_path, dtype=INDEX_DTYPE, count=valid_bytes // INDEX_DTYPE.itemsize)
+        records = records[records["offset"] + records["length"] <= tokens_size]
+        if len(records) * INDEX_DTYPE.itemsize != os.path.getsize(self.index_path):
+            # Interrupted write: keep only complete, fully backed records
+            records.tofile(self.index_path)
+        return {r["key"].tobytes(): (int(r["offset"]), int(r["length"])) for r in records}
+
+    @staticmethod
+    def make_key(review_text: str) -> bytes:
+        return hashlib.blake2b(review_text.encode("utf-8"), digest_size=16).digest()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: bytes) -> Optional[List[int]]:
+        """Token IDs of a stored review, or None."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, length = entry
+            if self._tokens is None or offset + length > len(self._tokens):
+                # Remap to cover records appended since the last mapping
+                self._tokens = np.memmap(self.tokens_path, dtype=np.int32, mode="r")
+            return self._tokens[offset:offset + length].tolist()
+
+    def put_many(self, entries: List[Tuple[bytes, List[int]]]):
+        """Append token IDs for several reviews; token data is written before the index records."""
+        with self._lock:
+            entries = [(key, ids) for key, ids in entries if key not in self._index]
+            if not entries:
+                return
+            offset = os.path.getsize(self.tokens_path) // 4 if os.path.exists(self.tokens_path) else 0
+            records = np.zeros(len(entries), dtype=INDEX_DTYPE)
+            with open(self.tokens_path, "ab") as f:
+                for i, (key, ids) in enumerate(entries):
+                    f.write(np.asarray(ids, dtype=np.int32).tobytes())
+                    records[i] = (np.frombuffer(key, dtype=np.uint8), offset, len(ids))
+                    offset += len(ids)
+            with open(self.index_path, "ab") as f:
+                records.tofile(f)
+            for key, record in zip((key for key, _ in entries), records):
+                self._index[key] = (int(record["offset"]), int(record["length"]))
+
+
+class PairTokenizer:
+    """
+    Builds model inputs for "<review> [SEP] <aspect>" pairs from per-review and per-aspect token IDs.
+
+    For the byte-level BPE tokenizer of the RoBERTa model, encoding the joined
+    string equals encoding the review and the suffix separately and
+    concatenating, because the pre-tokenizer always splits before the space
+    that starts the suffix. The one exception is a review ending in
+    whitespace, which is encoded in full. Equivalence is checked against
+    full encodes when the tokenizer is loaded; tokenizers that fail the
+    check always get full encodes.
+    """
+
+    SEPARATOR = " [SEP] "
+
+    PROBE_TEXTS = [
+        "The pizza was cold and soggy",
+        "Driver was late!!",
+        "Fees are too high... $12 for delivery?",
+        "ok",
+        "",
+        "Great food 😀",
+        "won't order again, app's checkout crashed",
+        "Ｆｕｌｌｗｉｄｔｈ text and café"
+    ]
+
+    def __init__(self, tokenizer, max_length: int = 512, store: Optional[TokenStore] = None):
+        """
+        Args:
+            tokenizer: Hugging Face tokenizer of the sentiment model
+            max_length: Maximum sequence length including special tokens
+            store: Optional persistent store of review token IDs
+        """
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.store = store
+        self._prefix, self._postfix = self._special_tokens()
+        self.max_content = max_length - len(self._prefix) - len(self._postfix)
+        self._suffix_ids: Dict[str, List[int]] = {}
+        self.enabled = self._concatenates_cleanly()
+        if not self.enabled:
+            print("Tokenizer does not split cleanly at the aspect suffix; token cache disabled")
+
+    def _special_tokens(self) -> Tuple[List[int], List[int]]:
+        """Special token IDs the tokenizer puts before and after a single sequence (e.g. <s> and </s>)."""
+        with_special = self.tokenizer("x")["input_ids"]
+        content = self.tokenizer("x", add_special_tokens=False)["input_ids"]
+        for start in range(len(with_special) - len(content) + 1):
+            if with_special[start:start + len(content)] == content:
+                return with_special[:start], with_special[start + len(content):]
+        return [], []
+
+    def _full_encode(self, texts: List[str]) -> List[List[int]]:
+        return self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+
+    def _concatenates_cleanly(self) -> bool:
+        aspects = ["food", "delivery", "overall"]
+        pairs = [(text, aspect) for text in self.PROBE_TEXTS for aspect in aspects]
+        expected = self._full_encode([f"{text}{self.SEPARATOR}{aspect}" for text, aspect in pairs])
+        review_ids = dict(zip(self.PROBE_TEXTS, self._encode_reviews(self.PROBE_TEXTS)))
+        return all(
+            self._assemble(review_ids[text], aspect) == ids
+            for (text, aspect), ids in zip(pairs, expected)
+        )
+
+    def _encode_reviews(self, texts: List[str]) -> List[List[int]]:
+        # Tokens past max_content never reach the model, so they are neither kept nor stored
+        if not texts:
+            return []
+        return self.tokenizer(texts, add_special_tokens=False, truncation=True, max_length=self.max_content)["input_ids"]
+
+    def _assemble(self, review_ids: List[int], aspect: str) -> List[int]:
+        """Same result as truncating the joined string's tokens, then adding bos/eos."""
+        if aspect not in self._suffix_ids:
+            self._suffix_ids[aspect] = self.tokenizer(f"{self.SEPARATOR}{aspect}", add_special_tokens=False)["input_ids"]
+        return self._prefix + (review_ids + self._suffix_ids[aspect])[:self.max_content] + self._postfix
+
+    def review_ids(self, review_texts: List[str]) -> Dict[str, List[int]]:
+        """Token IDs (no special tokens) of each distinct review, from the store or one batched encode."""
+        distinct = list(dict.fromkeys(review_texts))
+        found: Dict[str, List[int]] = {}
+        keys = {}
+        if self.store is not None:
+            for text in distinct:
+                keys[text] = self.store.make_key(text)
+                ids = self.store.get(keys[text])
+                if ids is not None:
+                    found[text] = ids
+
+        missing = [text for text in distinct if text not in found]
+        REGISTRY.inc("token_cache_reviews_total", len(found), result="hit")
+        REGISTRY.inc("token_cache_reviews_total", len(missing), result="miss")
+        encoded = self._encode_reviews(missing)
+        found.update(zip(missing, encoded))
+        if self.store is not None and missing:
+            self.store.put_many([(keys[text], ids) for text, ids in zip(missing, encoded)])
+        return found
+
+    def encode_pairs(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, List[int]]]:
+        """
+        Unpadded model features for each (review, aspect) pair, in input order.
+
+        Returns:
+            One dict per pair with every input the model expects (input_ids, attention_mask, ...)
+        """
+        texts = [str(review_text) for review_text, _ in pairs]
+        reusable = [self.enabled and not (text and text[-1].isspace()) for text in texts]
+
+        review_ids = self.review_ids([text for text, ok in zip(texts, reusable) if ok])
+        full_indices = [i for i, ok in enumerate(reusable) if not ok]
+        full_ids = dict(zip(full_indices, self._full_encode(
+            [f"{texts[i]}{self.SEPARATOR}{pairs[i][1]}" for i in full_indices]
+        ))) if full_indices else {}
+        REGISTRY.inc("token_cache_reviews_total", len(full_indices), result="full_encode")
+
+        features = []
+        for i, (text, aspect) in enumerate(pairs):
+            ids = full_ids[i] if i in full_ids else self._assemble(review_ids[texts[i]], aspect)
+            feature = {"input_ids": ids}
+            for name in self.tokenizer.model_input_names:
+                if name == "attention_mask":
+                    feature[name] = [1] * len(ids)
+                elif name == "token_type_ids":
+                    feature[name] = [0] * len(ids)
+            features.append(feature)
+        return features